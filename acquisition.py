@@ -0,0 +1,276 @@
+import time
+import queue
+import threading
+import capture
+import trigger
+from telemetry import Telemetry
+from PyQt6 import QtCore
+
+# What to do when the queue of captures waiting for the GUI is full:
+# - block: the producers wait, so the scope is not re-armed until there is room
+# - drop-oldest: the oldest waiting capture is discarded
+# - skip-plot: the producers wait like block, but the GUI stores the whole
+#   backlog and only plots its newest capture
+POLICIES = ["block", "drop-oldest", "skip-plot"]
+
+
+class AcquisitionPipeline(QtCore.QObject):
+    """
+    Acquires captures from a scope session in the background.
+
+    An acquisition worker arms the scope, waits for the trigger, downloads
+    the data and re-arms the scope right away. A decode worker converts the
+    capture while the scope is already acquiring the next one, and hands it
+    over to the GUI through a bounded queue and the captureReady signal.
+
+    Attributes:
+    -----------
+    session : ds1000z.Session
+        The scope session to acquire from.
+    count : int
+        The number of captures to acquire, None to loop until stopped.
+    policy : str
+        One of POLICIES, applied when the GUI queue is full.
+    decode : callable
+        Function converting the downloaded channels, runs on the decode worker.
+        Captures it returns None for are not handed over to the GUI.
+    dropped : int
+        The number of captures discarded by the drop-oldest policy.
+    trigger : trigger.TriggerWait
+        The trigger wait, holding the trigger latency histograms.
+    telemetry : telemetry.Telemetry
+        Records the duration of the trigger, download, decode and deliver
+        stages of every capture.
+    """
+
+    captureReady = QtCore.pyqtSignal()
+    failed = QtCore.pyqtSignal(str)
+    finished = QtCore.pyqtSignal()
+
+    def __init__(self, session, count=None, policy="block", maxsize=4,
+                 decode=None, triggerWait=None, telemetry=None):
+        """
+        Constructs the pipeline. Nothing runs until start() is called.
+
+        Parameters:
+        -----------
+        session : ds1000z.Session
+            The scope session to acquire from.
+        count : int
+            The number of captures to acquire, None to loop until stopped.
+        policy : str
+            One of POLICIES, applied when the GUI queue is full.
+        maxsize : int
+            The number of captures that can wait for the GUI.
+        decode : callable
+            Function converting the downloaded capture.Capture, identity if None.
+            It may consume the capture, e.g. averaging it, and return None.
+        triggerWait : trigger.TriggerWait
+            The trigger wait to use, a default one if None.
+        telemetry : telemetry.Telemetry
+            Records the stages, usually the one of the session. A private
+            one if None.
+        """
+        super().__init__()
+
+        if policy not in POLICIES:
+            raise ValueError("Unknown queue policy: %s" % policy)
+
+        self.session = session
+        self.count = count
+        self.policy = policy
+        self.decode = decode or (lambda data: data)
+        self.dropped = 0
+        self.armed = False
+        self.trigger = triggerWait or trigger.TriggerWait()
+        self.telemetry = telemetry or Telemetry()
+        self.raw = queue.Queue(maxsize)
+        self.ready = queue.Queue(maxsize)
+        self.stopEvent = threading.Event()
+        self.threads = []
+
+    def start(self):
+        """
+        Starts the acquisition and decode workers.
+        """
+        self.threads = [threading.Thread(target=self.acquire_worker),
+                        threading.Thread(target=self.decode_worker)]
+        for thread in self.threads:
+            thread.daemon = True
+            thread.start()
+
+    def stop(self):
+        """
+        Asks the workers to stop. Captures already queued are still delivered.
+        """
+        self.stopEvent.set()
+
+    def stopped(self):
+        """
+        Returns whether stop() was called.
+        """
+        return self.stopEvent.is_set()
+
+    def take(self):
+        """
+        Returns the captures waiting for the GUI. Must be called from the GUI
+        thread when captureReady is emitted.
+
+        Returns:
+        --------
+        list: (data, plot) tuples, plot tells whether the capture should be drawn.
+        """
+        items = []
+        while True:
+            try:
+                items.append(self.ready.get_nowait())
+            except queue.Empty:
+                break
+
+        if self.policy == "skip-plot":
+            return [(data, i == len(items) - 1) for i, data in enumerate(items)]
+
+        return [(data, True) for data in items]
+
+    def acquire_worker(self):
+        """
+        Arms the scope, waits for the trigger and downloads every capture.
+        """
+        try:
+            self.session.run(lambda scope: scope.invalidate_settings())
+
+            acquired = 0
+            while not self.stopped():
+                last = self.count is not None and acquired + 1 >= self.count
+                data = self.acquire_one(not last)
+                if data is None:
+                    break
+
+                acquired += 1
+                self.put(self.raw, data, block=True)
+                if last:
+                    break
+        except Exception as e:
+            self.failed.emit(str(e))
+        finally:
+            self.armed = False
+            self.put(self.raw, None, block=True, force=True)
+
+    def acquire_one(self, rearm):
+        """
+        Waits for a trigger and downloads the capture.
+
+        The session is only locked for each command, not for the whole trigger
+        wait, so the other users of the session are not held up until the next
+        trigger.
+
+        Parameters:
+        -----------
+        rearm : bool
+            Whether to arm the next trigger as soon as the data is downloaded.
+
+        Returns:
+        --------
+        capture.Capture: The downloaded capture, or None if the pipeline was stopped.
+        """
+        if not self.armed:
+            self.session.run(self.trigger.arm)
+            self.armed = True
+
+        begin = time.perf_counter()
+        if not self.trigger.wait(self.session, self.stopEvent):
+            return None
+        self.telemetry.record("stage", "trigger", time.perf_counter() - begin)
+
+        return self.session.run(self.download, rearm)
+
+    def download(self, scope, rearm):
+        """
+        Downloads a triggered capture.
+
+        Parameters:
+        -----------
+        scope : ds1000z.Scope
+            The connected scope of the session.
+        rearm : bool
+            Whether to arm the next trigger as soon as the data is downloaded.
+
+        Returns:
+        --------
+        capture.Capture: The downloaded capture.
+        """
+        with self.telemetry.stage("download") as stage:
+            data = capture.Capture(scope.get_all_chans(),
+                                   scope.get_settings().preambles)
+            stage.nbytes = data.nbytes()
+        self.trigger.downloaded()
+        self.armed = False
+
+        # The scope acquires the next capture while this one is processed
+        if rearm and not self.stopped():
+            self.trigger.arm(scope)
+            self.armed = True
+
+        return data
+
+    def decode_worker(self):
+        """
+        Converts the downloaded captures and hands them over to the GUI.
+        """
+        while True:
+            data = self.raw.get()
+            if data is None:
+                break
+
+            try:
+                with self.telemetry.stage("decode", data.nbytes()):
+                    data = self.decode(data)
+            except Exception as e:
+                self.failed.emit(str(e))
+                continue
+
+            if data is None:
+                continue
+
+            # Waits here when the GUI falls behind
+            with self.telemetry.stage("deliver"):
+                self.put(self.ready, data, block=self.policy != "drop-oldest")
+            self.captureReady.emit()
+
+        self.finished.emit()
+
+    def put(self, q, item, block, force=False):
+        """
+        Puts an item in a bounded queue, waiting or discarding the oldest
+        item when it is full.
+
+        Parameters:
+        -----------
+        q : queue.Queue
+            The queue to put the item in.
+        item : object
+            The item to queue.
+        block : bool
+            Wait for room if True, otherwise discard the oldest item.
+        force : bool
+            Keep waiting even if the pipeline was stopped.
+        """
+        while True:
+            if not block:
+                try:
+                    q.put_nowait(item)
+                    return
+                except queue.Full:
+                    try:
+                        q.get_nowait()
+                        self.dropped += 1
+                    except queue.Empty:
+                        pass
+                    continue
+
+            try:
+                q.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                if self.stopped() and not force:
+                    return
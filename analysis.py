@@ -0,0 +1,327 @@
+import numpy as np
+
+# Automatic marker modes
+MODES = ["rising", "falling", "peaks"]
+
+# Smallest FFT used by the template search
+FFT_SIZE = 1 << 16
+
+
+def crossings(data, high, low, rising=True):
+    """
+    Returns the positions where a channel crosses a threshold, with
+    hysteresis: a rising crossing is the first sample at or above high after
+    one at or below low, and the other way around for a falling one. Samples
+    between the thresholds keep the previous state, so noise around a single
+    level does not add crossings.
+
+    Parameters:
+    -----------
+    data : numpy.ndarray
+        The samples of the channel.
+    high : float
+        The upper threshold.
+    low : float
+        The lower threshold, no larger than high.
+    rising : bool
+        Find rising crossings, falling ones if False.
+
+    Returns:
+    --------
+    numpy.ndarray: The sorted positions of the crossings.
+    """
+    # Only the samples out of the hysteresis band can change the state
+    outside = np.flatnonzero((data >= high) | (data <= low))
+    if len(outside) == 0:
+        return np.empty(0, dtype=np.int64)
+
+    above = data[outside] >= high
+    change = np.flatnonzero(above[1:] != above[:-1]) + 1
+    if rising:
+        change = change[above[change]]
+    else:
+        change = change[~above[change]]
+
+    return outside[change]
+
+
+def sliding_max(data, width):
+    """
+    Returns the maximum of the window of width samples centered on every
+    sample, in linear time whatever the width (van Herk/Gil-Werman): the
+    samples are split in blocks of width, and every window is the suffix of
+    one block and the prefix of the next.
+
+    Parameters:
+    -----------
+    data : numpy.ndarray
+        The samples.
+    width : int
+        The odd width of the windows.
+
+    Returns:
+    --------
+    numpy.ndarray: The maxima, with the dtype of data.
+    """
+    half = width // 2
+    width = 2 * half + 1
+    if np.issubdtype(data.dtype, np.integer):
+        lowest = np.iinfo(data.dtype).min
+    else:
+        lowest = -np.inf
+
+    # Windows past the ends see the lowest value
+    size = -(-(len(data) + 2 * half) // width) * width
+    padded = np.full(size, lowest, dtype=data.dtype)
+    padded[half:half + len(data)] = data
+
+    blocks = padded.reshape(-1, width)
+    prefix = np.maximum.accumulate(blocks, axis=1).ravel()
+    suffix = np.maximum.accumulate(blocks[:, ::-1], axis=1)[:, ::-1].ravel()
+
+    return np.maximum(suffix[:len(data)], prefix[width - 1:width - 1 + len(data)])
+
+
+def peaks(data, height, distance=1):
+    """
+    Returns the positions of the local maxima of a channel at or above a
+    height. A peak is only kept if it is the highest sample within distance,
+    so a noisy top gives a single peak.
+
+    Parameters:
+    -----------
+    data : numpy.ndarray
+        The samples of the channel.
+    height : float
+        The smallest value of a peak.
+    distance : int
+        The minimum distance between peaks.
+
+    Returns:
+    --------
+    numpy.ndarray: The sorted positions of the peaks.
+    """
+    if len(data) < 3:
+        return np.empty(0, dtype=np.int64)
+
+    # The first sample of a flat top counts as the maximum
+    mid = data[1:-1]
+    found = np.flatnonzero((mid >= height) & (mid > data[:-2]) &
+                           (mid >= data[2:])) + 1
+    if len(found) == 0 or distance <= 1:
+        return found
+
+    found = found[data[found] >= sliding_max(data, 2 * distance - 1)[found]]
+
+    # Equal peaks within distance are all maxima, keep the first one
+    return spacing(found, distance)
+
+
+def spacing(positions, distance):
+    """
+    Drops the positions closer than distance to the previous one kept.
+
+    Parameters:
+    -----------
+    positions : numpy.ndarray
+        Sorted positions.
+    distance : int
+        The minimum distance between positions.
+
+    Returns:
+    --------
+    numpy.ndarray: The positions kept.
+    """
+    if len(positions) == 0 or distance <= 1:
+        return positions
+
+    # Each position jumps to the first one far enough, only the kept ones
+    # are visited
+    following = np.searchsorted(positions, positions + distance)
+    kept = []
+    i = 0
+    while i < len(positions):
+        kept.append(i)
+        i = following[i]
+
+    return positions[kept]
+
+
+def find_markers(data, mode, high, low=None, distance=1, progress=None):
+    """
+    Finds the positions to place markers on a channel. Meant to run in the
+    background.
+
+    Parameters:
+    -----------
+    data : numpy.ndarray
+        The samples of the channel.
+    mode : str
+        One of MODES.
+    high : float
+        The upper threshold of crossings, or the height of peaks.
+    low : float
+        The lower threshold of crossings, high if None.
+    distance : int
+        The minimum distance between markers.
+    progress : callable
+        Receives the percentage done.
+
+    Returns:
+    --------
+    numpy.ndarray: The sorted positions found.
+    """
+    if mode not in MODES:
+        raise ValueError("Unknown marker mode %s" % mode)
+
+    if low is None:
+        low = high
+
+    if mode == "peaks":
+        positions = peaks(data, high, distance)
+    else:
+        positions = spacing(crossings(data, high, low, mode == "rising"),
+                            distance)
+
+    if progress is not None:
+        progress(100)
+
+    return positions
+
+
+def _window_sums(data, length):
+    """
+    Returns the sums of the samples and of their squares over every window
+    of a given length, from prefix sums.
+    """
+    values = np.asarray(data, dtype=np.float64)
+    s1 = np.concatenate(([0.0], np.cumsum(values)))
+    s2 = np.concatenate(([0.0], np.cumsum(values * values)))
+    return s1[length:] - s1[:-length], s2[length:] - s2[:-length]
+
+
+def correlate(data, template, progress=None):
+    """
+    Returns the normalized cross-correlation of a template with every window
+    of a channel: 1 where the window is the template scaled and offset, 0
+    where they are unrelated and for flat windows.
+
+    The correlation is computed with FFTs by overlap-save, so the time grows
+    with n log m instead of n * m, and the window means and energies come
+    from prefix sums.
+
+    Parameters:
+    -----------
+    data : numpy.ndarray
+        The samples of the channel.
+    template : numpy.ndarray
+        The samples searched.
+    progress : callable
+        Receives the percentage done.
+
+    Returns:
+    --------
+    numpy.ndarray: The float32 score of the window starting at every sample.
+    """
+    m = len(template)
+    n = len(data) - m + 1
+    if m < 2 or n < 1:
+        return np.zeros(max(n, 0), dtype=np.float32)
+
+    kernel = np.asarray(template, dtype=np.float64)
+    kernel = kernel - kernel.mean()
+    norm = np.sqrt(np.dot(kernel, kernel))
+    if norm == 0:
+        raise ValueError("The template is flat")
+
+    # Every block of size samples gives size - m + 1 correlations
+    size = max(FFT_SIZE, 1 << int(np.ceil(np.log2(4 * m))))
+    step = size - m + 1
+    spectrum = np.conj(np.fft.rfft(kernel, size))
+
+    score = np.empty(n, dtype=np.float32)
+    for start in range(0, n, step):
+        count = min(step, n - start)
+        block = np.asarray(data[start:start + count + m - 1], dtype=np.float64)
+        score[start:start + count] = np.fft.irfft(np.fft.rfft(block, size) *
+                                                  spectrum, size)[:count]
+        if progress is not None:
+            progress(int(90 * (start + count) / n))
+
+    # The kernel has zero mean, so the window mean cancels in the numerator
+    s1, s2 = _window_sums(data, m)
+    energy = np.sqrt(np.maximum(s2 - s1 * s1 / m, 0)) * norm
+    np.divide(score, energy, out=score, where=energy > norm * 1e-6)
+    score[energy <= norm * 1e-6] = 0
+
+    if progress is not None:
+        progress(100)
+
+    return score
+
+
+def match_template(data, template, threshold, progress=None):
+    """
+    Returns the positions where a template occurs in a channel. Matches
+    closer than the template length are merged, keeping the best one.
+
+    Parameters:
+    -----------
+    data : numpy.ndarray
+        The samples of the channel.
+    template : numpy.ndarray
+        The samples searched.
+    threshold : float
+        The smallest normalized cross-correlation of a match, up to 1.
+    progress : callable
+        Receives the percentage done.
+
+    Returns:
+    --------
+    numpy.ndarray: The sorted start positions of the matches.
+    """
+    score = correlate(data, template, progress)
+    if len(score) == 0:
+        return np.empty(0, dtype=np.int64)
+
+    # Pad so matches at both ends are local maxima too
+    padded = np.concatenate(([-np.inf], score, [-np.inf]))
+    return peaks(padded, threshold, len(template)) - 1
+
+
+def find_shift(reference, data, maxShift, window=1 << 16):
+    """
+    Returns the shift that best aligns a channel with a reference, so that
+    data[i + shift] matches reference[i]. A window in the middle of the
+    reference is searched within maxShift samples with the normalized
+    cross-correlation.
+
+    Parameters:
+    -----------
+    reference : numpy.ndarray
+        The samples aligned to.
+    data : numpy.ndarray
+        The samples to align.
+    maxShift : int
+        The largest shift searched, either way.
+    window : int
+        The samples of the reference compared.
+
+    Returns:
+    --------
+    int: The shift, 0 if the reference window is flat.
+    """
+    length = min(len(reference), len(data))
+    half = min(window, length - 2 * maxShift) // 2
+    if half < 1:
+        return 0
+
+    start = length // 2 - half
+    lo = max(0, start - maxShift)
+    hi = min(len(data), start + 2 * half + maxShift)
+    try:
+        score = correlate(data[lo:hi], reference[start:start + 2 * half])
+    except ValueError:
+        return 0
+
+    return int(np.argmax(score)) + lo - start
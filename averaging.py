@@ -0,0 +1,223 @@
+import threading
+import numpy as np
+import analysis
+import capture
+
+# Largest trigger jitter corrected, in samples
+MAX_SHIFT = 1000
+
+# Samples updated at once, bounds the temporary arrays
+BLOCK_SIZE = 1 << 20
+
+
+class RunningStats:
+    """
+    The running mean and variance of a sequence of equally long traces
+    (Welford's algorithm), in constant memory however many are added.
+
+    Attributes:
+    -----------
+    count : int
+        The number of traces added.
+    mean : numpy.ndarray
+        The mean of the traces.
+    m2 : numpy.ndarray
+        The sum of the squared differences to the mean.
+    """
+
+    def __init__(self, length):
+        """
+        Constructs empty statistics.
+
+        Parameters:
+        -----------
+        length : int
+            The samples of every trace.
+        """
+        self.count = 0
+        self.mean = np.zeros(length)
+        self.m2 = np.zeros(length)
+
+    def add(self, data, shift=0):
+        """
+        Adds a trace.
+
+        Parameters:
+        -----------
+        data : numpy.ndarray
+            The samples of the trace.
+        shift : int
+            Use data[i + shift] as sample i, repeating the first or last
+            sample past the ends.
+        """
+        self.count += 1
+        for start in range(0, len(self.mean), BLOCK_SIZE):
+            end = min(start + BLOCK_SIZE, len(self.mean))
+            x = np.take(data, np.arange(start + shift, end + shift), mode="clip")
+            x = x.astype(np.float64)
+
+            mean = self.mean[start:end]
+            delta = x - mean
+            mean += delta / self.count
+            self.m2[start:end] += delta * (x - mean)
+
+    def variance(self):
+        """
+        Returns the sample variance of the traces.
+        """
+        if self.count < 2:
+            return np.zeros_like(self.m2)
+
+        return self.m2 / (self.count - 1)
+
+
+class Averager:
+    """
+    Aligns captures of the same operation and keeps the running mean and
+    standard deviation of their channels.
+
+    The first capture is the reference. Every capture added is shifted to
+    match it, by the cross-correlation of one channel, and the same shift is
+    applied to all its channels. Captures with other channels or lengths are
+    rejected. Captures can be added from a worker thread.
+
+    Attributes:
+    -----------
+    maxShift : int
+        The largest shift searched, either way.
+    channel : str
+        The channel used to align, the first one of the reference if None.
+    stats : dict
+        Maps channel names to their RunningStats.
+    shift : int
+        The shift of the last capture added.
+    rejected : int
+        The number of captures that did not match the reference.
+    """
+
+    def __init__(self, maxShift=MAX_SHIFT, channel=None):
+        """
+        Constructs an empty averager.
+
+        Parameters:
+        -----------
+        maxShift : int
+            The largest shift searched, either way.
+        channel : str
+            The channel used to align, the first one of the reference if None.
+        """
+        self.maxShift = maxShift
+        self.channel = channel
+        self.stats = {}
+        self.reference = None
+        self.preambles = {}
+        self.shift = 0
+        self.rejected = 0
+        self.lock = threading.Lock()
+
+    def count(self):
+        """
+        Returns the number of captures averaged.
+        """
+        with self.lock:
+            return max([s.count for s in self.stats.values()] + [0])
+
+    def add(self, scopeData):
+        """
+        Aligns a capture and adds it to the statistics. Meant as the decode
+        function of an acquisition.AcquisitionPipeline, it consumes the
+        capture.
+
+        Parameters:
+        -----------
+        scopeData : capture.Capture
+            The capture to add.
+
+        Returns:
+        --------
+        None: The capture is not kept.
+        """
+        with self.lock:
+            if self.reference is None:
+                if self.channel is None:
+                    self.channel = next(iter(scopeData), None)
+                if self.channel not in scopeData:
+                    self.rejected += 1
+                    return None
+
+                self.reference = np.array(scopeData[self.channel])
+                self.stats = {name: RunningStats(len(scopeData[name]))
+                              for name in scopeData}
+                self.preambles = dict(scopeData.preambles)
+
+            if set(scopeData) != set(self.stats) or \
+                    any(len(scopeData[name]) != len(stats.mean)
+                        for name, stats in self.stats.items()):
+                self.rejected += 1
+                return None
+
+            self.shift = analysis.find_shift(self.reference,
+                                             scopeData[self.channel],
+                                             self.maxShift)
+            for name, stats in self.stats.items():
+                stats.add(scopeData[name], self.shift)
+
+        return None
+
+    def captures(self):
+        """
+        Returns snapshots of the mean and of the standard deviation as
+        captures, None if nothing was averaged yet. Refresh them with
+        update_captures.
+
+        Returns:
+        --------
+        tuple: The mean and standard deviation capture.Capture.
+        """
+        with self.lock:
+            if not self.stats:
+                return None
+
+            lengths = {name: len(s.mean) for name, s in self.stats.items()}
+
+        # The deviation scales with the samples but has no offset
+        stdPreambles = {name: dict(preamble, yorigin=0, yreference=0)
+                        for name, preamble in self.preambles.items()}
+
+        mean = capture.Capture({name: np.zeros(length, dtype=np.float32)
+                                for name, length in lengths.items()},
+                               self.preambles)
+        std = capture.Capture({name: np.zeros(length, dtype=np.float32)
+                               for name, length in lengths.items()},
+                              stdPreambles)
+        self.update_captures(mean, std)
+
+        return mean, std
+
+    def update_captures(self, mean, std):
+        """
+        Copies the current mean and standard deviation into the samples of
+        captures returned by captures(), in place, so their cut windows are
+        kept. Their decimation pyramids and interval indexes no longer match
+        the samples and are dropped.
+
+        Parameters:
+        -----------
+        mean : capture.Capture
+            The mean capture.
+        std : capture.Capture
+            The standard deviation capture.
+        """
+        with self.lock:
+            count = max(s.count for s in self.stats.values())
+            for name, s in self.stats.items():
+                mean.base[name][:] = s.mean
+                std.base[name][:] = np.sqrt(s.variance())
+            rejected = self.rejected
+
+        for scopeData, notes in [(mean, "Mean of %d captures"),
+                                 (std, "Standard deviation of %d captures")]:
+            scopeData.info.update(averaged=count, rejected=rejected)
+            scopeData.notes = notes % count
+            scopeData.lod.clear()
+            scopeData.intervals.clear()
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+
+import sys
+import time
+import argparse
+import ds1000z
+from ds1000z_sim import SimScope
+
+DEFAULT_DEPTHS = "12000,120000,1200000,12000000,24000000"
+
+
+def bench_depth(mdep, args):
+    """
+    Benchmarks get_chan and get_all_chans against a simulator.
+
+    Args:
+    - mdep: an integer representing the memory depth to simulate.
+    - args: the parsed command line arguments.
+
+    Returns:
+    - results: a list of (name, MB/s, captures/s) tuples.
+    """
+    channels = ["CHAN%d" % (i+1) for i in range(args.channels)]
+    sim = SimScope(mdep=mdep, channels=channels, latency=args.latency,
+                   bandwidth=args.bandwidth)
+    host, port = sim.start()
+    scope = ds1000z.Scope(host, port, pipeline=not args.no_pipeline)
+
+    results = []
+    for name, func, nchans in [
+            ("get_chan", lambda: scope.get_chan("CHAN1"), 1),
+            ("get_all_chans", scope.get_all_chans, len(channels))]:
+        func()  # warm up the simulator waveforms
+
+        begin = time.perf_counter()
+        for _ in range(args.repeat):
+            func()
+        elapsed = time.perf_counter() - begin
+
+        mbps = mdep * nchans * args.repeat / elapsed / 1e6
+        results.append((name, mbps, args.repeat / elapsed))
+
+    del scope
+    sim.stop()
+
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Download throughput benchmark using a simulated DS1000Z")
+    parser.add_argument("--depths", default=DEFAULT_DEPTHS,
+                        help="comma separated memory depths")
+    parser.add_argument("--channels", type=int, default=4, choices=[1, 2, 3, 4],
+                        help="number of active channels")
+    parser.add_argument("--repeat", type=int, default=3,
+                        help="captures per measurement")
+    parser.add_argument("--latency", type=float, default=0.0,
+                        help="simulated reply latency in seconds")
+    parser.add_argument("--bandwidth", type=float, default=None,
+                        help="simulated link speed in bytes per second")
+    parser.add_argument("--no-pipeline", action="store_true",
+                        help="disable command pipelining in get_chan")
+    parser.add_argument("--min-mbps", type=float, default=None,
+                        help="exit with an error if any result is slower")
+    args = parser.parse_args()
+
+    print("%-10s %-14s %10s %12s" % ("depth", "call", "MB/s", "captures/s"))
+
+    failed = False
+    for mdep in [int(d) for d in args.depths.split(",")]:
+        for name, mbps, rate in bench_depth(mdep, args):
+            print("%-10d %-14s %10.1f %12.2f" % (mdep, name, mbps, rate))
+            if args.min_mbps is not None and mbps < args.min_mbps:
+                failed = True
+
+    if failed:
+        print("Throughput below %.1f MB/s" % args.min_mbps)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+
+import os
+import sys
+import json
+import time
+import argparse
+import statistics
+import subprocess
+
+basedir = os.path.dirname(os.path.abspath(__file__))
+
+# Runs in a new interpreter, so every launch is measured from a cold start
+CHILD = """
+import time
+begin = time.perf_counter()
+import os, sys, json
+sys.path.insert(0, %(basedir)r)
+sys.argv = ["ds1000z_spa.py"]
+import ds1000z_spa
+imported = time.perf_counter()
+from PyQt6 import QtWidgets
+if %(loadui)r:
+    from PyQt6 import uic
+    ds1000z_spa.load_ui = lambda window: uic.loadUi(
+        os.path.join(%(basedir)r, "main.ui"), window)
+app = QtWidgets.QApplication(sys.argv)
+window = ds1000z_spa.MainWindow()
+built = time.perf_counter()
+window.show()
+app.processEvents()
+shown = time.perf_counter()
+print(json.dumps({"import": imported - begin, "window": built - imported,
+                  "show": shown - built}))
+sys.stdout.flush()
+os._exit(0)
+"""
+
+PHASES = ["import", "window", "show", "total"]
+
+
+def launch(loadui):
+    """
+    Starts the GUI in a new interpreter and measures its startup.
+
+    Args:
+    - loadui: a boolean, build the window with uic.loadUi instead of main_ui.
+
+    Returns:
+    - times: a dictionary with the seconds of every phase.
+    """
+    begin = time.perf_counter()
+    result = subprocess.run([sys.executable, "-c",
+                             CHILD % {"basedir": basedir, "loadui": loadui}],
+                            capture_output=True, text=True, check=True)
+    total = time.perf_counter() - begin
+
+    times = json.loads(result.stdout.strip().splitlines()[-1])
+    times["total"] = total
+    return times
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="GUI startup time benchmark, until the window is shown")
+    parser.add_argument("--repeat", type=int, default=5,
+                        help="launches measured")
+    parser.add_argument("--loadui", action="store_true",
+                        help="build the window from main.ui with uic.loadUi")
+    parser.add_argument("--max-ms", type=float, default=None,
+                        help="exit with an error if the median total is slower")
+    args = parser.parse_args()
+
+    # Without a display the window is drawn offscreen
+    if "DISPLAY" not in os.environ and "WAYLAND_DISPLAY" not in os.environ:
+        os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+    launch(args.loadui)  # warm up the disk cache
+    runs = [launch(args.loadui) for _ in range(args.repeat)]
+
+    print("%-8s %10s %10s" % ("phase", "median ms", "min ms"))
+    for phase in PHASES:
+        values = [run[phase] * 1000 for run in runs]
+        print("%-8s %10.1f %10.1f" % (phase, statistics.median(values),
+                                      min(values)))
+
+    total = statistics.median(run["total"] * 1000 for run in runs)
+    if args.max_ms is not None and total > args.max_ms:
+        print("Startup slower than %.1f ms" % args.max_ms)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,9 @@
+#!/bin/bash
+
+# Generates main_ui.py from main.ui, run it after editing main.ui.
+# The icons are loaded relative to the module, and only when first drawn.
+cd "$(dirname "$0")"
+pyuic6 main.ui | sed \
+    -e 's|^from PyQt6 import QtCore, QtGui, QtWidgets$|import os\n&\n\nbasedir = os.path.dirname(__file__)|' \
+    -e 's|\(icon[0-9]*\)\.addPixmap(QtGui\.QPixmap("\([^"]*\)"), |\1.addFile(os.path.join(basedir, "\2"), QtCore.QSize(), |' \
+    > main_ui.py
@@ -0,0 +1,181 @@
+import os
+import json
+import struct
+import tempfile
+import numpy as np
+from capture import Capture
+
+# File layout:
+#   magic (8 bytes) | version (u32) | header length (u32) | JSON header
+#   channel blocks, each one starting at a multiple of ALIGN
+# All the integers are little endian. The JSON header describes the
+# channels (name, dtype, offset and length of their block) and holds the
+# capture metadata.
+MAGIC = b"DS1ZCAP\0"
+VERSION = 1
+ALIGN = 4096
+EXTENSION = ".ds1z"
+
+# Bytes of a channel written at a time, between progress reports
+WRITE_SIZE = 16 * 1024 * 1024
+
+_prefix = struct.Struct("<8sII")
+
+
+def _align(offset):
+    """
+    Returns the first multiple of ALIGN at or after offset.
+    """
+    return (offset + ALIGN - 1) // ALIGN * ALIGN
+
+
+def _file_mode(fileName):
+    """
+    Returns the permissions of fileName, or the ones a new file would get.
+    """
+    try:
+        return os.stat(fileName).st_mode & 0o777
+    except OSError:
+        umask = os.umask(0)
+        os.umask(umask)
+        return 0o666 & ~umask
+
+
+def save_capture(fileName, capture, markers=None, progress=None):
+    """
+    Saves a capture in the native binary format.
+
+    The file is written under a temporary name next to fileName and renamed
+    over it once complete, so saving over the file a capture is mapped from
+    leaves the mapping intact, and a failed save leaves the old file.
+
+    Parameters:
+    -----------
+    fileName : str
+        The path of the file to write.
+    capture : capture.Capture
+        The capture to save.
+    markers : list
+        The markers to store, dictionaries with "pos" and "note". The markers
+        of the capture are stored if None.
+    progress : callable
+        Receives the percentage written.
+    """
+    if markers is None:
+        markers = capture.markers
+
+    chans = {name: np.ascontiguousarray(data)
+             for name, data in capture.base.items()}
+
+    header = {
+        "timestamp": capture.timestamp,
+        "preambles": capture.preambles,
+        "markers": [{"pos": int(m["pos"]), "note": m.get("note", "")}
+                    for m in markers],
+        "notes": capture.notes,
+        "info": capture.info,
+        "views": capture.views,
+        "redoViews": capture.redoViews,
+        "channels": [],
+    }
+
+    # The header size depends on the offsets, lay it out until it fits
+    start = 0
+    while True:
+        offset = start
+        header["channels"] = []
+        for name, data in chans.items():
+            header["channels"].append({"name": name,
+                                       "dtype": data.dtype.str,
+                                       "offset": offset,
+                                       "length": int(data.size)})
+            offset = _align(offset + data.nbytes)
+
+        raw = json.dumps(header).encode()
+        if _prefix.size + len(raw) <= start:
+            break
+        start = _align(_prefix.size + len(raw))
+
+    total = max(1, sum(data.nbytes for data in chans.values()))
+    written = 0
+    directory, name = os.path.split(os.path.abspath(fileName))
+    fd, tmpName = tempfile.mkstemp(prefix=".%s." % name, suffix=".tmp",
+                                   dir=directory)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(_prefix.pack(MAGIC, VERSION, len(raw)))
+            f.write(raw)
+            for channel, data in zip(header["channels"], chans.values()):
+                f.seek(channel["offset"])
+                view = memoryview(data).cast("B")
+                for i in range(0, len(view), WRITE_SIZE):
+                    block = view[i:i + WRITE_SIZE]
+                    f.write(block)
+                    written += len(block)
+                    if progress is not None:
+                        progress(int(100 * written / total))
+
+        os.chmod(tmpName, _file_mode(fileName))
+        os.replace(tmpName, fileName)
+    except BaseException:
+        os.remove(tmpName)
+        raise
+
+
+def read_header(fileName):
+    """
+    Reads the JSON header of a capture file.
+
+    Parameters:
+    -----------
+    fileName : str
+        The path of the capture file.
+
+    Returns:
+    --------
+    dict: The decoded header.
+    """
+    with open(fileName, "rb") as f:
+        magic, version, length = _prefix.unpack(f.read(_prefix.size))
+        if magic != MAGIC:
+            raise ValueError("%s is not a capture file" % fileName)
+        if version > VERSION:
+            raise ValueError("Unsupported capture file version %d" % version)
+
+        return json.loads(f.read(length).decode())
+
+
+def open_capture(fileName, load=False):
+    """
+    Opens a capture file. The channels are memory mapped, so no sample is
+    read from disk until it is used.
+
+    Parameters:
+    -----------
+    fileName : str
+        The path of the capture file.
+    load : bool
+        Read the channels into RAM instead of mapping them.
+
+    Returns:
+    --------
+    capture.Capture: The capture, with read-only memory mapped channels.
+    """
+    header = read_header(fileName)
+
+    chans = {}
+    for channel in header["channels"]:
+        if channel["length"] == 0:
+            chans[channel["name"]] = np.empty(0, dtype=channel["dtype"])
+            continue
+        chans[channel["name"]] = np.memmap(fileName, mode="r",
+                                           dtype=np.dtype(channel["dtype"]),
+                                           offset=channel["offset"],
+                                           shape=(channel["length"],))
+        if load:
+            chans[channel["name"]] = np.array(chans[channel["name"]])
+
+    return Capture(chans, header.get("preambles"), header.get("timestamp"),
+                   header.get("markers"), header.get("notes", ""),
+                   header.get("info"), header.get("views"),
+                   header.get("redoViews"))
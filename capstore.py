@@ -0,0 +1,218 @@
+import os
+import shutil
+import tempfile
+import itertools
+import numpy as np
+from collections import OrderedDict
+import capfile
+
+# Default memory budget for the captures kept in RAM
+DEFAULT_BUDGET = 1024 * 1024 * 1024
+
+
+def resident_bytes(capture):
+    """
+    Returns the bytes of RAM used by the samples of a capture. Memory mapped
+    channels live in the page cache and are not counted.
+    """
+    return sum(data.nbytes for data in capture.base.values()
+               if not isinstance(data, np.memmap))
+
+
+def write_spill(path, capture, progress=None):
+    """
+    Writes a capture to a spill file, see CaptureStore.spill.
+
+    Parameters:
+    -----------
+    path : str
+        The spill file.
+    capture : capture.Capture
+        The capture to write.
+    progress : callable
+        Unused, see tasks.BackgroundTask.
+
+    Returns:
+    --------
+    str: The spill file.
+    """
+    capfile.save_capture(path, capture)
+    return path
+
+
+class CaptureStore:
+    """
+    A list of captures with a memory budget.
+
+    The most recently used captures are kept in RAM. When the budget is
+    exceeded the least recently used ones are spilled to a temporary
+    directory, in the capfile format, and they are loaded back when they are
+    accessed again.
+
+    A capture being spilled stays in RAM until its file is written, and
+    accessing it meanwhile keeps it there.
+
+    Attributes:
+    -----------
+    budget : int
+        The bytes of samples allowed in RAM.
+    spawn : callable
+        Runs the spill writes, None to write them synchronously.
+    spillDir : str
+        The directory holding the spilled captures, created on first spill.
+    """
+
+    def __init__(self, budget=DEFAULT_BUDGET, spawn=None):
+        """
+        Constructs an empty store.
+
+        Parameters:
+        -----------
+        budget : int
+            The bytes of samples allowed in RAM.
+        spawn : callable
+            Called as spawn(func, *args, done=callback) to run func in the
+            background and pass its result to callback on the thread using
+            the store, like MainWindow.run_task. None writes the spills
+            synchronously.
+        """
+        self.budget = budget
+        self.spawn = spawn
+        self.spillDir = None
+        self.entries = []
+        self.resident = OrderedDict()
+        self.ids = itertools.count()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __iter__(self):
+        for i in range(len(self.entries)):
+            yield self[i]
+
+    def __getitem__(self, index):
+        """
+        Returns a capture, loading it back if it was spilled to disk.
+        """
+        entry = self.entries[index]
+        if entry["capture"] is None:
+            self.reload(entry)
+        elif entry["id"] in self.resident:
+            self.resident.move_to_end(entry["id"])
+        else:
+            # Used again before its spill is written, the file is dropped
+            # once written
+            entry["spilling"] = False
+            self.resident[entry["id"]] = entry
+            self.enforce_budget()
+
+        return entry["capture"]
+
+    def __delitem__(self, index):
+        entry = self.entries.pop(index)
+        entry["spilling"] = False
+        self.resident.pop(entry["id"], None)
+        self.remove_spill(entry)
+
+    def append(self, capture):
+        """
+        Adds a capture, spilling older captures if the budget is exceeded.
+
+        Parameters:
+        -----------
+        capture : capture.Capture
+            The capture to add.
+        """
+        entry = {"id": next(self.ids), "capture": capture, "path": None,
+                 "spilling": False}
+        self.entries.append(entry)
+        self.resident[entry["id"]] = entry
+        self.enforce_budget()
+
+    def resident_size(self):
+        """
+        Returns the bytes of samples currently kept in RAM.
+        """
+        return sum(resident_bytes(e["capture"]) for e in self.resident.values())
+
+    def enforce_budget(self):
+        """
+        Spills the least recently used captures until the budget is met. The
+        most recently used capture is always kept.
+        """
+        size = self.resident_size()
+        for key in list(self.resident)[:-1]:
+            if size <= self.budget:
+                break
+
+            # Captures backed by a file use no RAM, nothing to free
+            entry = self.resident[key]
+            nbytes = resident_bytes(entry["capture"])
+            if nbytes == 0:
+                continue
+
+            del self.resident[key]
+            size -= nbytes
+            self.spill(entry)
+
+    def spill(self, entry):
+        """
+        Writes a capture to the spill directory, with spawn if set, and drops
+        it from RAM once written.
+        """
+        if self.spillDir is None:
+            self.spillDir = tempfile.mkdtemp(prefix="ds1000z_spa_")
+
+        path = os.path.join(self.spillDir,
+                            "%d%s" % (entry["id"], capfile.EXTENSION))
+        entry["spilling"] = True
+        if self.spawn is None:
+            self.spilled(entry, write_spill(path, entry["capture"]))
+        else:
+            self.spawn(write_spill, path, entry["capture"],
+                       done=lambda path: self.spilled(entry, path))
+
+    def spilled(self, entry, path):
+        """
+        Swaps the file written by spill in for a capture, unless the capture
+        was used or deleted meanwhile.
+        """
+        if not entry["spilling"]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return
+
+        entry["spilling"] = False
+        entry["path"] = path
+        entry["capture"] = None
+
+    def reload(self, entry):
+        """
+        Loads a spilled capture back into RAM.
+        """
+        entry["capture"] = capfile.open_capture(entry["path"], load=True)
+        self.remove_spill(entry)
+
+        self.resident[entry["id"]] = entry
+        self.enforce_budget()
+
+    def remove_spill(self, entry):
+        """
+        Deletes the spill file of a capture, if any.
+        """
+        if entry["path"] is not None:
+            try:
+                os.remove(entry["path"])
+            except OSError:
+                pass
+            entry["path"] = None
+
+    def close(self):
+        """
+        Deletes the spill directory.
+        """
+        if self.spillDir is not None:
+            shutil.rmtree(self.spillDir, ignore_errors=True)
+            self.spillDir = None
@@ -0,0 +1,219 @@
+import time
+import numpy as np
+from collections.abc import Mapping
+
+
+class Capture(Mapping):
+    """
+    A capture of one or more scope channels and its metadata.
+
+    It behaves as a dictionary mapping channel names to numpy arrays, so it
+    can be used wherever the plain channel dictionaries were used. The
+    arrays returned are views over the current window of the samples: cuts
+    only push a new window on a stack, so they are O(1), never copy nor
+    destroy data, and can be undone and redone.
+
+    The samples are kept as the scope sent them. Their values in volts and
+    their times in seconds are computed from the preambles when needed, see
+    to_volts and time_at.
+
+    Attributes:
+    -----------
+    base : dict
+        Maps channel names to numpy arrays with all the samples.
+    views : list
+        The stack of (start, end) windows over base, the last one is shown.
+    redoViews : list
+        The windows undone, restored by redo().
+    preambles : dict
+        Maps channel names to the parsed :WAV:PRE? reply of the scope.
+    timestamp : float
+        The time of the capture, in seconds since the epoch.
+    markers : list
+        The saved markers, dictionaries with "pos" and "note".
+    notes : str
+        Free text notes of the capture.
+    info : dict
+        Extra metadata, like the time axis of a loaded CSV file.
+    lod : dict
+        Maps channel names to their lod.Pyramid, once built. Not saved.
+    intervals : dict
+        Maps channel names to their intervals.Index, once built. Not saved.
+    """
+
+    def __init__(self, chans, preambles=None, timestamp=None, markers=None,
+                 notes="", info=None, views=None, redoViews=None):
+        """
+        Constructs the capture.
+
+        Parameters:
+        -----------
+        chans : dict
+            Maps channel names to numpy arrays with the samples.
+        preambles : dict
+            Maps channel names to the parsed :WAV:PRE? reply of the scope.
+        timestamp : float
+            The time of the capture, now if None.
+        markers : list
+            The saved markers, dictionaries with "pos" and "note".
+        notes : str
+            Free text notes of the capture.
+        info : dict
+            Extra metadata.
+        views : list
+            The stack of (start, end) windows, the full capture if None.
+        redoViews : list
+            The windows that can be restored by redo().
+        """
+        self.base = dict(chans)
+        length = max([len(data) for data in self.base.values()] + [0])
+        self.views = [tuple(v) for v in views or [(0, length)]]
+        self.redoViews = [tuple(v) for v in redoViews or []]
+        self.preambles = dict(preambles or {})
+        self.timestamp = time.time() if timestamp is None else timestamp
+        self.markers = list(markers or [])
+        self.notes = notes
+        self.info = dict(info or {})
+        self.lod = {}
+        self.intervals = {}
+
+    def __getitem__(self, chan):
+        start, end = self.views[-1]
+        return self.base[chan][start:end]
+
+    def __iter__(self):
+        return iter(self.base)
+
+    def __len__(self):
+        return len(self.base)
+
+    def nbytes(self):
+        """
+        Returns the number of bytes used by the samples.
+        """
+        return sum(data.nbytes for data in self.base.values())
+
+    def calibration(self, chan):
+        """
+        Returns the scale and shift converting the samples of a channel to
+        volts, volts = sample * scale + shift. Channels without a preamble,
+        like the ones loaded from CSV files, are in volts already.
+        """
+        preamble = self.preambles.get(chan)
+        if preamble is None:
+            return 1.0, 0.0
+
+        scale = preamble["yincrement"]
+        return scale, -(preamble["yorigin"] + preamble["yreference"]) * scale
+
+    def timebase(self):
+        """
+        Returns the time of the first base sample and the sample period, in
+        seconds, or None if the capture has no time axis.
+        """
+        for preamble in self.preambles.values():
+            return (preamble["xorigin"] -
+                    preamble["xreference"] * preamble["xincrement"],
+                    preamble["xincrement"])
+
+        # CSV files carry the time axis in their header
+        start, increment = self.info.get("start"), self.info.get("increment")
+        if start is not None and increment:
+            return float(start), float(increment)
+
+        return None
+
+    def to_volts(self, chan, data):
+        """
+        Converts samples of a channel to float32 volts.
+
+        Parameters:
+        -----------
+        chan : str
+            The channel the samples come from.
+        data : numpy.ndarray
+            The samples, or a part of them.
+
+        Returns:
+        --------
+        numpy.ndarray: The volts, data itself if no conversion is needed.
+        """
+        scale, shift = self.calibration(chan)
+        data = np.asarray(data)
+        if scale == 1 and shift == 0 and data.dtype == np.float32:
+            return data
+
+        volts = np.multiply(data, np.float32(scale), dtype=np.float32)
+        volts += np.float32(shift)
+        return volts
+
+    def time_at(self, pos):
+        """
+        Returns the time in seconds of a position of the current window, None
+        if the capture has no time axis.
+        """
+        timebase = self.timebase()
+        if timebase is None:
+            return None
+
+        start, increment = timebase
+        return start + (self.offset() + pos) * increment
+
+    def offset(self):
+        """
+        Returns the position of the current window in the base samples.
+        """
+        return self.views[-1][0]
+
+    def cut(self, start, end):
+        """
+        Narrows the current window.
+
+        Parameters:
+        -----------
+        start : int
+            The first sample kept, relative to the current window.
+        end : int
+            The sample after the last one kept, relative to the current window.
+
+        Returns:
+        --------
+        bool: Whether the window changed.
+        """
+        offset, limit = self.views[-1]
+        start = min(max(offset + start, offset), limit)
+        end = min(max(offset + end, start), limit)
+        if end - start < 1 or (start, end) == self.views[-1]:
+            return False
+
+        self.views.append((start, end))
+        self.redoViews.clear()
+        return True
+
+    def undo(self):
+        """
+        Restores the previous window.
+
+        Returns:
+        --------
+        bool: Whether there was a cut to undo.
+        """
+        if len(self.views) < 2:
+            return False
+
+        self.redoViews.append(self.views.pop())
+        return True
+
+    def redo(self):
+        """
+        Restores the last undone window.
+
+        Returns:
+        --------
+        bool: Whether there was a cut to redo.
+        """
+        if not self.redoViews:
+            return False
+
+        self.views.append(self.redoViews.pop())
+        return True
@@ -0,0 +1,326 @@
+import os
+import io
+import re
+import numpy as np
+
+# Bytes of text parsed at once
+BLOCK_SIZE = 16 * 1024 * 1024
+
+# Columns holding the channels in files exported from the graph (x,y pairs)
+PAIR_COLUMNS = {1: "CHAN1", 3: "CHAN2", 5: "CHAN3", 7: "CHAN4"}
+
+# Levels a channel in volts may take to be stored as uint8 codes
+CODE_LEVELS = 256
+
+# Values sampled to look for the levels of a channel
+CODE_SAMPLE = 65536
+
+_rigol_chan = re.compile(r"^CH(?:AN)?([1-4])$", re.IGNORECASE)
+
+
+def _is_number(field):
+    """
+    Returns whether a CSV field holds a number.
+    """
+    try:
+        float(field)
+        return True
+    except ValueError:
+        return False
+
+
+def detect_layout(lines):
+    """
+    Detects the layout of a CSV file from its first lines.
+
+    Rigol exports start with a "X,CH1,CH2,...,Start,Increment" header,
+    optionally followed by a "Sequence,Volt,...,<start>,<increment>" units
+    line. Anything else is handled as a graph export, where every channel
+    uses an x,y column pair.
+
+    Args:
+    - lines: a list of strings with the first lines of the file.
+
+    Returns:
+    - layout: a dictionary with the "name" of the layout, the "columns" map
+      from column index to channel name, the number of "header" lines, and
+      the "start" and "increment" of the time axis when known.
+    """
+    header = 0
+    for line in lines:
+        fields = line.strip().split(",")
+        if fields[0] and _is_number(fields[0]):
+            break
+        header += 1
+
+    layout = {"name": "pairs", "columns": dict(PAIR_COLUMNS),
+              "header": header, "start": None, "increment": None}
+    if header == 0:
+        return layout
+
+    names = [f.strip().strip('"') for f in lines[0].strip().split(",")]
+    columns = {}
+    for i, name in enumerate(names):
+        match = _rigol_chan.match(name)
+        if match:
+            columns[i] = "CHAN%s" % match.group(1)
+
+    if not columns:
+        return layout
+
+    layout["name"] = "rigol"
+    layout["columns"] = columns
+
+    # The units line holds the values of the Start and Increment columns
+    if header > 1:
+        units = lines[1].strip().split(",")
+        for key, name in [("start", "Start"), ("increment", "Increment")]:
+            if name in names and names.index(name) < len(units):
+                value = units[names.index(name)]
+                if _is_number(value):
+                    layout[key] = float(value)
+
+    return layout
+
+
+def _regular_lines(data, columns):
+    """
+    Finds the lines of a block numpy's tokenizer can parse: the ones with
+    the number of fields of most lines and no empty channel field.
+
+    Args:
+    - data: a bytes object of newline terminated CSV lines.
+    - columns: a dictionary mapping column indexes to channel names.
+
+    Returns:
+    - lines: an array with the position of the newline ending every line.
+    - regular: a boolean array telling which lines are regular.
+    """
+    text = np.frombuffer(data, dtype=np.uint8)
+    lines = np.flatnonzero(text == ord("\n"))
+    commas = np.flatnonzero(text == ord(","))
+
+    # The commas of every line are the ones between its first and last one
+    ends = np.searchsorted(commas, lines)
+    starts = np.append(0, ends[:-1])
+    counts = ends - starts
+    count = np.bincount(counts).argmax()
+    regular = counts == count
+    if max(columns) > count:
+        return lines, np.zeros(len(lines), dtype=bool)
+
+    rows = np.flatnonzero(regular)
+    firsts, lasts = starts[rows], lines[rows]
+    begins = np.append(0, lines[:-1] + 1)[rows]
+    for i in columns:
+        first = commas[firsts + i - 1] + 1 if i else begins
+        last = commas[firsts + i] if i < count else lasts
+        if i == count:
+            last = last - (text[np.maximum(last - 1, 0)] == ord("\r"))
+        regular[rows[first == last]] = False
+
+    return lines, regular
+
+
+def _parse_lines(data, columns):
+    """
+    Parses CSV lines one by one, skipping the empty and invalid fields.
+
+    Args:
+    - data: a bytes object of newline terminated CSV lines.
+    - columns: a dictionary mapping column indexes to channel names.
+
+    Returns:
+    - values: a dictionary mapping channel names to float32 arrays.
+    """
+    values = {name: [] for name in columns.values()}
+    for line in data.decode(errors="replace").splitlines():
+        fields = line.split(",")
+        for i, name in columns.items():
+            if i < len(fields) and fields[i].strip():
+                try:
+                    values[name].append(float(fields[i]))
+                except ValueError:
+                    pass
+
+    return {name: np.array(v, dtype=np.float32) for name, v in values.items()}
+
+
+def _parse_block(data, columns):
+    """
+    Parses a block of complete CSV lines. The runs of regular lines are
+    parsed with numpy's tokenizer, converting only the channel columns, and
+    the ragged ones (empty fields, channels of different lengths) in Python.
+
+    Args:
+    - data: a bytes object of newline terminated CSV lines.
+    - columns: a dictionary mapping column indexes to channel names.
+
+    Returns:
+    - values: a dictionary mapping channel names to float32 arrays.
+    """
+    lines, regular = _regular_lines(data, columns)
+    usecols = sorted(columns)
+    edges = np.flatnonzero(regular[1:] != regular[:-1]) + 1
+
+    parts = {name: [] for name in columns.values()}
+    for first, last in zip(np.append(0, edges), np.append(edges, len(lines))):
+        run = data[lines[first - 1] + 1 if first else 0:lines[last - 1] + 1]
+        values = None
+        if regular[first]:
+            try:
+                table = np.loadtxt(io.BytesIO(run), delimiter=",",
+                                   usecols=usecols, dtype=np.float32,
+                                   ndmin=2)
+                values = {columns[c]: table[:, i]
+                          for i, c in enumerate(usecols)}
+            except ValueError:
+                pass
+        if values is None:
+            values = _parse_lines(run, columns)
+
+        for name, v in values.items():
+            parts[name].append(v)
+
+    return {name: np.concatenate(v) for name, v in parts.items()}
+
+
+def _compact(data):
+    """
+    Returns the smallest representation of a channel: uint8 for raw ADC codes
+    (integers between 0 and 255), float32 otherwise.
+    """
+    if data.size and data.min() >= 0 and data.max() <= 255 \
+            and np.array_equal(data, np.floor(data)):
+        return data.astype(np.uint8)
+
+    return data
+
+
+def _codes(data):
+    """
+    Returns uint8 codes, their scale and the volts of code 0 if a channel in
+    volts takes at most CODE_LEVELS evenly spaced values, like the samples
+    downloaded from the scope and exported in volts, None otherwise. The
+    volts of the codes differ from the values by their rounding to the
+    7 significant digits of the export at most.
+    """
+    sample = np.unique(data[::max(1, len(data) // CODE_SAMPLE)])
+    if len(sample) > CODE_LEVELS:
+        return None
+
+    low, high = float(data.min()), float(data.max())
+    if low == high:
+        return np.zeros(len(data), dtype=np.uint8), 1.0, low
+
+    step = float(np.diff(sample).min()) if len(sample) > 1 else high - low
+    levels = round((high - low) / step)
+    if levels >= CODE_LEVELS:
+        return None
+
+    step = (high - low) / levels
+    tolerance = 2e-6 * max(abs(low), abs(high))
+    if tolerance > step / 4:
+        return None
+
+    # The scale of the scope is a short decimal, rather than the step
+    # between the rounded values
+    for digits in range(1, 18):
+        rounded = float("%.*g" % (digits, step))
+        if np.abs(np.rint((sample - low) / rounded) * rounded + low -
+                  sample).max() <= tolerance:
+            break
+
+    for scale in dict.fromkeys([rounded, step]):
+        codes = np.rint((data - np.float32(low)) * np.float32(1 / scale))
+        if (codes.max() < CODE_LEVELS and
+                np.abs(codes * scale + low - data).max() <= tolerance):
+            return codes.astype(np.uint8), scale, low
+
+    return None
+
+
+def load_csv(fileName, progress=None, blockSize=BLOCK_SIZE, codes=False):
+    """
+    Loads a CSV capture, either a Rigol export or a graph export.
+
+    The file is parsed in large blocks with numpy, converting only the
+    channel columns, instead of line by line. Only the ragged lines of a
+    block are parsed in Python, see _parse_block.
+
+    With codes set, channels in volts taking at most CODE_LEVELS evenly
+    spaced values, like the files saved with exporter.export_csv, are stored
+    as uint8 codes with a preamble converting them to volts, as downloaded
+    from the scope. This is lossy: the volts of the codes may differ from
+    the values of the file by their rounding to 7 significant digits.
+
+    Args:
+    - fileName: a string representing the path of the CSV file.
+    - progress: a callable receiving the percentage loaded (default is None).
+    - blockSize: an integer representing the bytes parsed at once.
+    - codes: a boolean enabling the uint8 codes (default is False).
+
+    Returns:
+    - scopeData: a dictionary mapping channel names to numpy arrays.
+    - layout: the layout dictionary returned by detect_layout, with the
+      "preambles" of the channels stored as codes.
+    """
+    size = max(os.path.getsize(fileName), 1)
+
+    with open(fileName, "rb") as f:
+        head = f.read(64 * 1024).decode(errors="replace").splitlines()[:8]
+        layout = detect_layout(head)
+
+        f.seek(0)
+        for _ in range(layout["header"]):
+            f.readline()
+
+        first = f.readline()
+        ncols = len(first.decode().rstrip("\r\n").rstrip(",").split(","))
+        columns = {i: n for i, n in layout["columns"].items() if i < ncols}
+
+        parts = {name: [] for name in columns.values()}
+        rest = first
+        while True:
+            block = f.read(blockSize)
+            data = rest + block
+            if block:
+                end = data.rfind(b"\n") + 1
+                data, rest = data[:end], data[end:]
+            elif data and not data.endswith(b"\n"):
+                data += b"\n"
+
+            if data and columns:
+                for name, values in _parse_block(data, columns).items():
+                    parts[name].append(values)
+
+            if progress is not None:
+                progress(int(100 * f.tell() / size))
+
+            if not block:
+                break
+
+    scopeData = {}
+    preambles = {}
+    for name, values in parts.items():
+        if values:
+            data = _compact(np.concatenate(values))
+            found = None
+            if codes and data.dtype == np.float32 and data.size and \
+                    layout["increment"]:
+                found = _codes(data)
+            if found is not None:
+                data, scale, low = found
+                preambles[name] = {
+                    "format": 0, "type": 0, "points": len(data), "count": 1,
+                    "xincrement": layout["increment"],
+                    "xorigin": layout["start"] or 0.0, "xreference": 0,
+                    "yincrement": scale, "yorigin": -low / scale,
+                    "yreference": 0}
+            if data.size:
+                scopeData[name] = data
+
+    if preambles:
+        layout["preambles"] = preambles
+
+    return scopeData, layout
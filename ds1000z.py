@@ -1,37 +1,709 @@
+import time
 import socket
-import select
+import threading
+import numpy as np
+import trigger
+from telemetry import command_name
 
+# Maximum number of samples the DS1000Z returns per :WAV:DATA? in BYTE mode
+CHUNK_SIZE = 250000
 
-class Scope:
+# Seconds a reply may stall before the connection is considered stuck
+TIMEOUT = 10.0
+
+# Times a failed chunk is requested again before giving up on the channel
+CHUNK_RETRIES = 3
+
+# Seconds without data after which the rest of a failed reply is gone
+DRAIN_TIME = 0.2
+
+# Analog channels of the DS1000Z
+CHANNELS = ["CHAN1", "CHAN2", "CHAN3", "CHAN4"]
+
+# Queries needed to compute the memory depth, see memory_depth()
+MEMORY_DEPTH_QUERIES = [":ACQ:MDEP?", ":ACQ:SRAT?", ":TIM:SCAL?"]
+
+# Field names of the :WAV:PRE? reply, in order
+PREAMBLE_FIELDS = ["format", "type", "points", "count", "xincrement",
+                   "xorigin", "xreference", "yincrement", "yorigin",
+                   "yreference"]
+
+
+def parse_preamble(reply):
     """
-    A class representing an oscilloscope.
+    Parses the reply of a :WAV:PRE? query.
+
+    Args:
+    - reply: a string representing the preamble returned by the oscilloscope.
+
+    Returns:
+    - preamble: a dictionary mapping the PREAMBLE_FIELDS names to their values.
+    """
+    preamble = {}
+    for name, value in zip(PREAMBLE_FIELDS, reply.split(",")):
+        if name in ["xincrement", "xorigin", "yincrement", "yorigin"]:
+            preamble[name] = float(value)
+        else:
+            preamble[name] = int(float(value))
+
+    return preamble
+
+
+def memory_depth(mdep, srate, scal):
+    """
+    Computes the memory depth from the replies of MEMORY_DEPTH_QUERIES.
+
+    Args:
+    - mdep: a string representing the :ACQ:MDEP? reply, a number or AUTO.
+    - srate: a string representing the :ACQ:SRAT? reply.
+    - scal: a string representing the :TIM:SCAL? reply.
+
+    Returns:
+    - mdep: an integer representing the memory depth.
+    """
+    # Define number of horizontal grid divisions for DS1054Z
+    h_grid = 12
+
+    if mdep == "AUTO":
+        mdep = h_grid * float(scal) * float(srate)
+
+    return int(mdep)
+
+
+class TransferError(OSError):
+    """
+    A waveform chunk could not be downloaded, even after retrying it.
+    """
+
+
+class ShortChunkError(ValueError):
+    """
+    A :WAV:DATA? block shorter than the chunk requested.
+
+    Attributes:
+    - length: an integer representing the number of bytes received.
+    """
+
+    def __init__(self, length, expected):
+        super().__init__("Chunk of %d bytes instead of %d" % (length, expected))
+        self.length = length
+
+
+def configure_socket(sock):
+    """
+    Sets the options of a socket connecting to an oscilloscope.
+
+    Args:
+    - sock: a TCP socket object, not connected yet.
+    """
+    # Commands are tiny, do not let Nagle hold them back
+    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    # Detect dead connections of long-lived sessions
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+    for opt, value in [("TCP_KEEPIDLE", 10), ("TCP_KEEPINTVL", 5),
+                       ("TCP_KEEPCNT", 3)]:
+        if hasattr(socket, opt):
+            sock.setsockopt(socket.IPPROTO_TCP, getattr(socket, opt), value)
+
+
+class ScopeSettings:
+    """
+    A snapshot of the acquisition settings of the oscilloscope.
+
+    The snapshot is taken once and reused for every channel of a capture
+    until it is invalidated, which arming a trigger does.
+
+    Attributes:
+    - mdep: an integer representing the memory depth.
+    - channels: a list of strings representing the active channels.
+    - preambles: a dictionary mapping channel names to their parsed :WAV:PRE? reply.
+    """
+
+    def __init__(self, mdep, channels):
+        """
+        Initializes the settings snapshot.
+
+        Args:
+        - mdep: an integer representing the memory depth.
+        - channels: a list of strings representing the active channels.
+        """
+        self.mdep = mdep
+        self.channels = channels
+        self.preambles = {}
+
+
+class ScopeProtocol:
+    """
+    The commands of a DS1000Z connection, independent of the transport.
+
+    Every command is written once, as a generator yielding the socket
+    operations it needs as (method, *args) tuples and receiving their
+    results. Scope runs them with blocking calls and ds1000z_async.AsyncScope
+    awaits them, so the reply parsing, the block reading, the chunk planning
+    and the retries are shared, and a transport only implements:
+    - _send(cmd): sends a command line and returns the number of bytes sent.
+    - _recv(size): receives up to size bytes, b"" once the connection is closed.
+    - _recv_into(view): receives up to len(view) bytes into view and returns their number.
+    - _drain(): drops the incoming data until the scope goes quiet, returns False if the connection was closed instead.
+    - _sleep(seconds): waits.
+    - reconnect(): opens a new connection.
+
+    Attributes:
+    - settings: the cached ScopeSettings snapshot, or None if not taken yet.
+    - pipeline: whether get_chan queues the next chunk range while a block is still arriving.
+    - telemetry: the telemetry.Telemetry recording every command and chunk, or None.
+    - retries: an integer representing how many times a failed chunk is requested again.
+    """
+
+    settings = None
+    telemetry = None
+
+    def _record(self, kind, name, seconds, nbytes=0, **fields):
+        """
+        Records a duration in the telemetry, if any.
+        """
+        if self.telemetry is not None:
+            self.telemetry.record(kind, name, seconds, nbytes, **fields)
+
+    def invalidate_settings(self):
+        """
+        Drops the cached settings snapshot. Must be called whenever the scope
+        setup (timebase, memory depth, channels...) may have changed.
+        """
+        self.settings = None
+
+    def _cmd(self, cmd):
+        """
+        Sends a command to the oscilloscope.
+
+        Args:
+        - cmd: a string representing the command to send.
+        """
+        begin = time.perf_counter()
+        nbytes = yield self._send, cmd
+        self._record("cmd", command_name(cmd), time.perf_counter() - begin,
+                     nbytes)
+
+    def _cmd_batch(self, cmds):
+        """
+        Sends several commands to the oscilloscope in a single message.
+
+        Args:
+        - cmds: a list of strings representing the commands to send.
+        """
+        yield from self._cmd(";".join(cmds))
+
+    def _readline(self):
+        """
+        Receives a newline terminated reply from the oscilloscope.
+
+        Returns:
+        - reply: a string representing the reply without the terminator.
+        """
+        while True:
+            end = self._rbuf.find(b"\n")
+            if end >= 0:
+                break
+            chunk = yield self._recv, 4096
+            if not chunk:
+                raise ConnectionError("Connection closed by the oscilloscope")
+            self._rbuf += chunk
+
+        reply = self._rbuf[:end].decode()
+        del self._rbuf[:end+1]
+        return reply
+
+    def _cmd_with_reply(self, cmd):
+        """
+        Sends a command to the oscilloscope and returns the reply.
+
+        Args:
+        - cmd: a string representing the command to send.
+
+        Returns:
+        - reply: a string representing the reply from the oscilloscope.
+        """
+        begin = time.perf_counter()
+        yield self._send, cmd
+        reply = yield from self._readline()
+        self._record("query", command_name(cmd), time.perf_counter() - begin,
+                     len(reply) + 1)
+
+        return reply
+
+    def _query_batch(self, queries):
+        """
+        Sends several queries in a single message and returns their replies.
+
+        Args:
+        - queries: a list of strings representing the queries to send.
+
+        Returns:
+        - replies: a list of strings with one reply per query.
+        """
+        begin = time.perf_counter()
+        yield self._send, ";".join(queries)
+
+        # Answers come back semicolon separated, possibly over several lines
+        replies = []
+        nbytes = 0
+        while len(replies) < len(queries):
+            reply = yield from self._readline()
+            replies += reply.split(";")
+            nbytes += len(reply) + 1
+
+        self._record("query", command_name(";".join(queries)),
+                     time.perf_counter() - begin, nbytes)
+
+        return replies
+
+    def _get_memory_depth(self):
+        """
+        Returns the memory depth of the oscilloscope.
+
+        Returns:
+        - mdep: an integer representing the memory depth of the oscilloscope.
+        """
+        # ACQuire:MDEPth, plus what is needed to compute it in AUTO mode
+        replies = yield from self._query_batch(MEMORY_DEPTH_QUERIES)
+        return memory_depth(*replies)
+
+    def _active_channels(self):
+        """
+        Returns a list of active channels.
+
+        Returns:
+        - chanlist: a list of strings representing the names of active channels.
+        """
+        replies = yield from self._query_batch([":%s:DISP?" % c
+                                                for c in CHANNELS])
+
+        return [channel for channel, res in zip(CHANNELS, replies)
+                if res == "1"]
+
+    def _get_settings(self):
+        """
+        Returns the acquisition settings snapshot, querying the oscilloscope
+        only if there is no cached one.
+
+        Returns:
+        - settings: a ScopeSettings object.
+        """
+        if self.settings is None:
+            mdep = yield from self._get_memory_depth()
+            channels = yield from self._active_channels()
+            self.settings = ScopeSettings(mdep, channels)
+
+        return self.settings
+
+    def _recv_exact(self, view):
+        """
+        Receives exactly len(view) bytes from the oscilloscope.
+
+        Args:
+        - view: a writable memoryview to fill with the received data.
+        """
+        # Data already buffered by _readline comes first
+        if self._rbuf:
+            nbytes = min(len(view), len(self._rbuf))
+            view[:nbytes] = self._rbuf[:nbytes]
+            del self._rbuf[:nbytes]
+            view = view[nbytes:]
+
+        while len(view):
+            nbytes = yield self._recv_into, view
+            if nbytes == 0:
+                raise ConnectionError("Connection closed by the oscilloscope")
+            view = view[nbytes:]
+
+    def _read_block(self, buf):
+        """
+        Reads an IEEE 488.2 definite length block (#N<len><data>) into a buffer.
+
+        The block is read straight into the given buffer, and the call returns
+        as soon as the announced number of bytes and the terminator arrived.
+
+        Args:
+        - buf: a writable memoryview where the block payload is stored.
+
+        Returns:
+        - length: an integer representing the number of bytes stored in buf.
+        """
+        header = bytearray(2)
+        yield from self._recv_exact(memoryview(header))
+        if header[0:1] != b"#" or not chr(header[1]).isdigit():
+            raise ValueError("Invalid block header: %r" % bytes(header))
+
+        digits = bytearray(int(chr(header[1])))
+        yield from self._recv_exact(memoryview(digits))
+        length = int(digits) if digits else 0
+        if length > len(buf):
+            raise ValueError("Block of %d bytes does not fit in %d byte buffer"
+                             % (length, len(buf)))
+
+        yield from self._recv_exact(buf[:length])
+
+        # Consume the trailing newline
+        yield from self._recv_exact(memoryview(bytearray(1)))
+
+        return length
+
+    def _read_chunk(self, buf):
+        """
+        Reads a :WAV:DATA? block which must fill a buffer exactly.
+
+        Args:
+        - buf: a writable memoryview the size of the chunk requested.
+        """
+        length = yield from self._read_block(buf)
+        if length != len(buf):
+            raise ShortChunkError(length, len(buf))
+
+    def _chunk_range(self, start, mdep):
+        """
+        Returns the commands selecting the chunk starting at a given sample.
+
+        Args:
+        - start: an integer representing the first sample (0 based) of the chunk.
+        - mdep: an integer representing the memory depth.
+
+        Returns:
+        - cmds: a list with the :WAV:STAR and :WAV:STOP commands.
+        """
+        return [":WAV:STAR %d" % (start+1),
+                ":WAV:STOP %d" % min(start+CHUNK_SIZE, mdep)]
+
+    def _get_chan(self, chan, as_list=False):
+        """
+        Returns the waveform data for a specified channel.
+
+        Args:
+        - chan: a string representing the channel to get the waveform data for.
+        - as_list: if True return a list of integers instead of an array (default is False).
+
+        Returns:
+        - response: a uint8 numpy array sharing the received buffer, or a list of integers if as_list is set.
+        """
+        yield from self._cmd_batch([":WAV:SOUR %s" % chan.upper(),
+                                    ":WAV:MODE RAW",
+                                    ":WAV:FORM BYTE"])
+
+        # memory depth and preamble are taken from the settings snapshot
+        settings = yield from self._get_settings()
+        mdep = settings.mdep
+        if chan.upper() not in settings.preambles:
+            settings.preambles[chan.upper()] = parse_preamble(
+                (yield from self._cmd_with_reply(":WAV:PRE?")))
+
+        # Chunks are received in place, avoiding any reallocation
+        response = bytearray(mdep)
+        view = memoryview(response)
+        starts = range(0, mdep, CHUNK_SIZE)
+        requested = time.perf_counter()
+        if self.pipeline and starts:
+            yield from self._cmd_batch(self._chunk_range(starts[0], mdep) +
+                                       [":WAV:DATA?"])
+
+        received = 0
+        for n, i in enumerate(starts):
+            chunk = view[i:min(i + CHUNK_SIZE, mdep)]
+            length = len(chunk)
+            retried = False
+            try:
+                if not self.pipeline:
+                    requested = time.perf_counter()
+                    yield from self._cmd_batch(self._chunk_range(i, mdep) +
+                                               [":WAV:DATA?"])
+                elif n + 1 < len(starts):
+                    # Queue the next range while the current block is arriving
+                    yield from self._cmd_batch(
+                        self._chunk_range(starts[n+1], mdep))
+
+                yield from self._read_chunk(chunk)
+            except (OSError, ValueError) as e:
+                # Only this chunk is downloaded again, the previous ones are good
+                length = yield from self._retry_chunk(chan, n, i, mdep, chunk, e)
+                retried = True
+            received = i + length
+
+            # A chunk lasts from its :WAV:DATA? to its last byte
+            self._record("chunk", chan.upper(), time.perf_counter() - requested,
+                         length, chunk=n)
+
+            if self.pipeline and n + 1 < len(starts):
+                requested = time.perf_counter()
+                if retried:
+                    # The retry replaced the range queued for the next chunk
+                    yield from self._cmd_batch(
+                        self._chunk_range(starts[n+1], mdep) + [":WAV:DATA?"])
+                else:
+                    yield from self._cmd(":WAV:DATA?")
+
+            chunk.release()
+
+        view.release()
+        del response[received:]
+
+        if as_list:
+            return list(response)
+
+        return np.frombuffer(response, dtype=np.uint8)
+
+    def _resync(self, error):
+        """
+        Brings the connection back to a known state after a failed reply:
+        the rest of the reply is read and dropped until the scope goes
+        quiet, or the connection is reopened if it was lost.
+
+        Args:
+        - error: the exception raised by the failed reply.
+        """
+        # A short block was read to its end, nothing is left to drop
+        if isinstance(error, ShortChunkError):
+            return
+
+        if not isinstance(error, ConnectionError) and self.socket is not None:
+            del self._rbuf[:]
+            if (yield self._drain,):
+                return
+
+        # The connection was lost, or closed while draining
+        yield self.reconnect,
+
+    def _retry_chunk(self, chan, n, start, mdep, buf, error):
+        """
+        Downloads a chunk again on its own after it failed, with a bounded
+        number of attempts and a growing delay between them.
+
+        The last chunk may really be shorter, when the memory depth computed
+        in AUTO mode is larger than the samples stored: two short replies of
+        the same length in a row are taken as the end of the channel.
+
+        Args:
+        - chan: a string representing the channel of the chunk.
+        - n: an integer representing the index of the chunk.
+        - start: an integer representing the first sample (0 based) of the chunk.
+        - mdep: an integer representing the memory depth.
+        - buf: a writable memoryview the size of the chunk.
+        - error: the exception raised by the failed attempt.
+
+        Returns:
+        - length: an integer representing the number of bytes stored in buf.
+        """
+        last = start + len(buf) >= mdep
+        short = error.length if isinstance(error, ShortChunkError) else None
+        backoff = trigger.Backoff(0.01, 1.0)
+        for attempt in range(1, self.retries + 1):
+            self._record("retry", chan.upper(), 0, chunk=n, attempt=attempt,
+                         error=str(error))
+
+            yield self._sleep, backoff.next()
+            try:
+                yield from self._resync(error)
+
+                # The connection may be new, select the source again
+                yield from self._cmd_batch([":WAV:SOUR %s" % chan.upper(),
+                                            ":WAV:MODE RAW",
+                                            ":WAV:FORM BYTE"] +
+                                           self._chunk_range(start, mdep) +
+                                           [":WAV:DATA?"])
+                yield from self._read_chunk(buf)
+                return len(buf)
+            except ShortChunkError as e:
+                if last and e.length == short:
+                    return e.length
+                short = e.length
+                error = e
+            except (OSError, ValueError) as e:
+                short = None
+                error = e
+
+        raise TransferError("Chunk %d of %s failed after %d retries: %s"
+                            % (n, chan.upper(), self.retries, error)) from error
+
+    def _get_all_chans(self, as_list=False):
+        """
+        Returns the waveform data for all active channels.
+
+        Args:
+        - as_list: if True return lists of integers instead of arrays (default is False).
+
+        Returns:
+        - chans: a dictionary where the keys are channel names and the values are uint8 numpy arrays (or lists) with the waveform data for each channel.
+        """
+        chans = {}
+        for channel in (yield from self._get_settings()).channels:
+            chans[channel] = yield from self._get_chan(channel, as_list)
+
+        return chans
+
+
+class Scope(ScopeProtocol):
+    """
+    A class representing an oscilloscope, over a blocking socket.
 
     Attributes:
     - socket: a socket object representing the connection to the oscilloscope.
+    - settings: the cached ScopeSettings snapshot, or None if not taken yet.
+    - pipeline: whether get_chan queues the next chunk range while a block is still arriving.
+    - telemetry: the telemetry.Telemetry recording every command and chunk, or None.
+    - timeout: a float representing the seconds a reply may stall, or None to wait forever.
+    - retries: an integer representing how many times a failed chunk is requested again.
 
     Methods:
-    - __init__(self, host, port=5555): initializes the socket object and connects to the oscilloscope.
+    - __init__(self, host, port=5555, pipeline=True, telemetry=None, timeout=TIMEOUT, retries=CHUNK_RETRIES): initializes the socket object and connects to the oscilloscope.
+    - reconnect(self): opens a new connection to the oscilloscope.
     - cmd(self, cmd): sends a command to the oscilloscope.
     - cmd_with_reply(self, cmd): sends a command to the oscilloscope and returns the reply.
+    - cmd_batch(self, cmds): sends several commands joined with semicolons.
+    - query_batch(self, queries): sends several queries at once and returns their replies.
     - get_memory_depth(self): returns the memory depth of the oscilloscope.
+    - get_settings(self): returns the cached acquisition settings snapshot.
+    - invalidate_settings(self): drops the cached settings snapshot.
+    - close(self): closes the socket connection.
     - __del__(self): closes the socket connection.
-    - get_chan(self, chan): returns the waveform data for a specified channel.
-    - get_all_chans(self): returns the waveform data for all active channels.
+    - read_block(self, buf): reads an IEEE 488.2 definite length block into a buffer.
+    - get_chan(self, chan, as_list=False): returns the waveform data for a specified channel.
+    - get_all_chans(self, as_list=False): returns the waveform data for all active channels.
     - active_channels(self): returns a list of active channels.
     """
 
     socket = None
 
-    def __init__(self, host, port=5555):
+    def __init__(self, host, port=5555, pipeline=True, telemetry=None,
+                 timeout=TIMEOUT, retries=CHUNK_RETRIES):
         """
         Initializes the socket object and connects to the oscilloscope.
 
         Args:
         - host: a string representing the IP address of the oscilloscope.
         - port: an integer representing the port number to connect to (default is 5555).
+        - pipeline: a boolean enabling command pipelining in get_chan (default is True).
+        - telemetry: a telemetry.Telemetry recording every command and chunk (default is None).
+        - timeout: a float representing the seconds a reply may stall (default is TIMEOUT).
+        - retries: an integer representing how many times a failed chunk is requested again (default is CHUNK_RETRIES).
         """
+        self.host = host
+        self.port = port
+        self.pipeline = pipeline
+        self.telemetry = telemetry
+        self.timeout = timeout
+        self.retries = retries
+        self._connect()
+
+    def _connect(self):
+        """
+        Opens the socket and connects to the oscilloscope.
+        """
+        self._rbuf = bytearray()
         self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        self.socket.connect((host, port))
+        configure_socket(self.socket)
+        self.socket.settimeout(self.timeout)
+
+        begin = time.perf_counter()
+        self.socket.connect((self.host, self.port))
+        self._record("connect", "%s:%d" % (self.host, self.port),
+                     time.perf_counter() - begin)
+
+    def reconnect(self):
+        """
+        Closes the connection and opens a new one. The settings snapshot is
+        kept, the scope setup does not change with the connection.
+        """
+        self.close()
+        self._connect()
+
+    def close(self):
+        """
+        Closes the socket connection.
+        """
+        if self.socket is not None:
+            self.socket.close()
+            self.socket = None
+
+    def __del__(self):
+        """
+        Closes the socket connection.
+        """
+        self.close()
+
+    def _run(self, steps):
+        """
+        Runs a command of ScopeProtocol, performing its socket operations
+        with blocking calls.
+
+        Args:
+        - steps: the generator returned by the command.
+
+        Returns:
+        - result: the value returned by the command.
+        """
+        result, error = None, None
+        while True:
+            try:
+                if error is None:
+                    func, *args = steps.send(result)
+                else:
+                    func, *args = steps.throw(error)
+            except StopIteration as stop:
+                return stop.value
+
+            try:
+                result, error = func(*args), None
+            except Exception as e:
+                result, error = None, e
+
+    def _send(self, cmd):
+        """
+        Sends a command line to the oscilloscope.
+
+        Args:
+        - cmd: a string representing the command to send.
+
+        Returns:
+        - nbytes: an integer representing the number of bytes sent.
+        """
+        message = ("%s\n" % cmd).encode()
+        self.socket.sendall(message)
+        return len(message)
+
+    def _recv(self, size):
+        """
+        Receives up to size bytes, b"" once the connection is closed.
+        """
+        return self.socket.recv(size)
+
+    def _recv_into(self, view):
+        """
+        Receives up to len(view) bytes into view and returns their number.
+        """
+        return self.socket.recv_into(view)
+
+    def _drain(self):
+        """
+        Drops the incoming data until the scope is quiet for DRAIN_TIME.
+
+        Returns:
+        - quiet: a boolean, False if the connection was closed instead.
+        """
+        self.socket.settimeout(DRAIN_TIME)
+        try:
+            while self.socket.recv(65536):
+                pass
+        except socket.timeout:
+            return True
+        finally:
+            if self.socket is not None:
+                self.socket.settimeout(self.timeout)
+
+        return False
+
+    def _sleep(self, seconds):
+        """
+        Waits for a number of seconds.
+        """
+        time.sleep(seconds)
 
     def cmd(self, cmd):
         """
@@ -40,7 +712,16 @@ class Scope:
         Args:
         - cmd: a string representing the command to send.
         """
-        self.socket.send(("%s\n" % cmd).encode())
+        self._run(self._cmd(cmd))
+
+    def cmd_batch(self, cmds):
+        """
+        Sends several commands to the oscilloscope in a single message.
+
+        Args:
+        - cmds: a list of strings representing the commands to send.
+        """
+        self._run(self._cmd_batch(cmds))
 
     def cmd_with_reply(self, cmd):
         """
@@ -52,10 +733,20 @@ class Scope:
         Returns:
         - reply: a string representing the reply from the oscilloscope.
         """
-        self.cmd(cmd)
-        reply = self.socket.recv(1024)
-        return reply[:-1].decode()
-    
+        return self._run(self._cmd_with_reply(cmd))
+
+    def query_batch(self, queries):
+        """
+        Sends several queries in a single message and returns their replies.
+
+        Args:
+        - queries: a list of strings representing the queries to send.
+
+        Returns:
+        - replies: a list of strings with one reply per query.
+        """
+        return self._run(self._query_batch(queries))
+
     def get_memory_depth(self):
         """
         Returns the memory depth of the oscilloscope.
@@ -63,72 +754,54 @@ class Scope:
         Returns:
         - mdep: an integer representing the memory depth of the oscilloscope.
         """
-        # Define number of horizontal grid divisions for DS1054Z
-        h_grid = 12
+        return self._run(self._get_memory_depth())
 
-        # ACQuire:MDEPth
-        mdep = self.cmd_with_reply(":ACQ:MDEP?")
-
-        if mdep == "AUTO":
-            srate = self.cmd_with_reply(":ACQ:SRAT?")
-            scal = self.cmd_with_reply(":TIM:SCAL?")
+    def get_settings(self):
+        """
+        Returns the acquisition settings snapshot, querying the oscilloscope
+        only if there is no cached one.
 
-            mdep = h_grid * float(scal) * float(srate)
+        Returns:
+        - settings: a ScopeSettings object.
+        """
+        return self._run(self._get_settings())
 
-        return int(mdep)
-    
-    def __del__(self):
+    def read_block(self, buf):
         """
-        Closes the socket connection.
+        Reads an IEEE 488.2 definite length block (#N<len><data>) into a buffer.
+
+        Args:
+        - buf: a writable memoryview where the block payload is stored.
+
+        Returns:
+        - length: an integer representing the number of bytes stored in buf.
         """
-        self.socket.close()
-    
-    def get_chan(self, chan):
+        return self._run(self._read_block(buf))
+
+    def get_chan(self, chan, as_list=False):
         """
         Returns the waveform data for a specified channel.
 
         Args:
         - chan: a string representing the channel to get the waveform data for.
+        - as_list: if True return a list of integers instead of an array (default is False).
 
         Returns:
-        - response: a list of integers representing the waveform data for the specified channel.
+        - response: a uint8 numpy array sharing the received buffer, or a list of integers if as_list is set.
         """
-        self.cmd(":WAV:SOUR %s" % chan.upper())
-        self.cmd(":WAV:MODE RAW")
-        self.cmd(":WAV:FORM BYTE")
-
-        # get memory depth
-        mdep = self.get_memory_depth()
-
-        response = b''
-        for i in range(0, mdep, 250000):
-            self.cmd(":WAV:STAR %d" % (i+1))
-            self.cmd(":WAV:STOP %d" % min(i+250000, mdep))
-            self.cmd(":WAV:DATA?")
+        return self._run(self._get_chan(chan, as_list))
 
-            # Receive response over TCP connection until no more data
-            response += self.socket.recv(260000)[11:]
-            while True:
-                rlist, _, _ = select.select([self.socket], [], [], 0.1)
-                if not self.socket in rlist:
-                    break
-                response += self.socket.recv(260000)
-            response = response[:-1]
-
-        return list(response)
-    
-    def get_all_chans(self):
+    def get_all_chans(self, as_list=False):
         """
         Returns the waveform data for all active channels.
 
+        Args:
+        - as_list: if True return lists of integers instead of arrays (default is False).
+
         Returns:
-        - chans: a dictionary where the keys are channel names and the values are lists of integers representing the waveform data for each channel.
+        - chans: a dictionary where the keys are channel names and the values are uint8 numpy arrays (or lists) with the waveform data for each channel.
         """
-        chans = {}
-        for channel in self.active_channels():
-            chans[channel] = self.get_chan(channel)
-
-        return chans
+        return self._run(self._get_all_chans(as_list))
 
     def active_channels(self):
         """
@@ -137,11 +810,116 @@ class Scope:
         Returns:
         - chanlist: a list of strings representing the names of active channels.
         """
-        chanlist = []
-        for channel in ["CHAN1", "CHAN2", "CHAN3", "CHAN4"]:
-            res = self.cmd_with_reply(":%s:DISP?" % channel)
-            if res == "1":
-                chanlist.append(channel)
+        return self._run(self._active_channels())
+
+
+class Session:
+    """
+    A long-lived connection to an oscilloscope shared by all acquisition modes.
+
+    The connection is opened on first use and reopened automatically when it
+    is reset. Access is serialized, so commands of different users of the
+    session never interleave on the socket.
+
+    Attributes:
+    - host: a string representing the IP address of the oscilloscope.
+    - port: an integer representing the port number of the oscilloscope.
+    - retries: an integer representing how many times a call is retried after a reconnect.
+    - scope: the connected Scope object, or None if not connected.
+    - telemetry: the telemetry.Telemetry handed to every Scope connected, or None.
+
+    Methods:
+    - __init__(self, host, port=5555, retries=1, telemetry=None): initializes the session without connecting.
+    - __enter__(self): locks the session and returns a connected Scope.
+    - __exit__(self, *exc): unlocks the session.
+    - run(self, func, *args): calls func(scope, *args) reconnecting on connection errors.
+    - cmd_with_reply(self, cmd): sends a query, locking the session only for it.
+    - close(self): closes the connection.
+    """
+
+    def __init__(self, host, port=5555, retries=1, telemetry=None):
+        """
+        Initializes the session. The connection is opened on first use.
+
+        Args:
+        - host: a string representing the IP address of the oscilloscope.
+        - port: an integer representing the port number to connect to (default is 5555).
+        - retries: an integer representing how many reconnects are attempted per call (default is 1).
+        - telemetry: a telemetry.Telemetry recording every command and chunk (default is None).
+        """
+        self.host = host
+        self.port = port
+        self.retries = retries
+        self.telemetry = telemetry
+        self.scope = None
+        self.lock = threading.RLock()
+
+    def __enter__(self):
+        """
+        Locks the session and returns a connected Scope.
+        """
+        self.lock.acquire()
+        try:
+            if self.scope is None:
+                self.scope = Scope(self.host, self.port,
+                                   telemetry=self.telemetry)
+        except:
+            self.lock.release()
+            raise
+
+        return self.scope
+
+    def __exit__(self, exc_type, exc, tb):
+        """
+        Unlocks the session, dropping the connection if it failed.
+        """
+        if exc_type is not None and issubclass(exc_type, OSError):
+            self.close()
+        self.lock.release()
+
+    def run(self, func, *args):
+        """
+        Calls func(scope, *args) with exclusive access to the scope.
+
+        If the connection is reset the scope is reconnected and the call is
+        retried from the start, up to the configured number of retries.
+
+        Args:
+        - func: a callable taking a Scope as first argument.
+        - args: extra arguments for func.
+
+        Returns:
+        - result: the value returned by func.
+        """
+        attempt = 0
+        while True:
+            try:
+                with self as scope:
+                    return func(scope, *args)
+            except OSError:
+                attempt += 1
+                if attempt > self.retries:
+                    raise
 
-        return chanlist
+    def cmd_with_reply(self, cmd):
+        """
+        Sends a command and returns its reply, locking the session only for
+        this query. Lets a session stand for a Scope in trigger.TriggerWait,
+        so other users can use the session between the polls.
+
+        Args:
+        - cmd: a string representing the command to send.
 
+        Returns:
+        - reply: a string representing the reply of the scope.
+        """
+        return self.run(lambda scope: scope.cmd_with_reply(cmd))
+
+    def close(self):
+        """
+        Closes the connection. The next use of the session reconnects.
+        """
+        with self.lock:
+            if self.scope is not None:
+                self.scope.close()
+                self.scope = None
@@ -0,0 +1,516 @@
+import time
+import socket
+import asyncio
+import capture
+import trigger
+from ds1000z import (CHUNK_RETRIES, DRAIN_TIME, TIMEOUT, ScopeProtocol,
+                     configure_socket)
+
+
+class AsyncScope(ScopeProtocol):
+    """
+    An asyncio version of ds1000z.Scope.
+
+    The commands are the same, but every call that talks to the oscilloscope
+    is a coroutine, so several scopes can be driven from a single event loop:
+    while one scope is waiting for its trigger or sending a block, the others
+    keep going. A single scope still executes its commands one at a time.
+    The commands themselves are the ones of ds1000z.ScopeProtocol, only the
+    socket operations are awaited here.
+
+    Attributes:
+    - host: a string representing the IP address of the oscilloscope.
+    - port: an integer representing the port number of the oscilloscope.
+    - socket: the non-blocking socket connected to the oscilloscope, or None.
+    - settings: the cached ds1000z.ScopeSettings snapshot, or None if not taken yet.
+    - pipeline: whether get_chan queues the next chunk range while a block is still arriving.
+    - telemetry: the telemetry.Telemetry recording every command and chunk, or None.
+    - timeout: a float representing the seconds a reply may stall, or None to wait forever.
+    - retries: an integer representing how many times a failed chunk is requested again.
+
+    Methods:
+    - __init__(self, host, port=5555, pipeline=True, telemetry=None, timeout=TIMEOUT, retries=CHUNK_RETRIES): initializes the scope without connecting.
+    - connect(self): connects to the oscilloscope.
+    - reconnect(self): opens a new connection to the oscilloscope.
+    - cmd(self, cmd): sends a command to the oscilloscope.
+    - cmd_batch(self, cmds): sends several commands joined with semicolons.
+    - cmd_with_reply(self, cmd): sends a command to the oscilloscope and returns the reply.
+    - query_batch(self, queries): sends several queries at once and returns their replies.
+    - get_memory_depth(self): returns the memory depth of the oscilloscope.
+    - get_settings(self): returns the cached acquisition settings snapshot.
+    - invalidate_settings(self): drops the cached settings snapshot.
+    - read_block(self, buf): reads an IEEE 488.2 definite length block into a buffer.
+    - get_chan(self, chan): returns the waveform data for a specified channel.
+    - get_all_chans(self): returns the waveform data for all active channels.
+    - active_channels(self): returns a list of active channels.
+    - close(self): closes the socket connection.
+    """
+
+    socket = None
+
+    def __init__(self, host, port=5555, pipeline=True, telemetry=None,
+                 timeout=TIMEOUT, retries=CHUNK_RETRIES):
+        """
+        Initializes the scope. The connection is opened by connect().
+
+        Args:
+        - host: a string representing the IP address of the oscilloscope.
+        - port: an integer representing the port number to connect to (default is 5555).
+        - pipeline: a boolean enabling command pipelining in get_chan (default is True).
+        - telemetry: a telemetry.Telemetry recording every command and chunk (default is None).
+        - timeout: a float representing the seconds a reply may stall (default is TIMEOUT).
+        - retries: an integer representing how many times a failed chunk is requested again (default is CHUNK_RETRIES).
+        """
+        self.host = host
+        self.port = port
+        self.pipeline = pipeline
+        self.telemetry = telemetry
+        self.timeout = timeout
+        self.retries = retries
+        self._rbuf = bytearray()
+
+    def __str__(self):
+        return "%s:%d" % (self.host, self.port)
+
+    async def __aenter__(self):
+        await self.connect()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.close()
+
+    def _record(self, kind, name, seconds, nbytes=0, **fields):
+        """
+        Records a duration in the telemetry, tagged with the scope address.
+        """
+        if self.telemetry is not None:
+            self.telemetry.record(kind, name, seconds, nbytes, scope=str(self),
+                                  **fields)
+
+    async def connect(self):
+        """
+        Connects to the oscilloscope.
+        """
+        loop = asyncio.get_running_loop()
+        self._rbuf = bytearray()
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        configure_socket(self.socket)
+        self.socket.setblocking(False)
+
+        begin = time.perf_counter()
+        try:
+            await self._wait(loop.sock_connect(self.socket,
+                                               (self.host, self.port)))
+        except:
+            self.close()
+            raise
+        self._record("connect", str(self), time.perf_counter() - begin)
+
+    async def reconnect(self):
+        """
+        Closes the connection and opens a new one. The settings snapshot is
+        kept, the scope setup does not change with the connection.
+        """
+        self.close()
+        await self.connect()
+
+    def close(self):
+        """
+        Closes the socket connection.
+        """
+        if self.socket is not None:
+            self.socket.close()
+            self.socket = None
+
+    async def _run(self, steps):
+        """
+        Runs a command of ds1000z.ScopeProtocol, awaiting its socket
+        operations.
+
+        Args:
+        - steps: the generator returned by the command.
+
+        Returns:
+        - result: the value returned by the command.
+        """
+        result, error = None, None
+        while True:
+            try:
+                if error is None:
+                    func, *args = steps.send(result)
+                else:
+                    func, *args = steps.throw(error)
+            except StopIteration as stop:
+                return stop.value
+
+            try:
+                result, error = await func(*args), None
+            except Exception as e:
+                result, error = None, e
+
+    async def _wait(self, awaitable, timeout=None):
+        """
+        Waits for a socket operation, raising TimeoutError like a blocking
+        socket would if it takes longer than the timeout.
+        """
+        timeout = timeout or self.timeout
+        if timeout is None:
+            return await awaitable
+
+        try:
+            return await asyncio.wait_for(awaitable, timeout)
+        except asyncio.TimeoutError:
+            raise TimeoutError("No reply from %s in %.1f s" % (self, timeout))
+
+    async def _send(self, cmd):
+        """
+        Sends a command line to the oscilloscope.
+
+        Args:
+        - cmd: a string representing the command to send.
+
+        Returns:
+        - nbytes: an integer representing the number of bytes sent.
+        """
+        message = ("%s\n" % cmd).encode()
+        await asyncio.get_running_loop().sock_sendall(self.socket, message)
+        return len(message)
+
+    async def _recv(self, size):
+        """
+        Receives up to size bytes, b"" once the connection is closed.
+        """
+        loop = asyncio.get_running_loop()
+        return await self._wait(loop.sock_recv(self.socket, size))
+
+    async def _recv_into(self, view):
+        """
+        Receives up to len(view) bytes into view and returns their number.
+        """
+        loop = asyncio.get_running_loop()
+        return await self._wait(loop.sock_recv_into(self.socket, view))
+
+    async def _drain(self):
+        """
+        Drops the incoming data until the scope is quiet for DRAIN_TIME.
+
+        Returns:
+        - quiet: a boolean, False if the connection was closed instead.
+        """
+        loop = asyncio.get_running_loop()
+        try:
+            while await self._wait(loop.sock_recv(self.socket, 65536),
+                                   DRAIN_TIME):
+                pass
+        except TimeoutError:
+            return True
+
+        return False
+
+    async def _sleep(self, seconds):
+        """
+        Waits for a number of seconds without blocking the event loop.
+        """
+        await asyncio.sleep(seconds)
+
+    async def cmd(self, cmd):
+        """
+        Sends a command to the oscilloscope.
+
+        Args:
+        - cmd: a string representing the command to send.
+        """
+        await self._run(self._cmd(cmd))
+
+    async def cmd_batch(self, cmds):
+        """
+        Sends several commands to the oscilloscope in a single message.
+
+        Args:
+        - cmds: a list of strings representing the commands to send.
+        """
+        await self._run(self._cmd_batch(cmds))
+
+    async def cmd_with_reply(self, cmd):
+        """
+        Sends a command to the oscilloscope and returns the reply.
+
+        Args:
+        - cmd: a string representing the command to send.
+
+        Returns:
+        - reply: a string representing the reply from the oscilloscope.
+        """
+        return await self._run(self._cmd_with_reply(cmd))
+
+    async def query_batch(self, queries):
+        """
+        Sends several queries in a single message and returns their replies.
+
+        Args:
+        - queries: a list of strings representing the queries to send.
+
+        Returns:
+        - replies: a list of strings with one reply per query.
+        """
+        return await self._run(self._query_batch(queries))
+
+    async def get_memory_depth(self):
+        """
+        Returns the memory depth of the oscilloscope.
+
+        Returns:
+        - mdep: an integer representing the memory depth of the oscilloscope.
+        """
+        return await self._run(self._get_memory_depth())
+
+    async def get_settings(self):
+        """
+        Returns the acquisition settings snapshot, querying the oscilloscope
+        only if there is no cached one.
+
+        Returns:
+        - settings: a ds1000z.ScopeSettings object.
+        """
+        return await self._run(self._get_settings())
+
+    async def read_block(self, buf):
+        """
+        Reads an IEEE 488.2 definite length block (#N<len><data>) into a buffer.
+
+        Args:
+        - buf: a writable memoryview where the block payload is stored.
+
+        Returns:
+        - length: an integer representing the number of bytes stored in buf.
+        """
+        return await self._run(self._read_block(buf))
+
+    async def get_chan(self, chan):
+        """
+        Returns the waveform data for a specified channel.
+
+        Args:
+        - chan: a string representing the channel to get the waveform data for.
+
+        Returns:
+        - response: a uint8 numpy array sharing the received buffer.
+        """
+        return await self._run(self._get_chan(chan))
+
+    async def get_all_chans(self):
+        """
+        Returns the waveform data for all active channels.
+
+        Returns:
+        - chans: a dictionary where the keys are channel names and the values are uint8 numpy arrays.
+        """
+        return await self._run(self._get_all_chans())
+
+    async def active_channels(self):
+        """
+        Returns a list of active channels.
+
+        Returns:
+        - chanlist: a list of strings representing the names of active channels.
+        """
+        return await self._run(self._active_channels())
+
+
+class AsyncTriggerWait(trigger.TriggerWait):
+    """
+    A trigger.TriggerWait for an AsyncScope: arm() and wait() are coroutines,
+    and the polling interval is slept without blocking the event loop. The
+    backoff and the latency histograms are the same.
+    """
+
+    async def arm(self, scope):
+        """
+        Arms a single trigger, dropping the settings snapshot of the scope.
+
+        Args:
+        - scope: the AsyncScope to arm.
+        """
+        scope.invalidate_settings()
+        if self.use_opc:
+            await scope.cmd_batch(["*CLS", ":SING", "*OPC"])
+        else:
+            await scope.cmd(":SING")
+        self.armedAt = time.monotonic()
+        self.triggeredAt = None
+
+    async def wait(self, scope, stop=None):
+        """
+        Waits until the trigger status is STOP.
+
+        Args:
+        - scope: the AsyncScope to wait for.
+        - stop: an asyncio.Event which aborts the wait when set (default is None).
+
+        Returns:
+        - triggered: a boolean, False if the wait was aborted.
+        """
+        if self.armedAt is None:
+            self.armedAt = time.monotonic()
+
+        if self.use_opc and not await self._poll(scope, "*ESR?",
+                                                 trigger.opc_done, stop):
+            return False
+        if not await self._poll(scope, ":TRIG:STAT?", trigger.trigger_done,
+                                stop):
+            return False
+
+        self.backoff.reset()
+        self.triggeredAt = time.monotonic()
+        self.armToTrigger.record(self.triggeredAt - self.armedAt)
+        self.armedAt = None
+
+        return True
+
+    async def _poll(self, scope, query, done, stop):
+        """
+        Repeats a query, sleeping the backoff delays, until its reply is done.
+
+        Returns:
+        - done: a boolean, False if the wait was aborted.
+        """
+        while not done(await scope.cmd_with_reply(query)):
+            delay = self.backoff.next()
+            if stop is None:
+                await asyncio.sleep(delay)
+                continue
+
+            try:
+                await asyncio.wait_for(stop.wait(), delay)
+                return False
+            except asyncio.TimeoutError:
+                pass
+
+        return True
+
+
+class Coordinator:
+    """
+    Acquires from several oscilloscopes at once, e.g. one per device under
+    test, on a single event loop.
+
+    All the scopes are armed back to back, then every scope waits for its
+    trigger and downloads its capture concurrently, so a round of captures
+    takes as long as the slowest scope instead of the sum of all of them.
+
+    Attributes:
+    - scopes: a list of AsyncScope objects.
+    - triggers: a list of AsyncTriggerWait objects, one per scope.
+
+    Methods:
+    - __init__(self, addresses, pipeline=True, telemetry=None, use_opc=False): initializes the scopes without connecting.
+    - connect(self): connects to all the scopes.
+    - arm(self): arms the scopes which are not armed yet.
+    - acquire(self, rearm=False, stop=None): acquires a capture from every scope.
+    - close(self): closes all the connections.
+    """
+
+    def __init__(self, addresses, pipeline=True, telemetry=None,
+                 use_opc=False):
+        """
+        Initializes the coordinator. The connections are opened by connect().
+
+        Args:
+        - addresses: a list of (host, port) tuples.
+        - pipeline: a boolean enabling command pipelining in get_chan (default is True).
+        - telemetry: a telemetry.Telemetry shared by all the scopes (default is None).
+        - use_opc: a boolean enabling the *OPC wait of the triggers (default is False).
+        """
+        self.scopes = [AsyncScope(host, port, pipeline, telemetry)
+                       for host, port in addresses]
+        self.triggers = [AsyncTriggerWait(use_opc=use_opc)
+                         for _ in self.scopes]
+        self.armed = [False] * len(self.scopes)
+
+    def __len__(self):
+        return len(self.scopes)
+
+    async def __aenter__(self):
+        await self.connect()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.close()
+
+    async def connect(self):
+        """
+        Connects to all the scopes and drops their settings snapshots.
+        """
+        try:
+            await asyncio.gather(*[scope.connect() for scope in self.scopes])
+        except:
+            self.close()
+            raise
+
+        for scope in self.scopes:
+            scope.invalidate_settings()
+
+    async def _arm(self, i):
+        """
+        Arms a scope unless it is already armed.
+        """
+        if not self.armed[i]:
+            await self.triggers[i].arm(self.scopes[i])
+            self.armed[i] = True
+
+    async def arm(self):
+        """
+        Arms the scopes which are not armed yet.
+        """
+        await asyncio.gather(*[self._arm(i) for i in range(len(self.scopes))])
+
+    async def acquire_one(self, i, rearm=False, stop=None):
+        """
+        Waits for the trigger of a scope and downloads its capture.
+
+        Args:
+        - i: an integer representing the index of the scope.
+        - rearm: a boolean, arm the next trigger as soon as the data is downloaded (default is False).
+        - stop: an asyncio.Event which aborts the wait when set (default is None).
+
+        Returns:
+        - data: the capture.Capture, or None if the wait was aborted.
+        """
+        scope, triggerWait = self.scopes[i], self.triggers[i]
+        await self._arm(i)
+        if not await triggerWait.wait(scope, stop):
+            return None
+
+        chans = await scope.get_all_chans()
+        data = capture.Capture(chans, (await scope.get_settings()).preambles)
+        triggerWait.downloaded()
+        self.armed[i] = False
+
+        # The scope acquires the next capture while the others download
+        if rearm:
+            await self._arm(i)
+
+        return data
+
+    async def acquire(self, rearm=False, stop=None):
+        """
+        Arms every scope not armed yet, then waits for their triggers and
+        downloads their captures concurrently.
+
+        Args:
+        - rearm: a boolean, re-arm every scope right after its download (default is False).
+        - stop: an asyncio.Event which aborts the waits when set (default is None).
+
+        Returns:
+        - captures: a list with the capture.Capture of every scope, in the order of scopes, None for the aborted ones.
+        """
+        await self.arm()
+        return await asyncio.gather(*[self.acquire_one(i, rearm, stop)
+                                      for i in range(len(self.scopes))])
+
+    def close(self):
+        """
+        Closes all the connections.
+        """
+        for scope in self.scopes:
+            scope.close()
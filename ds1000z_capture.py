@@ -0,0 +1,320 @@
+#!/usr/bin/env python3
+
+import os
+import sys
+import time
+import queue
+import asyncio
+import argparse
+import threading
+import ds1000z
+import ds1000z_async
+import capfile
+import capture
+import trigger
+import telemetry
+
+# single arms the scope when ready for the next capture, loop re-arms it
+# right after each download so it acquires while the capture is written
+MODES = ["single", "loop"]
+
+
+class CaptureWriter:
+    """
+    Writes captures to a directory on a worker thread, so downloading the
+    next capture overlaps writing the previous one.
+
+    Attributes:
+    -----------
+    directory : str
+        The directory the captures are written to.
+    prefix : str
+        The start of the file names.
+    written : int
+        The number of captures written.
+    error : Exception
+        The error that stopped the writer, if any.
+    """
+
+    def __init__(self, directory, prefix="capture", maxsize=4):
+        """
+        Constructs the writer and starts its thread.
+
+        Parameters:
+        -----------
+        directory : str
+            The directory the captures are written to, created if missing.
+        prefix : str
+            The start of the file names.
+        maxsize : int
+            The number of captures that can wait to be written.
+        """
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.prefix = prefix
+        self.written = 0
+        self.error = None
+        self.queue = queue.Queue(maxsize)
+        self.thread = threading.Thread(target=self.run)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def put(self, scopeData):
+        """
+        Queues a capture, waiting while the queue is full.
+
+        Parameters:
+        -----------
+        scopeData : capture.Capture
+            The capture to write.
+        """
+        if self.error is not None:
+            raise self.error
+
+        self.queue.put(scopeData)
+
+    def run(self):
+        """
+        Writes the queued captures until close() is called.
+        """
+        index = 0
+        while True:
+            scopeData = self.queue.get()
+            if scopeData is None:
+                break
+            if self.error is not None:
+                continue
+
+            index += 1
+            fileName = os.path.join(self.directory, "%s_%06d%s"
+                                    % (self.prefix, index, capfile.EXTENSION))
+            try:
+                capfile.save_capture(fileName, scopeData)
+            except OSError as e:
+                self.error = e
+                continue
+
+            self.written += 1
+
+    def close(self):
+        """
+        Writes the captures still queued and stops the thread.
+        """
+        self.queue.put(None)
+        self.thread.join()
+
+
+def acquire(scope, count, mode, writer, progress=None, triggerWait=None):
+    """
+    Acquires captures and hands them to a writer.
+
+    Parameters:
+    -----------
+    scope : ds1000z.Scope
+        The connected scope.
+    count : int
+        The number of captures, None to acquire until interrupted.
+    mode : str
+        One of MODES.
+    writer : CaptureWriter
+        Receives the captures.
+    progress : callable
+        Called with the number of captures and bytes downloaded so far.
+    triggerWait : trigger.TriggerWait
+        Waits for the triggers and records their latencies, a new one if
+        None. Passing one keeps the latencies if the acquisition is
+        interrupted.
+
+    Returns:
+    --------
+    trigger.TriggerWait: The trigger wait, holding the latency histograms.
+    """
+    triggerWait = triggerWait or trigger.TriggerWait()
+    scope.invalidate_settings()
+
+    acquired = 0
+    downloaded = 0
+    armed = False
+    while count is None or acquired < count:
+        if not armed:
+            triggerWait.arm(scope)
+        triggerWait.wait(scope)
+
+        scopeData = capture.Capture(scope.get_all_chans(),
+                                    scope.get_settings().preambles)
+        triggerWait.downloaded()
+        acquired += 1
+        downloaded += scopeData.nbytes()
+
+        armed = mode == "loop" and acquired != count
+        if armed:
+            triggerWait.arm(scope)
+
+        writer.put(scopeData)
+        if progress is not None:
+            progress(acquired, downloaded)
+
+    return triggerWait
+
+
+async def acquire_all(coordinator, count, mode, writers, progress=None):
+    """
+    Acquires captures from several scopes at once and hands each scope's
+    captures to its writer.
+
+    Parameters:
+    -----------
+    coordinator : ds1000z_async.Coordinator
+        The scopes, not connected yet.
+    count : int
+        The number of captures per scope, None to acquire until interrupted.
+    mode : str
+        One of MODES.
+    writers : list
+        A CaptureWriter per scope.
+    progress : callable
+        Called with the number of rounds and bytes downloaded so far.
+
+    Returns:
+    --------
+    list: The ds1000z_async.AsyncTriggerWait of every scope.
+    """
+    await coordinator.connect()
+
+    acquired = 0
+    downloaded = 0
+    while count is None or acquired < count:
+        rearm = mode == "loop" and acquired + 1 != count
+        captures = await coordinator.acquire(rearm)
+        acquired += 1
+
+        for writer, scopeData in zip(writers, captures):
+            downloaded += scopeData.nbytes()
+            # The writer may have to wait for room, off the event loop
+            await asyncio.to_thread(writer.put, scopeData)
+
+        if progress is not None:
+            progress(acquired, downloaded)
+
+    return coordinator.triggers
+
+
+def parse_address(address, port):
+    """
+    Splits a host:port address, using a default port if there is none.
+    """
+    host, _, rest = address.partition(":")
+    return host, int(rest) if rest else port
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Acquire captures from DS1000Z scopes to .ds1z files "
+                    "without the GUI")
+    parser.add_argument("address", nargs="+",
+                        help="IP address of the scope, host:port for another "
+                             "port, several to acquire from all at once")
+    parser.add_argument("--port", type=int, default=5555,
+                        help="SCPI port of the scopes")
+    parser.add_argument("--count", type=int, default=1,
+                        help="number of captures, 0 to acquire until Ctrl+C")
+    parser.add_argument("--out", default=".",
+                        help="directory the captures are written to, with a "
+                             "subdirectory per scope when there are several")
+    parser.add_argument("--mode", choices=MODES, default="single",
+                        help="re-arm the scope when ready (single) or right "
+                             "after each download (loop)")
+    parser.add_argument("--prefix", default="capture",
+                        help="start of the file names")
+    parser.add_argument("--telemetry-log", metavar="FILE",
+                        help="append the timing of every SCPI command and "
+                             "chunk to a JSON-lines file")
+    parser.add_argument("--use-opc", action="store_true",
+                        help="wait for each trigger by polling the operation "
+                             "complete bit set by *OPC, then its status")
+    args = parser.parse_args()
+
+    count = args.count if args.count > 0 else None
+    total = str(count) if count is not None else "-"
+
+    begin = time.perf_counter()
+    status = {"shown": begin}
+
+    def progress(acquired, downloaded):
+        now = time.perf_counter()
+        if now - status["shown"] < 1 and acquired != count:
+            return
+
+        status["shown"] = now
+        elapsed = now - begin
+        print("%d/%s captures, %.1f MB/s, %.2f captures/s"
+              % (acquired, total, downloaded / elapsed / 1e6,
+                 acquired / elapsed))
+
+    addresses = [parse_address(address, args.port) for address in args.address]
+    stats = telemetry.Telemetry(args.telemetry_log)
+    if len(addresses) == 1:
+        directories = [args.out]
+    else:
+        directories = [os.path.join(args.out, "%s_%d" % address)
+                       for address in addresses]
+    writers = [CaptureWriter(directory, args.prefix)
+               for directory in directories]
+
+    # The trigger waits are made here so that their latencies are still
+    # summed up after Ctrl+C
+    scope = coordinator = None
+    if len(addresses) == 1:
+        triggerWaits = [trigger.TriggerWait(use_opc=args.use_opc)]
+    else:
+        # The scopes are armed together and downloaded concurrently
+        coordinator = ds1000z_async.Coordinator(addresses, telemetry=stats,
+                                                use_opc=args.use_opc)
+        triggerWaits = coordinator.triggers
+
+    stopped = False
+    try:
+        if coordinator is None:
+            scope = ds1000z.Scope(*addresses[0], telemetry=stats)
+            acquire(scope, count, args.mode, writers[0], progress,
+                    triggerWaits[0])
+        else:
+            asyncio.run(acquire_all(coordinator, count, args.mode, writers,
+                                    progress))
+        stopped = True
+    except KeyboardInterrupt:
+        # Ctrl+C is how unbounded acquisitions end
+        print("Stopped" if count is None else "Interrupted")
+        stopped = count is None
+    except OSError as e:
+        print("Acquisition failed: %s" % e)
+    finally:
+        for writer in writers:
+            writer.close()
+        if scope is not None:
+            scope.close()
+        if coordinator is not None:
+            coordinator.close()
+        stats.close()
+
+    elapsed = time.perf_counter() - begin
+    for writer in writers:
+        print("Wrote %d captures to %s in %.1f s"
+              % (writer.written, writer.directory, elapsed))
+    for address, triggerWait in zip(args.address, triggerWaits):
+        print("%s arm to trigger: %s"
+              % (address, triggerWait.armToTrigger.summary()))
+        print("%s trigger to data: %s"
+              % (address, triggerWait.triggerToData.summary()))
+    for line in stats.summary():
+        print(line)
+
+    errors = [writer.error for writer in writers if writer.error is not None]
+    for error in errors:
+        print("Writing failed: %s" % error)
+    if errors or not stopped:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
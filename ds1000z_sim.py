@@ -0,0 +1,350 @@
+#!/usr/bin/env python3
+
+import sys
+import time
+import random
+import socket
+import socketserver
+import threading
+import numpy as np
+
+# Memory depths accepted by :ACQ:MDEP on a DS1054Z (single channel)
+MEMORY_DEPTHS = [12000, 120000, 1200000, 12000000, 24000000]
+
+# Maximum number of samples returned by :WAV:DATA? in BYTE mode
+MAX_BYTE_READ = 250000
+
+
+class SimScope:
+    """
+    A local TCP stand-in for a DS1000Z oscilloscope.
+
+    It speaks the subset of SCPI used by ds1000z.Scope, so the client and the
+    acquisition code can be exercised without a physical scope.
+
+    Attributes:
+    - mdep: an integer representing the memory depth, or "AUTO".
+    - channels: a list of strings representing the displayed channels.
+    - latency: a float representing the seconds added before each reply.
+    - bandwidth: a float representing the link speed in bytes per second, or None for unlimited.
+    - trigger_delay: a float representing the seconds between :SING and the trigger.
+    - fault_rate: a float representing the probability of a :WAV:DATA? reply being cut short or stalling.
+    - srate: a float representing the sample rate.
+    - state: a string representing the trigger status (RUN, WAIT or STOP).
+    - opc: a boolean, True once *OPC was sent until *ESR? reports it or *CLS clears it.
+
+    Methods:
+    - __init__(self, mdep=12000, channels=..., latency=0.0, bandwidth=None, trigger_delay=0.0, fault_rate=0.0): configures the simulator.
+    - start(self, host="127.0.0.1", port=0): starts serving and returns the bound address.
+    - stop(self): stops serving.
+    - trigger_status(self): returns the current trigger status.
+    - waveform(self, chan): returns the samples of a channel for the current capture.
+    """
+
+    def __init__(self, mdep=12000, channels=("CHAN1",), latency=0.0,
+                 bandwidth=None, trigger_delay=0.0, fault_rate=0.0):
+        """
+        Initializes the simulator.
+
+        Args:
+        - mdep: an integer representing the memory depth, or "AUTO" (default is 12000).
+        - channels: a list of strings representing the displayed channels (default is CHAN1).
+        - latency: a float representing the seconds added before each reply (default is 0).
+        - bandwidth: a float representing the link speed in bytes per second (default is unlimited).
+        - trigger_delay: a float representing the seconds between :SING and the trigger (default is 0).
+        - fault_rate: a float representing the probability of a :WAV:DATA? reply being faulty (default is 0).
+        """
+        self.mdep = mdep
+        self.channels = list(channels)
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.trigger_delay = trigger_delay
+        self.fault_rate = fault_rate
+        self.faults = random.Random(0)
+        self.srate = 1e9 / max(1, len(self.channels))
+        self.state = "STOP"
+        self.opc = False
+        self.armed_at = 0.0
+        self.server = None
+        self._capture = 0
+        self._waveforms = {}
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def start(self, host="127.0.0.1", port=0):
+        """
+        Starts serving on a background thread.
+
+        Args:
+        - host: a string representing the address to listen on (default is 127.0.0.1).
+        - port: an integer representing the port, 0 picks a free one (default is 0).
+
+        Returns:
+        - address: a (host, port) tuple with the bound address.
+        """
+        sim = self
+
+        class Handler(_SimHandler):
+            scope = sim
+
+        socketserver.ThreadingTCPServer.allow_reuse_address = True
+        self.server = socketserver.ThreadingTCPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        thread = threading.Thread(target=self.server.serve_forever)
+        thread.daemon = True
+        thread.start()
+
+        return self.server.server_address
+
+    def stop(self):
+        """
+        Stops serving.
+        """
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+
+    def memory_depth(self):
+        """
+        Returns the effective memory depth in samples.
+        """
+        if self.mdep == "AUTO":
+            return MEMORY_DEPTHS[0]
+        return int(self.mdep)
+
+    def timebase_scale(self):
+        """
+        Returns the horizontal scale consistent with the memory depth.
+        """
+        return self.memory_depth() / (12 * self.srate)
+
+    def arm(self):
+        """
+        Arms a single trigger, as :SING does.
+        """
+        with self._lock:
+            self.state = "WAIT"
+            self.armed_at = time.monotonic()
+
+    def trigger_status(self):
+        """
+        Returns the current trigger status.
+        """
+        with self._lock:
+            if self.state == "WAIT":
+                if time.monotonic() - self.armed_at >= self.trigger_delay:
+                    self.state = "STOP"
+                    self._capture += 1
+                    self._waveforms = {}
+            return self.state
+
+    def waveform(self, chan):
+        """
+        Returns the samples of a channel for the current capture.
+
+        Args:
+        - chan: a string representing the channel name.
+
+        Returns:
+        - data: a uint8 numpy array of memory depth samples.
+        """
+        with self._lock:
+            if chan not in self._waveforms:
+                self._waveforms[chan] = self._generate(chan)
+            return self._waveforms[chan]
+
+    def _generate(self, chan):
+        """
+        Builds a synthetic power trace: a repeated pattern of operations
+        with some noise on top.
+        """
+        mdep = self.memory_depth()
+        rng = np.random.default_rng((self._capture, int(chan[-1])))
+        t = np.arange(mdep, dtype=np.float32)
+        trace = 128 + 40 * np.sin(t * (2 * np.pi / 1000))
+        trace[(t % 5000) < 600] += 50
+        trace += rng.normal(0, 4, mdep).astype(np.float32)
+
+        return np.clip(trace, 0, 255).astype(np.uint8)
+
+    def preamble(self):
+        """
+        Returns the :WAV:PRE? reply.
+        """
+        xinc = 1 / self.srate
+        return "0,0,%d,1,%e,%e,0,%e,0,127" % (self.memory_depth(), xinc,
+                                             -self.memory_depth() * xinc / 2,
+                                             0.04)
+
+
+class _SimHandler(socketserver.BaseRequestHandler):
+    """
+    Serves one client connection of a SimScope.
+    """
+
+    scope = None
+
+    def setup(self):
+        self.request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.source = "CHAN1"
+        self.start = 1
+        self.stop = MAX_BYTE_READ
+        self.stalled = False
+
+    def handle(self):
+        buf = b""
+        while True:
+            try:
+                data = self.request.recv(65536)
+            except OSError:
+                return
+            if not data:
+                return
+            buf += data
+
+            while b"\n" in buf:
+                line, buf = buf.split(b"\n", 1)
+                answers = []
+                for command in line.decode().split(";"):
+                    answer = self.execute(command.strip())
+                    if answer is not None:
+                        answers.append(answer)
+
+                if answers:
+                    self.reply(answers)
+                self.stalled = False
+
+    def reply(self, answers):
+        """
+        Sends the answers of a message, honoring latency and bandwidth.
+        """
+        out = b""
+        for answer in answers:
+            if out:
+                out += b";"
+            out += answer if isinstance(answer, bytes) else answer.encode()
+        if not self.stalled:
+            out += b"\n"
+
+        if self.scope.latency:
+            time.sleep(self.scope.latency)
+
+        if not self.scope.bandwidth:
+            self.request.sendall(out)
+            return
+
+        step = 65536
+        for i in range(0, len(out), step):
+            begin = time.monotonic()
+            self.request.sendall(out[i:i+step])
+            wait = len(out[i:i+step]) / self.scope.bandwidth
+            time.sleep(max(0.0, wait - (time.monotonic() - begin)))
+
+    def execute(self, command):
+        """
+        Executes a single command and returns its answer, or None.
+        """
+        if not command:
+            return None
+
+        header, _, arg = command.partition(" ")
+        header = header.upper()
+        if not header.startswith(":") and not header.startswith("*"):
+            header = ":" + header
+        scope = self.scope
+
+        if header == "*IDN?":
+            return "RIGOL TECHNOLOGIES,DS1054Z,SIM0000000000,00.04.04.SP4"
+        if header == "*OPC?":
+            return "1"
+        if header == "*CLS":
+            scope.opc = False
+            return None
+        if header == "*OPC":
+            scope.opc = True
+            return None
+        if header == "*ESR?":
+            # The operation complete bit is set once the capture is done,
+            # and cleared by reading it
+            complete = scope.opc and scope.trigger_status() == "STOP"
+            scope.opc = scope.opc and not complete
+            return "1" if complete else "0"
+        if header == ":ACQ:MDEP?":
+            return str(scope.mdep)
+        if header == ":ACQ:MDEP":
+            scope.mdep = "AUTO" if arg.upper() == "AUTO" else int(arg)
+            return None
+        if header == ":ACQ:SRAT?":
+            return "%e" % scope.srate
+        if header == ":TIM:SCAL?":
+            return "%e" % scope.timebase_scale()
+        if header.startswith(":CHAN") and header.endswith(":DISP?"):
+            chan = header[1:].split(":")[0]
+            return "1" if chan in scope.channels else "0"
+        if header == ":SING":
+            scope.arm()
+            return None
+        if header == ":STOP":
+            scope.state = "STOP"
+            return None
+        if header == ":RUN":
+            scope.state = "RUN"
+            return None
+        if header == ":TRIG:STAT?":
+            return scope.trigger_status()
+        if header == ":WAV:SOUR":
+            self.source = arg.upper()
+            return None
+        if header in [":WAV:MODE", ":WAV:FORM"]:
+            return None
+        if header == ":WAV:STAR":
+            self.start = int(arg)
+            return None
+        if header == ":WAV:STOP":
+            self.stop = int(arg)
+            return None
+        if header == ":WAV:PRE?":
+            return scope.preamble()
+        if header == ":WAV:DATA?":
+            stop = min(self.stop, self.start + MAX_BYTE_READ - 1)
+            data = scope.waveform(self.source)[self.start-1:stop].tobytes()
+
+            # A faulty reply announces less data than asked for, or the
+            # transfer stalls halfway and the rest is lost
+            if scope.fault_rate and scope.faults.random() < scope.fault_rate:
+                if scope.faults.random() < 0.5:
+                    data = data[:len(data) // 2]
+                else:
+                    self.stalled = True
+                    return b"#9%09d" % len(data) + data[:len(data) // 2]
+
+            return b"#9%09d" % len(data) + data
+
+        # Unknown queries get no answer, like on the real scope
+        return None
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "-h":
+        print("Usage: python3 ds1000z_sim.py [port] [memory depth]")
+        sys.exit()
+
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 5555
+    mdep = sys.argv[2] if len(sys.argv) > 2 else 12000
+    sim = SimScope(mdep="AUTO" if mdep == "AUTO" else int(mdep),
+                   channels=["CHAN1", "CHAN2"])
+    host, port = sim.start("0.0.0.0", port)
+    print("Simulated DS1000Z listening on %s:%d" % (host, port))
+
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        sim.stop()
@@ -3,17 +3,40 @@
 import os
 import sys
 import time
+import argparse
+import functools
 import ds1000z
-from threading import Thread
-from PyQt6 import QtCore, QtWidgets, uic
+import acquisition
+import capfile
+import capstore
+import capture
+import lod
+import intervals
+import markerstore
+import tasks
+import telemetry
+import trigger
+import numpy as np
+from PyQt6 import QtCore, QtGui, QtWidgets
 from PyQt6.QtWidgets import QPushButton, QFileDialog
 import pyqtgraph as pg
 
+# The analysis modules (analysis, averaging, csvloader, exporter) are imported
+# when first used, and the window is built from main_ui.py, generated from
+# main.ui by build_ui.sh, unless main.ui was edited since. See
+# bench_startup.py.
 basedir = os.path.dirname(__file__)
 
 chans = {}
-markers = []
+chanColors = {"CHAN1": "#f8fc00", "CHAN2": "#00fcf8",
+              "CHAN3": "#f800f8", "CHAN4": "#003870"}
+markers = markerstore.MarkerStore()
 scopeAddr = None
+queuePolicy = "block"
+memoryBudget = capstore.DEFAULT_BUDGET
+telemetryLog = None
+useOpc = False
+csvCodes = False
 
 class chanData():
     """
@@ -35,6 +58,15 @@ class chanData():
         Whether the button is toggled or not.
     button : QPushButton
         The button to toggle the plotted data.
+    data : numpy.ndarray
+        The samples shown.
+    pyramid : lod.Pyramid
+        The decimation pyramid of the whole channel, None until it is built.
+    offset : int
+        The position of data in the samples of the pyramid.
+    scale, shift : float
+        The conversion of the samples to volts, applied by the transform of
+        the line rather than to the samples.
     """
 
     def __init__(self, gw, btn, color):
@@ -55,23 +87,75 @@ class chanData():
         self.gw = gw
         self.line = gw.plot([], pen=color)
         self.gw.removeItem(self.line)
+        # Until a pyramid is built the samples are decimated to the peaks
+        self.line.setDownsampling(auto=True, method="peak")
         self.enabled = False
         self.button = btn
         self.toggled = False
         self.button.clicked.connect(self.toggle)
+        self.data = None
+        self.pyramid = None
+        self.offset = 0
+        self.scale, self.shift = 1.0, 0.0
+        self.refreshing = False
+
+        # Only the points needed by the current view are plotted
+        self.gw.getViewBox().sigXRangeChanged.connect(self.refresh)
+        self.gw.getViewBox().sigResized.connect(self.refresh)
 
         test = QPushButton()
 
-    def setData(self, data):
+    def setData(self, data, pyramid=None, offset=0, calibration=(1.0, 0.0)):
         """
         Sets the data to be plotted.
 
         Parameters:
         -----------
-        data : list
-            The data to be plotted.
+        data : numpy.ndarray
+            The samples to be plotted.
+        pyramid : lod.Pyramid
+            The decimation pyramid of the channel data is a window of.
+        offset : int
+            The position of data in the channel.
+        calibration : tuple
+            The scale and shift converting the samples to volts, see
+            capture.Capture.calibration.
+        """
+        self.data = data
+        self.pyramid = pyramid
+        self.offset = offset
+        self.scale, self.shift = calibration
+        # The samples are plotted as they are, a multi-million sample window
+        # is never converted to volts
+        self.line.setTransform(QtGui.QTransform(1, 0, 0, self.scale,
+                                                0, self.shift))
+
+        if pyramid is None:
+            self.line.setData(data)
+        else:
+            self.refresh()
+
+    def refresh(self, *args):
+        """
+        Plots the pyramid level matching the visible range and the width of
+        the graph.
         """
-        self.line.setData(data)
+        if self.pyramid is None or not self.toggled or self.refreshing:
+            return
+
+        vb = self.gw.getViewBox()
+        if vb.autoRangeEnabled()[0]:
+            x0, x1 = 0, len(self.data)
+        else:
+            x0, x1 = vb.viewRange()[0]
+            x0, x1 = max(0, x0), min(len(self.data), x1)
+
+        x, y = self.pyramid.select(self.offset + x0, self.offset + x1,
+                                   vb.width())
+
+        self.refreshing = True
+        self.line.setData(x - self.offset, y)
+        self.refreshing = False
 
     def toggle(self, checked):
         """
@@ -85,31 +169,250 @@ class chanData():
         if checked:
             self.gw.addItem(self.line)
             self.toggled = True
+            self.refresh()
         else:
             self.gw.removeItem(self.line)
             self.toggled = False
 
+class TimeAxis(pg.AxisItem):
+    """
+    A bottom axis labelled in seconds while the graph is plotted against the
+    sample positions, so markers, cuts and pyramids keep working on samples.
+
+    Attributes:
+    -----------
+    timebase : tuple
+        The time of position 0 and the sample period, in seconds, None to
+        label the positions.
+    """
+
+    def __init__(self):
+        """
+        Constructs the axis, labelling positions until a timebase is set.
+        """
+        # The base constructor already updates the label
+        self.timebase = None
+        super().__init__("bottom")
+
+    def setTimebase(self, timebase, offset=0):
+        """
+        Sets the time of the samples.
+
+        Parameters:
+        -----------
+        timebase : tuple
+            The time of the first sample and the sample period, see
+            capture.Capture.timebase. None to label the positions.
+        offset : int
+            The position of the first sample plotted.
+        """
+        if timebase is not None:
+            start, increment = timebase
+            timebase = (start + offset * increment, increment)
+
+        self.timebase = timebase
+        self.setLabel("Time" if timebase else "Sample",
+                      units="s" if timebase else None)
+        self.updateAutoSIPrefix()
+        self.picture = None
+        self.update()
+
+    def updateAutoSIPrefix(self):
+        """
+        Picks the SI prefix of the label from the visible times.
+        """
+        if self.timebase is None:
+            return super().updateAutoSIPrefix()
+
+        start, increment = self.timebase
+        positions = self.range
+        self.range = [start + value * increment for value in positions]
+        try:
+            super().updateAutoSIPrefix()
+        finally:
+            self.range = positions
+
+    def tickValues(self, minVal, maxVal, size):
+        """
+        Places the ticks on round times, returned as positions.
+        """
+        if self.timebase is None:
+            return super().tickValues(minVal, maxVal, size)
+
+        start, increment = self.timebase
+        levels = super().tickValues(start + minVal * increment,
+                                    start + maxVal * increment, size)
+        return [(spacing / increment,
+                 [(value - start) / increment for value in values])
+                for spacing, values in levels]
+
+    def tickStrings(self, values, scale, spacing):
+        """
+        Labels the ticks with their times, scaled as the axis label.
+        """
+        if self.timebase is None:
+            return super().tickStrings(values, scale, spacing)
+
+        start, increment = self.timebase
+        return super().tickStrings([start + value * increment
+                                    for value in values],
+                                   scale, spacing * increment)
+
+class AutoMarkerDialog(QtWidgets.QDialog):
+    """
+    Asks for the options of the automatic markers.
+
+    Attributes:
+    -----------
+    channel : QtWidgets.QComboBox
+        The channel searched.
+    mode : QtWidgets.QComboBox
+        One of analysis.MODES.
+    high : QtWidgets.QDoubleSpinBox
+        The upper threshold, or the height of the peaks, in volts.
+    low : QtWidgets.QDoubleSpinBox
+        The lower threshold of the crossings, in volts.
+    distance : QtWidgets.QSpinBox
+        The minimum distance between markers.
+    """
+
+    def __init__(self, parent, scopeData):
+        """
+        Constructs the dialog, with thresholds at a quarter and three quarters
+        of the range of the first channel.
+
+        Parameters:
+        -----------
+        parent : QtWidgets.QWidget
+            The parent window.
+        scopeData : capture.Capture
+            The capture the markers are searched on.
+        """
+        import analysis
+
+        super().__init__(parent)
+        self.setWindowTitle("Auto markers")
+
+        self.channel = QtWidgets.QComboBox()
+        self.channel.addItems(list(scopeData))
+        self.mode = QtWidgets.QComboBox()
+        self.mode.addItems(analysis.MODES)
+        self.high = QtWidgets.QDoubleSpinBox()
+        self.low = QtWidgets.QDoubleSpinBox()
+        for spin in (self.high, self.low):
+            spin.setRange(-1e9, 1e9)
+            spin.setDecimals(4)
+            spin.setSuffix(" V")
+        self.distance = QtWidgets.QSpinBox()
+        self.distance.setRange(1, 2**31 - 1)
+        self.distance.setValue(100)
+
+        chan = self.channel.currentText()
+        data = scopeData[chan]
+        if len(data) > 0:
+            lo, hi = scopeData.to_volts(chan, [data.min(), data.max()])
+            lo, hi = sorted([float(lo), float(hi)])
+            self.high.setValue(lo + (hi - lo) * 0.75)
+            self.low.setValue(lo + (hi - lo) * 0.25)
+
+        buttons = QtWidgets.QDialogButtonBox(
+            QtWidgets.QDialogButtonBox.StandardButton.Ok |
+            QtWidgets.QDialogButtonBox.StandardButton.Cancel)
+        buttons.accepted.connect(self.accept)
+        buttons.rejected.connect(self.reject)
+
+        layout = QtWidgets.QFormLayout(self)
+        layout.addRow("Channel", self.channel)
+        layout.addRow("Mode", self.mode)
+        layout.addRow("High / height", self.high)
+        layout.addRow("Low", self.low)
+        layout.addRow("Min. distance", self.distance)
+        layout.addRow(buttons)
+
+class TemplateDialog(QtWidgets.QDialog):
+    """
+    Asks for the options of the template search.
+
+    Attributes:
+    -----------
+    channel : QtWidgets.QComboBox
+        The channel searched.
+    threshold : QtWidgets.QDoubleSpinBox
+        The smallest score of a match.
+    """
+
+    def __init__(self, parent, scopeData):
+        """
+        Constructs the dialog.
+
+        Parameters:
+        -----------
+        parent : QtWidgets.QWidget
+            The parent window.
+        scopeData : capture.Capture
+            The capture searched.
+        """
+        super().__init__(parent)
+        self.setWindowTitle("Template search")
+
+        self.channel = QtWidgets.QComboBox()
+        self.channel.addItems(list(scopeData))
+        self.threshold = QtWidgets.QDoubleSpinBox()
+        self.threshold.setRange(0, 1)
+        self.threshold.setSingleStep(0.05)
+        self.threshold.setValue(0.8)
+
+        buttons = QtWidgets.QDialogButtonBox(
+            QtWidgets.QDialogButtonBox.StandardButton.Ok |
+            QtWidgets.QDialogButtonBox.StandardButton.Cancel)
+        buttons.accepted.connect(self.accept)
+        buttons.rejected.connect(self.reject)
+
+        layout = QtWidgets.QFormLayout(self)
+        layout.addRow("Channel", self.channel)
+        layout.addRow("Min. score", self.threshold)
+        layout.addRow(buttons)
+
 class MainWindow(QtWidgets.QMainWindow):
     """
     The main window of the application.
 
     Attributes:
-        scopeRaw (list): A list containing the raw data from the oscilloscope.
+        scopeRaw (capstore.CaptureStore): The captures, spilled to disk past the memory budget.
+        virtual (list): The mean and standard deviation captures of the averager, listed after scopeRaw.
+        averager (averaging.Averager): Averages the captures of the next acquisitions, None if disabled.
         graph (pyqtgraph.PlotWidget): The plot widget used to display the data.
-        table (QtWidgets.QTableWidget): The table widget used to display the markers.
+        table (QtWidgets.QTableView): The table view used to display the markers.
+        markerModel (markerstore.MarkerModel): The model of the markers table.
         range (pyqtgraph.LinearRegionItem): The linear region item used to select a range of data.
         markPen (pyqtgraph.mkPen): The pen used to draw the markers.
+        markerOffset (int): The window offset of the capture shown, the marker positions are relative to it.
+        telemetry (telemetry.Telemetry): Records the SCPI commands, the chunks and the pipeline stages.
+        telemetryLabel (QtWidgets.QLabel): Shows the telemetry in the status bar.
     """
 
-    def add_scope_capture(self, scopeData):
+    def add_scope_capture(self, scopeData, plot=True):
         """
         Adds a new capture to the scopeRaw attribute and updates the graph.
 
         Parameters:
         -----------
-        scopeData : (dict): A dictionary containing the scope data.
+        scopeData : (dict): A dictionary or capture.Capture containing the scope data.
+        plot : (bool): Whether to switch the graph to the new capture.
         """
+        if not isinstance(scopeData, capture.Capture):
+            scopeData = capture.Capture(scopeData)
+
+        # The averaged captures are listed after the stored ones
+        if self.virtual and self.captureNr >= len(self.scopeRaw):
+            self.captureNr += 1
+
         self.scopeRaw.append(scopeData)
+
+        if not plot:
+            self.updateCaptureList(self.captureNr)
+            return
+
         self.updateCaptureList(len(self.scopeRaw)-1)
         self.update_graph(len(self.scopeRaw)-1)
         self.update_markers()
@@ -118,64 +421,178 @@ class MainWindow(QtWidgets.QMainWindow):
             self.update_autoRange()
 
 
+    def capture_at(self, id):
+        """
+        Returns a stored capture or, past them, an averaged one.
+
+        Parameters:
+        -----------
+        id : (int): The index of the capture in the capture list.
+        """
+        if id < len(self.scopeRaw):
+            return self.scopeRaw[id]
+
+        return self.virtual[id - len(self.scopeRaw)]
+
+    def capture_count(self):
+        """
+        Returns the number of captures in the capture list.
+        """
+        return len(self.scopeRaw) + len(self.virtual)
+
+    def current_capture(self):
+        """
+        Returns the capture shown, None if there are none.
+        """
+        if self.captureNr >= self.capture_count():
+            return None
+
+        return self.capture_at(self.captureNr)
+
     def download_scope_data(self):
         """
         Downloads the scope data from the oscilloscope and updates the graph.
         """
-        if scopeAddr is None:
-            print("No scope address set")
+        if self.session is None:
+            self.show_error("No scope address set")
             return
 
-        scope = ds1000z.Scope(scopeAddr)
-        scopeData = scope.get_all_chans()
-        del scope
+        self.run_task(self.scope_download, message="Downloading",
+                      done=self.add_scope_capture)
 
-        self.add_scope_capture(scopeData)
+    def scope_download(self, progress=None):
+        """
+        Downloads all the active channels of a stopped scope, on a worker
+        thread as the session may be busy. The decimation pyramids are built
+        there as well, once the session is released.
+
+        Parameters:
+        -----------
+        progress : (callable): Unused, see tasks.BackgroundTask.
+        """
+        def download(scope):
+            # The scope may have been reconfigured since the last capture
+            scope.invalidate_settings()
+            chans = scope.get_all_chans()
+            return capture.Capture(chans, scope.get_settings().preambles)
+
+        return lod.build_pyramids(self.session.run(download))
 
     def loadFile(self):
         """
-        Loads a CSV file and updates the scopeRaw attribute with the data.
+        Loads a capture or CSV file and adds it as a new capture. CSV files
+        are parsed in the background.
         """
         fileName, _ = QFileDialog.getOpenFileName(self,
                                                   "Open File", 
                                                   "", 
-                                                  "CSV Files (*.csv)")
+                                                  "Captures (*%s);;CSV Files (*.csv)"
+                                                  % capfile.EXTENSION)
 
-        if fileName:
-            scopeData = {}
-            for i in ["CHAN1", "CHAN2", "CHAN3", "CHAN4"]:
-                scopeData[i] = []
-
-            with open(fileName, 'r') as f:
-                for line in f:
-                    line = line.strip()
-                    if line:
-                        line = line.split(',')
-
-                        # skip if data is not valid (possibly header)
-                        try:
-                            int(float(line[0]))
-                        except:
-                            continue
-
-                        try:
-                            if line[1]:
-                                scopeData["CHAN1"].append(int(float(line[1])))
-                            if line[3]:
-                                scopeData["CHAN2"].append(int(float(line[3])))
-                            if line[5]:
-                                scopeData["CHAN3"].append(int(float(line[5])))
-                            if line[7]:
-                                scopeData["CHAN4"].append(int(float(line[7])))
-                        except:
-                            continue
-
-            # delete empty channels
-            for i in ["CHAN1", "CHAN2", "CHAN3", "CHAN4"]:
-                if len(scopeData[i]) < 1:
-                    del scopeData[i]
+        if not fileName:
+            return
 
+        if fileName.endswith(capfile.EXTENSION):
+            scopeData = capfile.open_capture(fileName)
             self.add_scope_capture(scopeData)
+            self.add_markers([m["pos"] for m in scopeData.markers],
+                             [m["note"] for m in scopeData.markers])
+            return
+
+        import csvloader
+        self.run_task(functools.partial(csvloader.load_csv, codes=csvCodes),
+                      fileName,
+                      message="Loading %s" % os.path.basename(fileName),
+                      done=self.add_csv_capture)
+
+    def add_csv_capture(self, result):
+        """
+        Adds a capture loaded by csvloader.load_csv.
+
+        Parameters:
+        -----------
+        result : (tuple): The channels and the layout of the CSV file.
+        """
+        scopeData, layout = result
+        info = {"start": layout["start"], "increment": layout["increment"]}
+        self.add_scope_capture(capture.Capture(
+            scopeData, preambles=layout.get("preambles"), info=info))
+
+    def saveFile(self):
+        """
+        Saves the current capture and the markers in the native capture
+        format, or the current capture as a Rigol CSV file, in the background.
+        """
+        scopeData = self.current_capture()
+        if scopeData is None:
+            return
+
+        fileName, selected = QFileDialog.getSaveFileName(self,
+                                                         "Save File",
+                                                         "",
+                                                         "Captures (*%s);;Rigol CSV (*.csv)"
+                                                         % capfile.EXTENSION)
+
+        if fileName:
+            extension = ".csv" if selected.endswith("(*.csv)") else capfile.EXTENSION
+            if not fileName.lower().endswith((".csv", capfile.EXTENSION)):
+                fileName += extension
+
+            import exporter
+            snapshot = [{"pos": m["pos"], "note": m["note"]} for m in markers]
+            self.run_task(exporter.export_capture, fileName, scopeData,
+                          snapshot,
+                          message="Saving %s" % os.path.basename(fileName),
+                          done=self.exported)
+
+    def show_error(self, message):
+        """
+        Tells the user something failed, in the status bar and in a message
+        box which does not block the window.
+
+        Parameters:
+        -----------
+        message : (str): The error message.
+        """
+        self.statusBar().showMessage(message, 10000)
+        box = QtWidgets.QMessageBox(QtWidgets.QMessageBox.Icon.Warning,
+                                    "DS1000Z SPA", message, parent=self)
+        box.setAttribute(QtCore.Qt.WidgetAttribute.WA_DeleteOnClose)
+        box.open()
+
+    def run_task(self, func, *args, message="", done=None):
+        """
+        Runs a function in the background, showing its progress in the status bar.
+
+        Parameters:
+        -----------
+        func : (callable): The function to run, see tasks.BackgroundTask.
+        args : (tuple): The positional arguments of the function.
+        message : (str): The status bar message shown while running.
+        done : (callable): Called on the GUI thread with the result.
+        """
+        task = tasks.BackgroundTask(func, *args)
+        self.tasks.append(task)
+
+        def finish():
+            self.tasks.remove(task)
+            self.statusBar().clearMessage()
+
+        def succeeded(result):
+            finish()
+            if done is not None:
+                done(result)
+
+        def failed(error):
+            finish()
+            self.show_error("%s failed: %s" % (message, error))
+
+        task.progress.connect(
+            lambda percent: self.statusBar().showMessage("%s: %d%%" % (message, percent)))
+        task.done.connect(succeeded)
+        task.failed.connect(failed)
+        self.statusBar().showMessage(message)
+        task.start()
 
 
     def triggerSingle(self, checked):
@@ -186,16 +603,7 @@ class MainWindow(QtWidgets.QMainWindow):
         -----------
         checked : (bool): Whether the action is checked or not.
         """
-        if checked:
-            self.actionTriggerLoop.setEnabled(False)
-            self.thread = Thread(target=self.thread_single)
-            self.thread.daemon = True
-            self.stopThread = False
-            self.thread.start()
-        else:
-            self.stopThread = True
-            self.actionTriggerLoop.setEnabled(True)
-
+        self.triggerToggle(checked, 1, self.actionTriggerLoop)
 
     def triggerLoop(self, checked):
         """
@@ -205,85 +613,380 @@ class MainWindow(QtWidgets.QMainWindow):
         -----------
         checked : (bool): Whether the action is checked or not.
         """
+        self.triggerToggle(checked, None, self.actionSingle)
+
+    def triggerToggle(self, checked, count, other):
+        """
+        Starts or stops the acquisition pipeline.
+
+        Parameters:
+        -----------
+        checked : (bool): Whether the action is checked or not.
+        count : (int): The number of captures to acquire, None to loop.
+        other : (QAction): The trigger action disabled while acquiring.
+        """
+        if checked and self.session is None:
+            self.show_error("No scope address set")
+            self.sender().setChecked(False)
+            return
+
         if checked:
-            self.actionSingle.setEnabled(False)
-            self.thread = Thread(target=self.thread_loop)
-            self.thread.daemon = True
-            self.stopThread = False
-            self.thread.start()
-        else:
-            self.stopThread = True
-            self.actionSingle.setEnabled(True)
+            # Manual downloads would interleave with the armed acquisitions
+            other.setEnabled(False)
+            self.actionAverage.setEnabled(False)
+            self.actionDownload.setEnabled(False)
+
+            # Averaged captures are consumed instead of stored
+            decode = lod.build_pyramids
+            if self.actionAverage.isChecked():
+                import averaging
+                if self.averager is None:
+                    self.averager = averaging.Averager()
+                decode = self.averager.add
+                self.averageTimer.start()
+
+            self.pipeline = acquisition.AcquisitionPipeline(
+                self.session, count, queuePolicy, decode=decode,
+                triggerWait=trigger.TriggerWait(use_opc=useOpc),
+                telemetry=self.telemetry)
+            self.pipeline.captureReady.connect(self.pipelineCapture)
+            self.pipeline.failed.connect(self.pipelineFailed)
+            self.pipeline.finished.connect(self.pipelineFinished)
+            self.pipeline.start()
+        elif self.pipeline is not None:
+            self.pipeline.stop()
+
+    def pipelineCapture(self):
+        """
+        Adds the captures delivered by the acquisition pipeline.
+        """
+        if self.pipeline is None:
+            return
 
+        for scopeData, plot in self.pipeline.take():
+            self.add_scope_capture(scopeData, plot)
 
-    def thread_single(self):
+    def pipelineFailed(self, error):
         """
-        A thread function to trigger a single capture from the oscilloscope.
+        Reports an error of the acquisition pipeline.
+
+        Parameters:
+        -----------
+        error : (str): The error message.
         """
-        scope = ds1000z.Scope(scopeAddr)
-        scope.cmd(":SING")
+        self.show_error("Acquisition failed: %s" % error)
 
-        while scope.cmd_with_reply(":TRIG:STAT?") != "STOP":
-            if self.stopThread:
-                return
+    def pipelineFinished(self):
+        """
+        Restores the trigger buttons once the acquisition pipeline is done,
+        and shows the trigger latencies of the acquisition.
+        """
+        self.pipelineCapture()
 
-        scopeData = scope.get_all_chans()
-        del scope
+        triggerWait = self.pipeline.trigger
+        self.statusBar().showMessage(
+            "Arm to trigger: %s | Trigger to data: %s"
+            % (triggerWait.armToTrigger.summary(),
+               triggerWait.triggerToData.summary()), 30000)
+        self.pipeline = None
 
-        self.add_scope_capture(scopeData)
+        self.averageTimer.stop()
+        self.update_average()
 
         # uncheck buttons
         self.actionSingle.setChecked(False)
+        self.actionTriggerLoop.setChecked(False)
+        self.actionSingle.setEnabled(True)
         self.actionTriggerLoop.setEnabled(True)
+        self.actionAverage.setEnabled(True)
+        self.actionDownload.setEnabled(True)
 
-    def thread_loop(self):
+    def averageToggle(self, checked):
         """
-        A thread function to trigger a continuous loop of captures from the oscilloscope.
+        Enables averaging the captures of the next acquisitions. Disabling it
+        keeps the last mean and standard deviation in the capture list.
+
+        Args:
+            checked (bool): Whether the action is checked or not.
         """
-        scope = ds1000z.Scope(scopeAddr)
+        if not checked:
+            self.averager = None
 
-        while True:
-            scope.cmd(":SING")
+    def update_average(self):
+        """
+        Refreshes the mean and standard deviation captures with the captures
+        averaged since the last refresh.
+        """
+        if self.averager is None:
+            return
 
-            while scope.cmd_with_reply(":TRIG:STAT?") != "STOP":
-                if self.stopThread:
-                    del scope
-                    return
+        count = self.averager.count()
+        if count == 0 or (self.virtual and
+                          self.virtual[0].info["averaged"] == count):
+            return
 
-            scopeData = scope.get_all_chans()
-            self.add_scope_capture(scopeData)
+        # Samples read in the background are refreshed on a later tick
+        if any(self.capture_busy(scopeData) for scopeData in self.virtual):
+            return
+        if any(task.func == self.average_snapshot for task in self.tasks):
+            return
+
+        self.run_task(self.average_snapshot, self.averager, *self.virtual,
+                      message="Averaging", done=self.average_ready)
+
+    def average_snapshot(self, averager, *virtual, progress=None):
+        """
+        Copies the mean and standard deviation of an averager into captures
+        and builds their decimation pyramids, on a worker thread.
+
+        Parameters:
+        -----------
+        averager : (averaging.Averager): The averager.
+        virtual : (tuple): The captures to refresh in place, new ones are made if empty.
+        progress : (callable): Unused, see tasks.BackgroundTask.
+
+        Returns:
+        --------
+        tuple: The averager and the list of captures.
+        """
+        if virtual:
+            averager.update_captures(*virtual)
+        else:
+            virtual = averager.captures()
+
+        for scopeData in virtual:
+            lod.build_pyramids(scopeData)
+
+        return averager, list(virtual)
+
+    def average_ready(self, result):
+        """
+        Shows the mean and standard deviation captures refreshed by
+        average_snapshot.
+
+        Parameters:
+        -----------
+        result : (tuple): The averager and the mean and standard deviation captures.
+        """
+        # The average may have been discarded meanwhile
+        averager, virtual = result
+        if averager is not self.averager:
+            return
 
-        del scope
+        # Show the mean when the first one arrives
+        if not self.virtual:
+            self.virtual = virtual
+            self.captureNr = len(self.scopeRaw)
+            self.updateCaptureList(self.captureNr)
+            self.update_graph(self.captureNr)
+            self.update_markers()
+            self.update_autoRange()
+            return
 
+        # The samples were updated in place, keeping the cuts
+        self.updateCaptureList(self.captureNr)
+        if self.captureNr >= len(self.scopeRaw):
+            self.update_graph(self.captureNr)
+            self.update_markers()
+
+    def capture_busy(self, scopeData):
+        """
+        Returns whether a background task is reading a capture or its
+        samples.
 
+        Args:
+            scopeData (capture.Capture): The capture.
+        """
+        for task in self.tasks:
+            for arg in task.args:
+                if arg is scopeData:
+                    return True
+                if isinstance(arg, np.ndarray) and any(
+                        np.may_share_memory(arg, data)
+                        for data in scopeData.base.values()):
+                    return True
+
+        return False
+
+    def update_telemetry(self):
+        """
+        Refreshes the telemetry shown in the status bar.
+        """
+        status = self.telemetry.status()
+        if status != self.telemetryLabel.text():
+            self.telemetryLabel.setText(status)
+            self.telemetryLabel.setToolTip(
+                "<pre>%s</pre>" % "\n".join(self.telemetry.summary()))
 
-    def update_graph(self, id, start=0, end=0):
+    def update_graph(self, id):
         """
-        Updates the graph with the data in scopeRaw.
+        Updates the graph with a capture of the capture list.
 
         Args:
             id (int): The index of the capture to display.
-            start (int): The starting index of the data to display.
-            end (int): The ending index of the data to display.
         """
         for i in chans:
             chans[i].button.setEnabled(False)
             if chans[i].toggled:
                 chans[i].button.toggle()
 
-        for i in self.scopeRaw[id]:
-            if start and end:
-                self.scopeRaw[id][i] = self.scopeRaw[id][i][start:end]
-                chans[i].setData(self.scopeRaw[id][i])
-            else:
-                chans[i].setData(self.scopeRaw[id][i])
-            chans[i].button.setEnabled(True)
-            chans[i].button.toggle()
-            chans[i].toggle(True)
+        scopeData = self.capture_at(id)
+        self.remap_markers(scopeData.offset())
+        self.timeAxis.setTimebase(scopeData.timebase(), scopeData.offset())
+        with self.telemetry.stage("plot", scopeData.nbytes()):
+            for i in scopeData:
+                self.channel(i)
+                # Until the pyramid is built the whole window is plotted
+                chans[i].setData(scopeData[i], scopeData.lod.get(i),
+                                 scopeData.offset(), scopeData.calibration(i))
+                chans[i].button.setEnabled(True)
+                chans[i].button.toggle()
+                chans[i].toggle(True)
 
         self.captureNr = id
         # self.clearMarkers()
 
+        self.statCache = {}
+        self.markerModel.set_stat_columns(self.stat_headers(scopeData))
+
+        if len(scopeData.lod) < len(scopeData):
+            self.build_lod(scopeData)
+        if len(scopeData.intervals) < len(scopeData):
+            self.build_intervals(scopeData)
+
+    def remap_markers(self, offset):
+        """
+        Moves the markers to the window of the capture shown, so they stay
+        on the same samples when the capture or its cut changes.
+
+        Args:
+            offset (int): The position of the window in the samples of the capture.
+        """
+        delta = self.markerOffset - offset
+        self.markerOffset = offset
+        if delta == 0:
+            return
+
+        self.markerModel.shift(delta)
+        for item in markers:
+            item["marker"].setPos(item["pos"])
+        self.labelTimer.start()
+
+    def channel(self, name):
+        """
+        Returns the plot of a channel, created the first time it is shown.
+
+        Args:
+            name (str): The name of the channel, CHAN1 to CHAN4.
+        """
+        if name not in chans:
+            button = getattr(self, "buttonChan" + name[-1])
+            chans[name] = chanData(self.graph, button, chanColors[name])
+
+        return chans[name]
+
+    def build_lod(self, scopeData):
+        """
+        Builds the decimation pyramids of a capture in the background.
+
+        Args:
+            scopeData (capture.Capture): The capture.
+        """
+        if any(scopeData is building for building in self.lodBuilding):
+            return
+
+        self.lodBuilding.append(scopeData)
+        self.run_task(lod.build_pyramids, scopeData,
+                      message="Building overview",
+                      done=self.lod_ready)
+
+    def lod_ready(self, scopeData):
+        """
+        Switches the plot to the pyramids of a capture once they are built.
+
+        Args:
+            scopeData (capture.Capture): The capture.
+        """
+        self.lodBuilding = [c for c in self.lodBuilding if c is not scopeData]
+
+        if self.current_capture() is scopeData:
+            for i in scopeData:
+                chans[i].setData(scopeData[i], scopeData.lod.get(i),
+                                 scopeData.offset(), scopeData.calibration(i))
+
+    def build_intervals(self, scopeData):
+        """
+        Builds the interval statistics indexes of a capture in the background.
+
+        Args:
+            scopeData (capture.Capture): The capture.
+        """
+        if any(scopeData is building for building in self.intervalsBuilding):
+            return
+
+        self.intervalsBuilding.append(scopeData)
+        self.run_task(intervals.build_indexes, scopeData,
+                      message="Indexing intervals",
+                      done=self.intervals_ready)
+
+    def intervals_ready(self, scopeData):
+        """
+        Shows the interval statistics once the indexes of a capture are built.
+
+        Args:
+            scopeData (capture.Capture): The capture.
+        """
+        self.intervalsBuilding = [c for c in self.intervalsBuilding
+                                  if c is not scopeData]
+
+        if self.current_capture() is scopeData:
+            self.statCache = {}
+            self.markerModel.values_changed()
+
+    def stat_headers(self, scopeData):
+        """
+        Returns the headers of the interval statistics of a capture, every
+        statistic of every channel.
+
+        Args:
+            scopeData (capture.Capture): The capture.
+        """
+        headers = []
+        for name in scopeData:
+            for stat in intervals.STATS:
+                units = intervals.UNITS[stat]
+                # Without a time axis the energy is not scaled by the period
+                if stat == "energy" and scopeData.timebase() is None:
+                    units = "V²"
+                headers.append("CH%s %s (%s)" % (name[-1], stat, units))
+
+        return headers
+
+    def interval_values(self, row):
+        """
+        Returns the statistics from a marker to the next one on every channel
+        of the current capture, in the order of stat_headers, or None for the
+        last marker and while the indexes are built.
+
+        Args:
+            row (int): The row of the marker.
+        """
+        scopeData = self.current_capture()
+        if scopeData is None or row + 1 >= len(markers):
+            return None
+        if len(scopeData.intervals) < len(scopeData):
+            return None
+
+        # Keyed by sample, cuts do not change the statistics
+        start, end = markers.positions[row], markers.positions[row + 1]
+        key = (start + scopeData.offset(), end + scopeData.offset())
+        if key not in self.statCache:
+            stats = intervals.interval_stats(scopeData, [start], [end])
+            self.statCache[key] = [stats[name][stat][0] for name in scopeData
+                                   for stat in intervals.STATS]
+
+        return self.statCache[key]
+
     def update_autoRange(self):
         """
         Updates the graph to use auto range.
@@ -308,20 +1011,51 @@ class MainWindow(QtWidgets.QMainWindow):
 
     def cutRange(self):
         """
-        Cuts the data in scopeRaw to the selected range.
+        Narrows the current capture to the selected range. The cut only
+        changes the window shown, so it can be undone.
         """
         if not hasattr(self, 'range'):
             return
 
-        if not hasattr(self, 'scopeRaw'):
+        if self.current_capture() is None:
             return
 
         region = self.range.getRegion()
-        id = self.captureList.currentIndex()
-        self.update_graph(id, int(region[0]), int(region[1]))
+        self.change_view(lambda scopeData:
+                         scopeData.cut(int(region[0]), int(region[1])))
         self.rangeToggle(False)
         self.actionRange.setChecked(False)
 
+    def undoCut(self):
+        """
+        Restores the window of the current capture before the last cut.
+        """
+        self.change_view(lambda scopeData: scopeData.undo())
+
+    def redoCut(self):
+        """
+        Restores the last undone cut of the current capture.
+        """
+        self.change_view(lambda scopeData: scopeData.redo())
+
+    def change_view(self, func):
+        """
+        Changes the window of the current capture. The markers stay on the
+        same samples, see remap_markers.
+
+        Args:
+            func (callable): Changes the window of the capture passed, returns
+                whether it changed.
+        """
+        scopeData = self.current_capture()
+        if scopeData is None:
+            return
+        if not func(scopeData):
+            return
+
+        self.update_graph(self.captureNr)
+        self.update_autoRange()
+
     def moveMarker(self, marker):
         """
         Moves a marker to a new position.
@@ -329,15 +1063,12 @@ class MainWindow(QtWidgets.QMainWindow):
         Args:
             marker (pyqtgraph.InfiniteLine): The marker to move.
         """
-        marker.setPos(int(round(marker.getPos()[0])))
+        pos = int(round(marker.getPos()[0]))
+        marker.setPos(pos)
 
-        for i in range(len(markers)):
-            if markers[i]["marker"] == marker:
-                # update the pos
-                markers[i]["pos"] = int(round(marker.getPos()[0]))
-                break
-
-        self.update_markers()
+        row = markers.row_of(self.markerItems[marker])
+        self.markerModel.move(row, pos)
+        self.labelTimer.start()
 
     def removeMaker(self, marker, event):
         """
@@ -351,15 +1082,11 @@ class MainWindow(QtWidgets.QMainWindow):
             event.ignore()
             return
 
-        # find the marker
-        for i in range(len(markers)):
-            if markers[i]["marker"] == marker:
-                # remove the marker
-                del markers[i]
-                break
+        item = self.markerItems.pop(marker)
+        self.markerModel.remove(markers.row_of(item))
 
         self.graph.removeItem(marker)
-        self.update_markers()
+        self.labelTimer.start()
 
         event.accept()
 
@@ -383,9 +1110,48 @@ class MainWindow(QtWidgets.QMainWindow):
         vb = self.graph.getViewBox()
         mousePoint = vb.mapSceneToView(event._scenePos)
 
-        # Add a new marker
+        self.add_marker(round(mousePoint.x()))
+
+        event.accept()
+
+    def add_marker(self, pos, note=""):
+        """
+        Adds a new marker to the graph and the table.
+
+        Args:
+            pos (int): The position of the marker.
+            note (str): The note of the marker.
+        """
+        self.markerModel.insert(self.new_marker(pos, note))
+        self.labelTimer.start()
+
+    def add_markers(self, positions, notes=None):
+        """
+        Adds many markers to the graph and the table at once.
+
+        Args:
+            positions (list): The positions of the markers.
+            notes (list): The notes of the markers, empty if None.
+        """
+        if notes is None:
+            notes = [""] * len(positions)
+
+        items = [self.new_marker(int(pos), note)
+                 for pos, note in zip(positions, notes)]
+        self.markerModel.extend(items)
+        self.labelTimer.start()
+
+    def new_marker(self, pos, note):
+        """
+        Creates the graph items of a marker and returns its dictionary,
+        which still has to be added to the table.
+
+        Args:
+            pos (int): The position of the marker.
+            note (str): The note of the marker.
+        """
         marker = pg.InfiniteLine(angle=90, movable=True, pen=self.markPen)
-        marker.setPos(round(mousePoint.x()))
+        marker.setPos(pos)
         marker.sigPositionChangeFinished.connect(self.moveMarker)
         marker.sigClicked.connect(self.removeMaker)
 
@@ -393,106 +1159,157 @@ class MainWindow(QtWidgets.QMainWindow):
         label.setMovable(True)
         label.setPosition(0.97)
 
-        markers.append({
+        item = {
             "marker": marker,
             "label": label,
-            "pos": round(mousePoint.x()),
-            "width": 0,
-            "note": ""
-        })
+            "number": 0,
+            "pos": pos,
+            "note": note
+        }
+        self.markerItems[marker] = item
 
-        self.graph.addItem(marker)
-        self.update_markers()
+        self.graph.addItem(marker, ignoreBounds=True)
+        return item
 
-        event.accept()
+    def autoMarkers(self):
+        """
+        Finds markers on a channel of the current capture in the background,
+        with the options asked in an AutoMarkerDialog.
+        """
+        scopeData = self.current_capture()
+        if scopeData is None:
+            return
+        dialog = AutoMarkerDialog(self, scopeData)
+        if not dialog.exec():
+            return
+
+        high, low = dialog.high.value(), dialog.low.value()
+        if low > high:
+            high, low = low, high
+
+        # The samples are searched as they are, the thresholds converted
+        chan = dialog.channel.currentText()
+        scale, shift = scopeData.calibration(chan)
+        high, low = (high - shift) / scale, (low - shift) / scale
+
+        import analysis
+        self.run_task(analysis.find_markers, scopeData[chan],
+                      dialog.mode.currentText(), high, low,
+                      dialog.distance.value(),
+                      message="Finding markers",
+                      done=self.add_markers)
+
+    def findTemplate(self):
+        """
+        Searches the selected range in the current capture in the background
+        and adds a marker at the start of every match.
+        """
+        if not hasattr(self, 'range'):
+            self.show_error("Select the range to search first")
+            return
+
+        scopeData = self.current_capture()
+        if scopeData is None:
+            return
+        dialog = TemplateDialog(self, scopeData)
+        if not dialog.exec():
+            return
+
+        data = scopeData[dialog.channel.currentText()]
+        start, end = self.range.getRegion()
+        start, end = max(0, int(start)), min(len(data), int(end))
+        if end - start < 2:
+            self.show_error("The selected range is too short")
+            return
+
+        # The template is copied, the selection can change while searching
+        template = np.array(data[start:end])
+        import analysis
+        self.run_task(analysis.match_template, data, template,
+                      dialog.threshold.value(),
+                      message="Searching template",
+                      done=self.add_markers)
+
+    def label_markers(self, *args):
+        """
+        Numbers the labels of the visible markers by their order. Labels out
+        of view are only numbered when they get into it, so adding a marker
+        does not relabel all the ones after it, and it runs through
+        labelTimer so a burst of changes relabels once.
+        """
+        x0, x1 = self.graph.getViewBox().viewRange()[0]
+        for i in range(*markers.span(x0, x1)):
+            item = markers[i]
+            if item["number"] != i + 1:
+                item["number"] = i + 1
+                item["label"].setText(str(i + 1))
 
     def mouse_pos(self, pos):
         vb = self.graph.getViewBox()
         mousePoint = vb.mapSceneToView(pos)
         x = round(mousePoint.x())
-        y = round(mousePoint.y())
-        self.labelCoords.setText("X:{}  Y:{}".format(x, y))
+        text = "X:{}".format(x)
+
+        scopeData = self.current_capture()
+        seconds = scopeData.time_at(x) if scopeData is not None else None
+        if seconds is not None:
+            text += "  T:" + pg.siFormat(seconds, precision=6, suffix="s")
 
+        text += "  Y:" + pg.siFormat(mousePoint.y(), suffix="V")
+        self.labelCoords.setText(text)
 
 
-    def cellChanged(self, x, y):
+
+    def marker_value(self, pos):
         """
-        Handles changes to the markers table.
+        Returns the CH1 voltage of the current capture at a position, shown in
+        the markers table.
 
         Args:
-            x (int): The row index of the changed cell.
-            y (int): The column index of the changed cell.
+            pos (int): The position of the marker.
         """
-        if y == 2:
-            markers[x]["note"] = self.table.item(x, y).text()
+        scopeData = self.current_capture()
+        if scopeData is None:
+            return None
+        if "CHAN1" in scopeData and 0 <= pos < len(scopeData["CHAN1"]):
+            scale, shift = scopeData.calibration("CHAN1")
+            return float(scopeData["CHAN1"][pos]) * scale + shift
+
+        return None
 
     def update_markers(self):
         """
-        Updates the markers on the graph and in the table.
+        Updates the marker values in the table after the capture shown changed.
         """
-        # order markers by position
-        markers.sort(key=lambda x: x["pos"])
-
-        # Update markers width with the different between the next marker
-        for i in range(len(markers)):
-            if i == len(markers) - 1:
-                markers[i]["width"] = 0
-            else:
-                markers[i]["width"] = markers[i+1]["pos"] - markers[i]["pos"]
+        self.markerModel.values_changed()
 
-            markers[i]["label"].setText(str(i+1))
-            markers[i]["value"] = 0
-
-        # Update the table
-        self.table.clearContents()
-        self.table.setRowCount(len(markers))
-        for i in range(len(markers)):
-
-            item = QtWidgets.QTableWidgetItem(str(markers[i]["width"]))
-            flags = item.flags() ^ QtCore.Qt.ItemFlag.ItemIsEditable
-            item.setFlags(flags)
-            self.table.setItem(i, 0, item)
-
-            iitem = QtWidgets.QTableWidgetItem(markers[i]["note"])
-            self.table.setItem(i, 2, item)
-
-            cnr = self.captureNr
-            if len(self.scopeRaw) > cnr:
-                if "CHAN1" in self.scopeRaw[cnr]:
-                    pos = markers[i]["pos"]
-                    value = self.scopeRaw[cnr]["CHAN1"][pos]
-                    markers[i]["value"] = value
-                    item = QtWidgets.QTableWidgetItem(str(value))
-                    flags = item.flags() ^ QtCore.Qt.ItemFlag.ItemIsEditable
-                    item.setFlags(flags)
-                    self.table.setItem(i, 1, item)
-
-    def cellClicked(self, x, y):
+    def cellClicked(self, index):
         """
         Moves the graph view to the position of a marker.
 
         Args:
-            x (int): The row index of the clicked cell.
-            y (int): The column index of the clicked cell.
+            index (QtCore.QModelIndex): The double clicked cell.
         """
         # move the graph view to the marker pos
-        self.graph.getViewBox().setXRange(markers[x]["pos"] - 100, markers[x]["pos"] + 100, padding=0)
+        pos = markers[index.row()]["pos"]
+        self.graph.getViewBox().setXRange(pos - 100, pos + 100, padding=0)
 
     def clearMarkers(self):
         """
         Clears all markers from the graph and table.
         """
-        for i in range(len(markers)):
-            self.graph.removeItem(markers[i]["marker"])
-            self.graph.removeItem(markers[i]["label"])
+        for item in markers:
+            self.graph.removeItem(item["marker"])
+            self.graph.removeItem(item["label"])
 
-        markers.clear()
-        self.table.clearContents()
-        self.table.setRowCount(0)
+        self.markerItems.clear()
+        self.markerModel.clear()
 
     def exportMarkers(self):
         """
-        Exports the markers to a CSV file.
+        Exports the markers to a CSV file in the background, with the volts
+        and interval statistics of every channel, see
+        exporter.export_markers.
         """
         fileName, _ = QFileDialog.getSaveFileName(self,
                                                   "Save File", 
@@ -500,13 +1317,21 @@ class MainWindow(QtWidgets.QMainWindow):
                                                   "CSV Files (*.csv)")
 
         if fileName:
-            with open(fileName, 'w') as f:
-                f.write("pos,width,value,note\n")
-                for i in range(len(markers)):
-                    f.write("%d,%d,%s\n" % (markers[i]["pos"],
-                                            markers[i]["width"],
-                                            markers[i]["value"],
-                                            markers[i]["note"]))
+            import exporter
+            # The markers may change while exporting
+            snapshot = [{"pos": m["pos"], "note": m["note"]} for m in markers]
+            self.run_task(exporter.export_markers, fileName,
+                          self.current_capture(), snapshot,
+                          message="Exporting markers", done=self.exported)
+
+    def exported(self, fileName):
+        """
+        Tells an export finished.
+
+        Args:
+            fileName (str): The path written.
+        """
+        self.statusBar().showMessage("Saved %s" % fileName, 5000)
 
     def updateCaptureList(self, id):
 
@@ -514,6 +1339,8 @@ class MainWindow(QtWidgets.QMainWindow):
 
         self.captureList.clear()
         ids = list(map(str, range(1, len(self.scopeRaw)+1)))
+        for name, scopeData in zip(["Mean", "Std"], self.virtual):
+            ids.append("%s (%d)" % (name, scopeData.info["averaged"]))
         self.captureList.addItems(ids)
         self.captureList.setCurrentIndex(id)
 
@@ -521,27 +1348,46 @@ class MainWindow(QtWidgets.QMainWindow):
 
 
     def captureListChanged(self, id):
-        print("captureListChanged: %d" % id)
         self.update_graph(id)
         self.update_markers()
 
     def deleteCapture(self):
 
-        if len(self.scopeRaw) > 0:
+        if self.capture_count() > 0:
             idx = self.captureList.currentIndex()
-            del self.scopeRaw[idx]
+            if idx < len(self.scopeRaw):
+                del self.scopeRaw[idx]
+            else:
+                # The mean and the standard deviation go together, and the
+                # next acquisition starts a new average
+                self.virtual = []
+                if self.pipeline is None:
+                    self.averager = None
 
-            newid = max(idx-1, 0)
+            newid = min(max(idx-1, 0), max(self.capture_count()-1, 0))
             self.updateCaptureList(newid)
 
             # If it was the last item clear the graph
-            if len(self.scopeRaw) == 0:
+            if self.capture_count() == 0:
                 self.graph.clear()
             else:
                 self.update_graph(newid)
                 self.update_markers()
 
 
+    def closeEvent(self, event):
+        """
+        Stops the acquisition and removes the spilled captures on exit.
+
+        Args:
+            event (QtGui.QCloseEvent): The close event.
+        """
+        if self.pipeline is not None:
+            self.pipeline.stop()
+        self.scopeRaw.close()
+        self.telemetry.close()
+        event.accept()
+
     def __init__(self, *args, **kwargs):
         """
         Initializes the main window.
@@ -551,34 +1397,68 @@ class MainWindow(QtWidgets.QMainWindow):
             **kwargs: Arbitrary keyword arguments.
         """
         super().__init__(*args, **kwargs)
-        uic.loadUi(os.path.join(basedir, "main.ui"), self)
-        self.scopeRaw = []
-        self.thread = None
-        self.stopThread = False
+        load_ui(self)
+        self.scopeRaw = capstore.CaptureStore(
+            memoryBudget, spawn=functools.partial(self.run_task,
+                                                  message="Spilling to disk"))
+        self.virtual = []
+        self.averager = None
+        self.telemetry = telemetry.Telemetry(telemetryLog)
+        self.session = None
+        if scopeAddr:
+            self.session = ds1000z.Session(scopeAddr, telemetry=self.telemetry)
+        self.pipeline = None
+        self.tasks = []
+        self.lodBuilding = []
+        # The window offset the marker positions are relative to
+        self.markerOffset = 0
+        self.intervalsBuilding = []
+        self.statCache = {}
         self.captureNr = 0
 
         # Do not allow to remove the toolbar
         self.toolBar.toggleViewAction().setEnabled(False)
 
-        # Enable downsampling for performance (can be disabled later)
+        # Channels plot their decimation pyramids, downsampling covers the
+        # time until a pyramid is built
         self.graph.setDownsampling(True, True, 'peak')
         self.graph.showGrid(x=True, y=True)
 
+        # Plotted against the sample positions, labelled in seconds and volts
+        self.timeAxis = TimeAxis()
+        self.graph.setAxisItems({"bottom": self.timeAxis})
+        self.timeAxis.setTimebase(None)
+        self.graph.setLabel("left", "Voltage", units="V")
+
         # Create the pen for markings
         self.markPen = pg.mkPen('r', width=3)
 
-        # Intialize the channels
-        chans["CHAN1"] = chanData(self.graph, self.buttonChan1, "#f8fc00")
-        chans["CHAN2"] = chanData(self.graph, self.buttonChan2, "#00fcf8")
-        chans["CHAN3"] = chanData(self.graph, self.buttonChan3, "#f800f8")
-        chans["CHAN4"] = chanData(self.graph, self.buttonChan4, "#003870")
+        # The averaged captures are refreshed every second while acquiring
+        self.averageTimer = QtCore.QTimer(self)
+        self.averageTimer.setInterval(1000)
+        self.averageTimer.timeout.connect(self.update_average)
+
+        # The telemetry is shown in the status bar, its details in the tooltip
+        self.telemetryLabel = QtWidgets.QLabel(self)
+        self.statusBar().addPermanentWidget(self.telemetryLabel)
+        self.telemetryTimer = QtCore.QTimer(self)
+        self.telemetryTimer.setInterval(1000)
+        self.telemetryTimer.timeout.connect(self.update_telemetry)
+        self.telemetryTimer.start()
+
+        # Marker labels are renumbered once the changes are done
+        self.labelTimer = QtCore.QTimer(self)
+        self.labelTimer.setSingleShot(True)
+        self.labelTimer.setInterval(0)
+        self.labelTimer.timeout.connect(self.label_markers)
 
         # Graph mouse signals
         self.graph.scene().sigMouseClicked.connect(self.mouse_clicked)
         self.graph.scene().sigMouseMoved.connect(self.mouse_pos)
+        self.graph.getViewBox().sigXRangeChanged.connect(self.labelTimer.start)
 
         # Set base coords for graph
-        self.labelCoords.setText("X:0  Y:0")
+        self.labelCoords.setText("X:0  Y:0 V")
 
         # Captures reslates signals
         self.captureList.currentIndexChanged.connect(self.captureListChanged)
@@ -589,26 +1469,85 @@ class MainWindow(QtWidgets.QMainWindow):
         self.actionRange.triggered.connect(self.rangeToggle)
         self.actionSingle.triggered.connect(self.triggerSingle)
         self.actionTriggerLoop.triggered.connect(self.triggerLoop)
+        self.actionAverage.triggered.connect(self.averageToggle)
         self.actionCut.triggered.connect(self.cutRange)
+        self.actionUndo.triggered.connect(self.undoCut)
+        self.actionRedo.triggered.connect(self.redoCut)
         self.actionOpen.triggered.connect(self.loadFile)
+        self.actionSave.triggered.connect(self.saveFile)
         self.actionClearMarkers.triggered.connect(self.clearMarkers)
         self.actionExportMarkers.triggered.connect(self.exportMarkers)
+        self.actionMarker.triggered.connect(self.autoMarkers)
+        self.actionTemplate.triggered.connect(self.findTemplate)
 
-        # Prepare table
-        self.table.setRowCount(0)
-        self.table.cellChanged.connect(self.cellChanged)
-        self.table.cellDoubleClicked.connect(self.cellClicked)
+        # Prepare table, the graph items of the markers are found by their line
+        self.markerItems = {}
+        self.markerModel = markerstore.MarkerModel(markers, self.marker_value,
+                                                   self.interval_values)
+        self.table.setModel(self.markerModel)
+        self.table.doubleClicked.connect(self.cellClicked)
 
 
-# get first arg check for valid ipv4 address and set scopeAddr
-if len(sys.argv) > 1:
-    if sys.argv[1] == "-h" or len(sys.argv) > 2:
-        print("Usage: python3 ds1000z_spa.py <scope address>")
-        sys.exit()
-    scopeAddr = sys.argv[1]
+def load_ui(window):
+    """
+    Builds the widgets of the main window from main_ui.py, or from main.ui if
+    it was edited after main_ui.py was generated.
 
-app = QtWidgets.QApplication(sys.argv)
-window = MainWindow()
-window.show()
-app.exec()
-sys.exit()
+    Args:
+        window (QtWidgets.QMainWindow): The window to build.
+    """
+    uiFile = os.path.join(basedir, "main.ui")
+    uiModule = os.path.join(basedir, "main_ui.py")
+    if os.path.exists(uiModule) and \
+            os.path.getmtime(uiModule) >= os.path.getmtime(uiFile):
+        import main_ui
+        ui = main_ui.Ui_MainWindow()
+        ui.setupUi(window)
+
+        # The widgets become attributes of the window, as with loadUi
+        for name, widget in vars(ui).items():
+            setattr(window, name, widget)
+    else:
+        from PyQt6 import uic
+        uic.loadUi(uiFile, window)
+
+
+def main():
+    global scopeAddr, queuePolicy, memoryBudget, telemetryLog, useOpc
+    global csvCodes
+
+    # get the scope address and the acquisition options
+    parser = argparse.ArgumentParser(usage="python3 ds1000z_spa.py [options] <scope address>")
+    parser.add_argument("address", nargs="?", help="IP address of the scope")
+    parser.add_argument("--queue-policy", choices=acquisition.POLICIES,
+                        default=queuePolicy,
+                        help="what to do when captures arrive faster than they are plotted")
+    parser.add_argument("--memory-budget", type=int, metavar="MB",
+                        default=memoryBudget // (1024 * 1024),
+                        help="RAM used by captures before spilling them to disk")
+    parser.add_argument("--telemetry-log", metavar="FILE",
+                        help="append the timing of every SCPI command, chunk "
+                             "and pipeline stage to a JSON-lines file")
+    parser.add_argument("--use-opc", action="store_true",
+                        help="wait for each trigger by polling the operation "
+                             "complete bit set by *OPC, then its status")
+    parser.add_argument("--csv-codes", action="store_true",
+                        help="store CSV channels taking at most 256 evenly "
+                             "spaced volts as byte codes, rounding them")
+    args = parser.parse_args()
+    scopeAddr = args.address
+    queuePolicy = args.queue_policy
+    memoryBudget = args.memory_budget * 1024 * 1024
+    telemetryLog = args.telemetry_log
+    useOpc = args.use_opc
+    csvCodes = args.csv_codes
+
+    app = QtWidgets.QApplication(sys.argv)
+    window = MainWindow()
+    window.show()
+    app.exec()
+    sys.exit()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,279 @@
+import csv
+import numpy as np
+import capfile
+import intervals
+
+# Rows of a CSV export formatted at a time
+CHUNK_ROWS = 1 << 16
+
+# Digits after the point of the volts, as "%.6e" in Rigol exports
+DIGITS = 6
+
+_comma, _newline = ord(","), ord("\n")
+
+# The formatted fields are rows of characters of a fixed width, the values
+# padded with zeros, which the joined rows leave out
+
+
+def _digits(values, width):
+    """
+    Returns the decimal digits of non-negative integers as characters, one
+    zero padded row of width digits per value.
+    """
+    powers = 10 ** np.arange(width - 1, -1, -1, dtype=np.int64)
+    return (values[:, None] // powers % 10 + ord("0")).astype(np.uint8)
+
+
+def _format_ints(values):
+    """
+    Formats non-negative integers, returns their padded characters.
+    """
+    values = np.asarray(values, dtype=np.int64)
+    width = len(str(int(values.max()))) if len(values) else 1
+    chars = _digits(values, width)
+
+    # Leading zeros become padding, the last digit always stays
+    for k in range(1, width):
+        chars[values < 10 ** k, width - 1 - k] = 0
+
+    return chars
+
+
+def _format_floats(values, digits=DIGITS):
+    """
+    Formats numbers as "%.{digits}e" does, returns their padded characters.
+    The rare ones the vectorized path cannot handle (not finite, three
+    digits exponents, halfway between two mantissas within the rounding of
+    the scaling) are formatted in Python.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    magnitude = np.abs(values)
+    finite = np.isfinite(values)
+    magnitude[~finite] = 0
+
+    # The mantissa as an integer of digits + 1 digits, the log10 estimate of
+    # the exponent corrected where it was one off. The scaling is off by a
+    # few ulps where printf rounds the exact value, so halfway ones, which
+    # may also carry into the exponent, are left out
+    with np.errstate(over="ignore", invalid="ignore"):
+        exponent = np.floor(np.log10(np.where(magnitude > 0, magnitude, 1)))
+        exponent = exponent.astype(np.int64)
+        tie = np.zeros(len(values), dtype=bool)
+        for last in (False, False, True):
+            scaled = magnitude * 10.0 ** (digits - exponent)
+            tie |= np.abs(scaled - np.floor(scaled) - 0.5) <= scaled * 1e-15
+            mantissa = np.rint(scaled)
+            if not last:
+                exponent += mantissa >= 10 ** (digits + 1)
+                exponent -= (mantissa < 10 ** digits) & (magnitude > 0)
+        mantissa = np.clip(np.nan_to_num(mantissa), 0,
+                           10 ** (digits + 1) - 1).astype(np.int64)
+
+    # sign, digit, point, digits, "e", exponent sign, two exponent digits
+    width = digits + 7
+    chars = np.empty((len(values), width), dtype=np.uint8)
+    chars[:, 0] = ord("-")
+    mantissaChars = _digits(mantissa, digits + 1)
+    chars[:, 1] = mantissaChars[:, 0]
+    chars[:, 2] = ord(".")
+    chars[:, 3:3 + digits] = mantissaChars[:, 1:]
+    chars[:, 3 + digits] = ord("e")
+    chars[:, 4 + digits] = np.where(exponent < 0, ord("-"), ord("+"))
+    magnitudeExp = np.abs(exponent)
+    chars[:, 5 + digits] = magnitudeExp // 10 % 10 + ord("0")
+    chars[:, 6 + digits] = magnitudeExp % 10 + ord("0")
+
+    chars[~np.signbit(values), 0] = 0
+
+    odd = np.flatnonzero(~finite | (magnitudeExp >= 100) | tie)
+    if len(odd):
+        texts = [("%.*e" % (digits, values[i])).encode() for i in odd]
+        longest = max(len(text) for text in texts)
+        if longest > width:
+            chars = np.pad(chars, ((0, 0), (0, longest - width)))
+        chars[odd] = 0
+        for i, text in zip(odd, texts):
+            chars[i, :len(text)] = np.frombuffer(text, dtype=np.uint8)
+
+    return chars
+
+
+def _join(fields):
+    """
+    Lays out rows of comma separated fields, every row ending in a newline.
+
+    Parameters:
+    -----------
+    fields : list
+        The padded characters of every column.
+
+    Returns:
+    --------
+    bytes: The rows.
+    """
+    table = np.empty((len(fields[0]),
+                      sum(chars.shape[1] + 1 for chars in fields)),
+                     dtype=np.uint8)
+
+    column = 0
+    for i, chars in enumerate(fields):
+        width = chars.shape[1]
+        table[:, column:column + width] = chars
+        table[:, column + width] = _newline if i == len(fields) - 1 else _comma
+        column += width + 1
+
+    flat = table.ravel()
+    return flat[flat != 0].tobytes()
+
+
+def _volt_formatter(capture, name):
+    """
+    Returns a function formatting a run of samples of a channel as volts.
+    Byte samples are looked up in the formatted volts of their 256 codes.
+    """
+    data = capture.base[name]
+    if data.dtype == np.uint8:
+        table = _format_floats(capture.to_volts(name, np.arange(256)))
+        return lambda samples: table[samples]
+
+    return lambda samples: _format_floats(capture.to_volts(name, samples))
+
+
+def export_csv(fileName, capture, progress=None):
+    """
+    Exports the current window of a capture as a Rigol CSV file, in volts,
+    which csvloader.load_csv reads back.
+
+    The rows are formatted a chunk at a time with numpy, never one by one.
+    Channels shorter than the others get empty fields.
+
+    Parameters:
+    -----------
+    fileName : str
+        The path of the file to write.
+    capture : capture.Capture
+        The capture to export.
+    progress : callable
+        Receives the percentage written.
+    """
+    names = list(capture)
+    rows = max([len(capture[name]) for name in names] + [0])
+    formatters = {name: _volt_formatter(capture, name) for name in names}
+
+    start = capture.time_at(0)
+    timebase = capture.timebase()
+    timeFields = ["", ""]
+    if timebase is not None:
+        timeFields = ["%.*e" % (DIGITS, start), "%.*e" % (DIGITS, timebase[1])]
+
+    with open(fileName, "wb") as f:
+        f.write((",".join(["X"] + ["CH%s" % name[-1] for name in names] +
+                          ["Start", "Increment"]) + "\n").encode())
+        f.write((",".join(["Sequence"] + ["Volt"] * len(names) + timeFields)
+                 + "\n").encode())
+
+        for first in range(0, rows, CHUNK_ROWS):
+            last = min(first + CHUNK_ROWS, rows)
+            fields = [_format_ints(np.arange(first, last))]
+            for name in names:
+                samples = capture[name][first:last]
+                chars = formatters[name](samples)
+                # Past the end of the channel the fields are empty
+                fields.append(np.pad(chars, ((0, last - first - len(samples)),
+                                             (0, 0))))
+
+            f.write(_join(fields))
+            if progress is not None:
+                progress(int(100 * last / rows))
+
+
+def export_capture(fileName, capture, markers=None, progress=None):
+    """
+    Exports a capture, as a Rigol CSV file if the name ends in .csv, in the
+    native binary format with its markers otherwise. Meant to run in the
+    background.
+
+    Parameters:
+    -----------
+    fileName : str
+        The path of the file to write.
+    capture : capture.Capture
+        The capture to export.
+    markers : list
+        The markers saved in the binary format, see capfile.save_capture.
+    progress : callable
+        Receives the percentage written.
+
+    Returns:
+    --------
+    str: The path written.
+    """
+    if fileName.lower().endswith(".csv"):
+        export_csv(fileName, capture, progress)
+    else:
+        capfile.save_capture(fileName, capture, markers, progress)
+
+    return fileName
+
+
+def export_markers(fileName, capture, markers, progress=None):
+    """
+    Exports markers to a CSV file, with every field: their number, position,
+    time and width, and on every channel the volts at the marker and the
+    statistics of the interval to the next one, see intervals.STATS. Unknown
+    values are left empty. Meant to run in the background.
+
+    Parameters:
+    -----------
+    fileName : str
+        The path of the file to write.
+    capture : capture.Capture
+        The capture the markers are on, None for the positions only.
+    markers : list
+        The markers, dictionaries with "pos" and "note", sorted by position.
+    progress : callable
+        Receives the percentage written.
+
+    Returns:
+    --------
+    str: The path written.
+    """
+    positions = np.array([m["pos"] for m in markers], dtype=np.int64)
+    widths = np.append(np.diff(positions), 0) if len(positions) else positions
+
+    columns = {"time": np.full(len(positions), np.nan)}
+    names = list(capture) if capture is not None else []
+    if capture is not None and capture.timebase() is not None:
+        columns["time"] = capture.time_at(positions.astype(np.float64))
+
+    if names:
+        intervals.build_indexes(capture)
+        stats = intervals.interval_stats(capture, positions[:-1],
+                                         positions[1:])
+        for name in names:
+            data = capture[name]
+            inside = (positions >= 0) & (positions < len(data))
+            values = np.full(len(positions), np.nan)
+            values[inside] = capture.to_volts(name, data[positions[inside]])
+            columns["%s_value" % name] = values
+            for stat in intervals.STATS:
+                columns["%s_%s" % (name, stat)] = np.append(stats[name][stat],
+                                                            np.nan)
+
+    formats = {key: "%.9g" if key == "time" else "%g" for key in columns}
+
+    with open(fileName, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["number", "pos", "time", "width"] +
+                        list(columns)[1:] + ["note"])
+        for i, marker in enumerate(markers):
+            values = ["" if np.isnan(values[i]) else formats[key] % values[i]
+                      for key, values in columns.items()]
+            row = ([i + 1, int(positions[i]), values[0], int(widths[i])] +
+                   values[1:] + [marker.get("note", "")])
+            writer.writerow(row)
+
+            if progress is not None and i % 1000 == 999:
+                progress(int(100 * (i + 1) / len(markers)))
+
+    return fileName
@@ -0,0 +1,241 @@
+import numpy as np
+
+# Statistics of an interval and their units
+STATS = ["mean", "min", "max", "rms", "energy"]
+UNITS = {"mean": "V", "min": "V", "max": "V", "rms": "V", "energy": "V²s"}
+
+# Samples per block of the indexes, the partial blocks at both ends of an
+# interval are read from the samples
+BLOCK = 256
+
+# Intervals queried at a time, bounding the samples gathered
+QUERY_ROWS = 4096
+
+# Blocks summed at a time while building, bounding the float64 temporaries
+BUILD_ROWS = 4096
+
+
+class Index:
+    """
+    Prefix sums and sparse tables of a channel, for O(1) interval queries.
+
+    The samples are split in blocks of BLOCK samples. The prefix sums of the
+    blocks and of their squares give the sum over any run of whole blocks
+    with a subtraction, and the sparse tables, the minimum and maximum of
+    every run of 2**k blocks, give its extremes from two overlapping runs.
+    The partial blocks at the ends of an interval, less than a block each,
+    are read from the samples, so the indexes take a fraction of the memory
+    of the channel.
+
+    Attributes:
+    -----------
+    data : numpy.ndarray
+        The samples of the channel.
+    sums, squares : numpy.ndarray
+        The float64 sums of the samples and of their squares before every
+        block, count + 1 values.
+    mins, maxs : numpy.ndarray
+        The sparse tables, row k holds the extremes of the 2**k blocks
+        starting at each block.
+    """
+
+    def __init__(self, data):
+        """
+        Builds the indexes.
+
+        Parameters:
+        -----------
+        data : numpy.ndarray
+            The samples of the channel.
+        """
+        self.data = data
+        count = len(data) // BLOCK
+        blocks = data[:count * BLOCK].reshape(count, BLOCK)
+
+        self.sums = np.zeros(count + 1)
+        self.squares = np.zeros(count + 1)
+        for i in range(0, count, BUILD_ROWS):
+            part = blocks[i:i + BUILD_ROWS].astype(np.float64)
+            self.sums[i + 1:i + 1 + len(part)] = part.sum(axis=1)
+            self.squares[i + 1:i + 1 + len(part)] = (part * part).sum(axis=1)
+        np.cumsum(self.sums, out=self.sums)
+        np.cumsum(self.squares, out=self.squares)
+
+        # Rows past the last full run of a level are never read
+        levels = max(1, count.bit_length())
+        self.mins = np.empty((levels, max(1, count)), dtype=data.dtype)
+        self.maxs = np.empty((levels, max(1, count)), dtype=data.dtype)
+        if count == 0:
+            return
+
+        self.mins[0] = blocks.min(axis=1)
+        self.maxs[0] = blocks.max(axis=1)
+        for k in range(1, levels):
+            half, runs = 1 << (k - 1), count - (1 << k) + 1
+            np.minimum(self.mins[k - 1, :runs],
+                       self.mins[k - 1, half:half + runs],
+                       out=self.mins[k, :runs])
+            np.maximum(self.maxs[k - 1, :runs],
+                       self.maxs[k - 1, half:half + runs],
+                       out=self.maxs[k, :runs])
+
+    def _partial(self, starts, ends):
+        """
+        Returns the sums, sums of squares, minimums and maximums of ranges
+        shorter than a block, inf and -inf for the extremes of empty ones.
+        """
+        positions = starts[:, None] + np.arange(BLOCK)
+        inside = positions < ends[:, None]
+        values = self.data[np.minimum(positions, len(self.data) - 1)]
+        values = np.where(inside, values, 0).astype(np.float64)
+
+        return (values.sum(axis=1), (values * values).sum(axis=1),
+                np.where(inside, values, np.inf).min(axis=1),
+                np.where(inside, values, -np.inf).max(axis=1))
+
+    def _query(self, starts, ends):
+        """
+        Returns the sums, sums of squares, minimums and maximums of ranges
+        of samples, see query.
+        """
+        first, last = -(-starts // BLOCK), ends // BLOCK
+        full = first < last
+
+        # Ranges within a block are all head, the others a head and a tail
+        # around whole blocks
+        split = first <= last
+        head = self._partial(starts, np.where(split, first * BLOCK, ends))
+        tail = self._partial(np.where(split, last * BLOCK, ends), ends)
+
+        first, last = np.where(full, first, 0), np.where(full, last, 0)
+        sums = self.sums[last] - self.sums[first] + head[0] + tail[0]
+        squares = (self.squares[last] - self.squares[first] +
+                   head[1] + tail[1])
+
+        k = np.log2(np.maximum(last - first, 1)).astype(np.int64)
+        other = np.maximum(last - (1 << k), 0)
+        mins = np.where(full, np.minimum(self.mins[k, first],
+                                         self.mins[k, other]), np.inf)
+        maxs = np.where(full, np.maximum(self.maxs[k, first],
+                                         self.maxs[k, other]), -np.inf)
+
+        return (sums, squares, np.minimum(np.minimum(mins, head[2]), tail[2]),
+                np.maximum(np.maximum(maxs, head[3]), tail[3]))
+
+    def query(self, starts, ends):
+        """
+        Returns the sums, sums of squares, minimums and maximums of ranges
+        of samples, in constant time per range.
+
+        Parameters:
+        -----------
+        starts : numpy.ndarray
+            The first sample of every range.
+        ends : numpy.ndarray
+            The sample after the last one of every range, ranges are clipped
+            to the samples.
+
+        Returns:
+        --------
+        tuple: float64 arrays, inf and -inf for the extremes of empty
+        ranges.
+        """
+        ends = np.clip(np.asarray(ends, dtype=np.int64), 0, len(self.data))
+        starts = np.clip(np.asarray(starts, dtype=np.int64), 0, ends)
+
+        results = [np.empty(len(starts)) for _ in range(4)]
+        if len(self.data) == 0:
+            results[0][:], results[1][:] = 0, 0
+            results[2][:], results[3][:] = np.inf, -np.inf
+            return tuple(results)
+
+        for i in range(0, len(starts), QUERY_ROWS):
+            rows = slice(i, i + QUERY_ROWS)
+            for result, part in zip(results,
+                                    self._query(starts[rows], ends[rows])):
+                result[rows] = part
+
+        return tuple(results)
+
+
+def build_indexes(capture, progress=None):
+    """
+    Builds the indexes of all the channels of a capture and caches them in
+    its intervals attribute. Meant to run in the background.
+
+    Parameters:
+    -----------
+    capture : capture.Capture
+        The capture to build the indexes for.
+    progress : callable
+        Receives the percentage done.
+
+    Returns:
+    --------
+    capture.Capture: The same capture.
+    """
+    names = list(capture.base)
+    for i, name in enumerate(names):
+        if name not in capture.intervals:
+            capture.intervals[name] = Index(capture.base[name])
+        if progress is not None:
+            progress(int(100 * (i + 1) / len(names)))
+
+    return capture
+
+
+def interval_stats(capture, starts, ends):
+    """
+    Returns the statistics of ranges of the current window of a capture on
+    every channel, in volts. Its indexes must be built, see build_indexes.
+
+    The energy is the sum of the squared volts times the sample period, or
+    times 1 if the capture has no time axis. Empty ranges get NaN.
+
+    Parameters:
+    -----------
+    capture : capture.Capture
+        The capture.
+    starts : sequence
+        The first position of every range in the window.
+    ends : sequence
+        The position after the last one of every range in the window.
+
+    Returns:
+    --------
+    dict: Maps channel names to dictionaries mapping the names of STATS to
+    float64 arrays.
+    """
+    offset = capture.offset()
+    timebase = capture.timebase()
+    period = timebase[1] if timebase is not None else 1.0
+
+    stats = {}
+    with np.errstate(invalid="ignore", divide="ignore"):
+        for name in capture:
+            length = len(capture[name])
+            last = np.clip(np.asarray(ends, dtype=np.int64), 0, length)
+            first = np.clip(np.asarray(starts, dtype=np.int64), 0, last)
+            counts = (last - first).astype(np.float64)
+            scale, shift = capture.calibration(name)
+            sums, squares, mins, maxs = capture.intervals[name].query(
+                first + offset, last + offset)
+
+            # volts = scale * sample + shift, expanded over the sums
+            total = scale * sums + counts * shift
+            energy = (scale * scale * squares + 2 * scale * shift * sums +
+                      counts * shift * shift)
+            mins, maxs = scale * mins + shift, scale * maxs + shift
+            if scale < 0:
+                mins, maxs = maxs, mins
+
+            empty = counts == 0
+            stats[name] = {
+                "mean": total / counts,
+                "min": np.where(empty, np.nan, mins),
+                "max": np.where(empty, np.nan, maxs),
+                "rms": np.sqrt(np.maximum(energy, 0) / counts),
+                "energy": np.where(empty, np.nan, energy * period),
+            }
+
+    return stats
@@ -0,0 +1,137 @@
+import numpy as np
+
+# Samples per block of the finest level, and block growth between levels
+BASE_BLOCK = 16
+FACTOR = 4
+
+# Levels smaller than this are not worth building
+MIN_BLOCKS = 512
+
+
+def _reduce(mins, maxs, factor):
+    """
+    Returns the min/max of groups of factor elements, including a last
+    partial group.
+    """
+    full = len(mins) // factor * factor
+    lo = mins[:full].reshape(-1, factor).min(axis=1)
+    hi = maxs[:full].reshape(-1, factor).max(axis=1)
+    if full < len(mins):
+        lo = np.append(lo, mins[full:].min())
+        hi = np.append(hi, maxs[full:].max())
+
+    return lo, hi
+
+
+class Pyramid:
+    """
+    A min/max decimation pyramid of a channel.
+
+    Level i holds the minimum and maximum of every block of
+    BASE_BLOCK * FACTOR**i samples, so a view of any width can be drawn from
+    a couple of points per pixel without scanning the samples.
+
+    Attributes:
+    -----------
+    data : numpy.ndarray
+        The samples of the channel.
+    levels : list
+        (block, mins, maxs) tuples, from the finest to the coarsest level.
+    """
+
+    def __init__(self, data):
+        """
+        Builds the pyramid.
+
+        Parameters:
+        -----------
+        data : numpy.ndarray
+            The samples of the channel.
+        """
+        self.data = data
+        self.levels = []
+
+        if len(data) < BASE_BLOCK * MIN_BLOCKS:
+            return
+
+        block = BASE_BLOCK
+        mins, maxs = _reduce(data, data, BASE_BLOCK)
+        while True:
+            self.levels.append((block, mins, maxs))
+            if len(mins) < MIN_BLOCKS * FACTOR:
+                break
+            mins, maxs = _reduce(mins, maxs, FACTOR)
+            block *= FACTOR
+
+    def select(self, start, end, pixels):
+        """
+        Returns the points to draw a range of samples on a given width.
+
+        The coarsest level with blocks no larger than a pixel is used, and
+        every block is drawn as its minimum followed by its maximum. Narrow
+        ranges return the samples themselves.
+
+        Parameters:
+        -----------
+        start : int
+            The first sample of the range.
+        end : int
+            The sample after the last one of the range.
+        pixels : int
+            The width of the range on screen.
+
+        Returns:
+        --------
+        tuple: x and y numpy arrays.
+        """
+        start = max(0, int(start))
+        end = min(len(self.data), int(end))
+        if end <= start:
+            return np.empty(0), np.empty(0)
+
+        perPixel = (end - start) / max(1, pixels)
+        level = None
+        for candidate in self.levels:
+            if candidate[0] <= perPixel:
+                level = candidate
+
+        if level is None:
+            return np.arange(start, end), self.data[start:end]
+
+        block, mins, maxs = level
+        first, last = start // block, -(-end // block)
+
+        y = np.empty(2 * (last - first), dtype=mins.dtype)
+        y[0::2] = mins[first:last]
+        y[1::2] = maxs[first:last]
+
+        x = np.repeat(np.arange(first, last) * block, 2)
+        x[1::2] += block // 2
+
+        return x, y
+
+
+def build_pyramids(capture, progress=None):
+    """
+    Builds the pyramids of all the channels of a capture and caches them in
+    its lod attribute. Meant to run in the background.
+
+    Parameters:
+    -----------
+    capture : capture.Capture
+        The capture to build the pyramids for.
+    progress : callable
+        Receives the percentage done.
+
+    Returns:
+    --------
+    capture.Capture: The same capture.
+    """
+    names = list(capture.base)
+    for i, name in enumerate(names):
+        if name not in capture.lod:
+            capture.lod[name] = Pyramid(capture.base[name])
+        if progress is not None:
+            progress(int(100 * (i + 1) / len(names)))
+
+    return capture
@@ -0,0 +1,256 @@
+# Form implementation generated from reading ui file 'main.ui'
+#
+# Created by: PyQt6 UI code generator 6.11.0
+#
+# WARNING: Any manual changes made to this file will be lost when pyuic6 is
+# run again.  Do not edit this file unless you know what you are doing.
+
+
+import os
+from PyQt6 import QtCore, QtGui, QtWidgets
+
+basedir = os.path.dirname(__file__)
+
+
+class Ui_MainWindow(object):
+    def setupUi(self, MainWindow):
+        MainWindow.setObjectName("MainWindow")
+        MainWindow.resize(1124, 537)
+        sizePolicy = QtWidgets.QSizePolicy(QtWidgets.QSizePolicy.Policy.Preferred, QtWidgets.QSizePolicy.Policy.Preferred)
+        sizePolicy.setHorizontalStretch(0)
+        sizePolicy.setVerticalStretch(0)
+        sizePolicy.setHeightForWidth(MainWindow.sizePolicy().hasHeightForWidth())
+        MainWindow.setSizePolicy(sizePolicy)
+        self.centralwidget = QtWidgets.QWidget(parent=MainWindow)
+        sizePolicy = QtWidgets.QSizePolicy(QtWidgets.QSizePolicy.Policy.Maximum, QtWidgets.QSizePolicy.Policy.Maximum)
+        sizePolicy.setHorizontalStretch(0)
+        sizePolicy.setVerticalStretch(0)
+        sizePolicy.setHeightForWidth(self.centralwidget.sizePolicy().hasHeightForWidth())
+        self.centralwidget.setSizePolicy(sizePolicy)
+        self.centralwidget.setObjectName("centralwidget")
+        self.gridLayout = QtWidgets.QGridLayout(self.centralwidget)
+        self.gridLayout.setObjectName("gridLayout")
+        self.verticalLayout = QtWidgets.QVBoxLayout()
+        self.verticalLayout.setContentsMargins(9, -1, 9, -1)
+        self.verticalLayout.setObjectName("verticalLayout")
+        self.horizontalLayout_2 = QtWidgets.QHBoxLayout()
+        self.horizontalLayout_2.setObjectName("horizontalLayout_2")
+        self.graph = PlotWidget(parent=self.centralwidget)
+        self.graph.setObjectName("graph")
+        self.horizontalLayout_2.addWidget(self.graph)
+        self.table = QtWidgets.QTableView(parent=self.centralwidget)
+        sizePolicy = QtWidgets.QSizePolicy(QtWidgets.QSizePolicy.Policy.Fixed, QtWidgets.QSizePolicy.Policy.Expanding)
+        sizePolicy.setHorizontalStretch(0)
+        sizePolicy.setVerticalStretch(0)
+        sizePolicy.setHeightForWidth(self.table.sizePolicy().hasHeightForWidth())
+        self.table.setSizePolicy(sizePolicy)
+        self.table.setMinimumSize(QtCore.QSize(300, 0))
+        self.table.setMaximumSize(QtCore.QSize(300, 16777215))
+        self.table.setAutoFillBackground(True)
+        self.table.setAlternatingRowColors(True)
+        self.table.setObjectName("table")
+        self.table.horizontalHeader().setCascadingSectionResizes(False)
+        self.table.horizontalHeader().setDefaultSectionSize(70)
+        self.table.horizontalHeader().setStretchLastSection(True)
+        self.table.verticalHeader().setCascadingSectionResizes(False)
+        self.horizontalLayout_2.addWidget(self.table)
+        self.verticalLayout.addLayout(self.horizontalLayout_2)
+        self.horizontalLayout = QtWidgets.QHBoxLayout()
+        self.horizontalLayout.setContentsMargins(-1, -1, -1, 4)
+        self.horizontalLayout.setObjectName("horizontalLayout")
+        self.buttonChan1 = QtWidgets.QPushButton(parent=self.centralwidget)
+        self.buttonChan1.setEnabled(False)
+        self.buttonChan1.setAutoFillBackground(False)
+        icon = QtGui.QIcon()
+        icon.addFile(os.path.join(basedir, "icons/chan1.png"), QtCore.QSize(), QtGui.QIcon.Mode.Normal, QtGui.QIcon.State.Off)
+        self.buttonChan1.setIcon(icon)
+        self.buttonChan1.setIconSize(QtCore.QSize(14, 14))
+        self.buttonChan1.setCheckable(True)
+        self.buttonChan1.setObjectName("buttonChan1")
+        self.horizontalLayout.addWidget(self.buttonChan1)
+        self.buttonChan2 = QtWidgets.QPushButton(parent=self.centralwidget)
+        self.buttonChan2.setEnabled(False)
+        icon1 = QtGui.QIcon()
+        icon1.addFile(os.path.join(basedir, "icons/chan2.png"), QtCore.QSize(), QtGui.QIcon.Mode.Normal, QtGui.QIcon.State.Off)
+        self.buttonChan2.setIcon(icon1)
+        self.buttonChan2.setIconSize(QtCore.QSize(14, 14))
+        self.buttonChan2.setCheckable(True)
+        self.buttonChan2.setObjectName("buttonChan2")
+        self.horizontalLayout.addWidget(self.buttonChan2)
+        self.buttonChan3 = QtWidgets.QPushButton(parent=self.centralwidget)
+        self.buttonChan3.setEnabled(False)
+        icon2 = QtGui.QIcon()
+        icon2.addFile(os.path.join(basedir, "icons/chan3.png"), QtCore.QSize(), QtGui.QIcon.Mode.Normal, QtGui.QIcon.State.Off)
+        self.buttonChan3.setIcon(icon2)
+        self.buttonChan3.setIconSize(QtCore.QSize(14, 14))
+        self.buttonChan3.setCheckable(True)
+        self.buttonChan3.setObjectName("buttonChan3")
+        self.horizontalLayout.addWidget(self.buttonChan3)
+        self.buttonChan4 = QtWidgets.QPushButton(parent=self.centralwidget)
+        self.buttonChan4.setEnabled(False)
+        icon3 = QtGui.QIcon()
+        icon3.addFile(os.path.join(basedir, "icons/chan4.png"), QtCore.QSize(), QtGui.QIcon.Mode.Normal, QtGui.QIcon.State.Off)
+        self.buttonChan4.setIcon(icon3)
+        self.buttonChan4.setIconSize(QtCore.QSize(14, 14))
+        self.buttonChan4.setCheckable(True)
+        self.buttonChan4.setObjectName("buttonChan4")
+        self.horizontalLayout.addWidget(self.buttonChan4)
+        spacerItem = QtWidgets.QSpacerItem(40, 20, QtWidgets.QSizePolicy.Policy.Expanding, QtWidgets.QSizePolicy.Policy.Minimum)
+        self.horizontalLayout.addItem(spacerItem)
+        self.labelCoords = QtWidgets.QLabel(parent=self.centralwidget)
+        self.labelCoords.setObjectName("labelCoords")
+        self.horizontalLayout.addWidget(self.labelCoords)
+        spacerItem1 = QtWidgets.QSpacerItem(40, 20, QtWidgets.QSizePolicy.Policy.Expanding, QtWidgets.QSizePolicy.Policy.Minimum)
+        self.horizontalLayout.addItem(spacerItem1)
+        self.label = QtWidgets.QLabel(parent=self.centralwidget)
+        self.label.setObjectName("label")
+        self.horizontalLayout.addWidget(self.label)
+        self.captureList = QtWidgets.QComboBox(parent=self.centralwidget)
+        self.captureList.setEditable(False)
+        self.captureList.setObjectName("captureList")
+        self.horizontalLayout.addWidget(self.captureList)
+        self.buttonDelete = QtWidgets.QPushButton(parent=self.centralwidget)
+        self.buttonDelete.setObjectName("buttonDelete")
+        self.horizontalLayout.addWidget(self.buttonDelete)
+        self.verticalLayout.addLayout(self.horizontalLayout)
+        self.gridLayout.addLayout(self.verticalLayout, 0, 0, 1, 1)
+        MainWindow.setCentralWidget(self.centralwidget)
+        self.toolBar = QtWidgets.QToolBar(parent=MainWindow)
+        self.toolBar.setMovable(False)
+        self.toolBar.setIconSize(QtCore.QSize(32, 32))
+        self.toolBar.setToolButtonStyle(QtCore.Qt.ToolButtonStyle.ToolButtonIconOnly)
+        self.toolBar.setFloatable(True)
+        self.toolBar.setObjectName("toolBar")
+        MainWindow.addToolBar(QtCore.Qt.ToolBarArea.TopToolBarArea, self.toolBar)
+        self.actionDownload = QtGui.QAction(parent=MainWindow)
+        icon4 = QtGui.QIcon()
+        icon4.addFile(os.path.join(basedir, "icons/cloud-arrow-down.png"), QtCore.QSize(), QtGui.QIcon.Mode.Normal, QtGui.QIcon.State.Off)
+        self.actionDownload.setIcon(icon4)
+        self.actionDownload.setObjectName("actionDownload")
+        self.actionMarker = QtGui.QAction(parent=MainWindow)
+        icon5 = QtGui.QIcon()
+        icon5.addFile(os.path.join(basedir, "icons/marker.png"), QtCore.QSize(), QtGui.QIcon.Mode.Normal, QtGui.QIcon.State.Off)
+        self.actionMarker.setIcon(icon5)
+        self.actionMarker.setObjectName("actionMarker")
+        self.actionTemplate = QtGui.QAction(parent=MainWindow)
+        icon6 = QtGui.QIcon()
+        icon6.addFile(os.path.join(basedir, "icons/magnifying-glass.png"), QtCore.QSize(), QtGui.QIcon.Mode.Normal, QtGui.QIcon.State.Off)
+        self.actionTemplate.setIcon(icon6)
+        self.actionTemplate.setObjectName("actionTemplate")
+        self.actionAverage = QtGui.QAction(parent=MainWindow)
+        self.actionAverage.setCheckable(True)
+        icon7 = QtGui.QIcon()
+        icon7.addFile(os.path.join(basedir, "icons/layer-group.png"), QtCore.QSize(), QtGui.QIcon.Mode.Normal, QtGui.QIcon.State.Off)
+        self.actionAverage.setIcon(icon7)
+        self.actionAverage.setObjectName("actionAverage")
+        self.actionRange = QtGui.QAction(parent=MainWindow)
+        self.actionRange.setCheckable(True)
+        icon8 = QtGui.QIcon()
+        icon8.addFile(os.path.join(basedir, "icons/arrows-left-right-to-line.png"), QtCore.QSize(), QtGui.QIcon.Mode.Normal, QtGui.QIcon.State.Off)
+        self.actionRange.setIcon(icon8)
+        self.actionRange.setObjectName("actionRange")
+        self.actionUndo = QtGui.QAction(parent=MainWindow)
+        icon9 = QtGui.QIcon()
+        icon9.addFile(os.path.join(basedir, "icons/rotate-left.png"), QtCore.QSize(), QtGui.QIcon.Mode.Normal, QtGui.QIcon.State.Off)
+        self.actionUndo.setIcon(icon9)
+        self.actionUndo.setObjectName("actionUndo")
+        self.actionRedo = QtGui.QAction(parent=MainWindow)
+        icon10 = QtGui.QIcon()
+        icon10.addFile(os.path.join(basedir, "icons/rotate-right.png"), QtCore.QSize(), QtGui.QIcon.Mode.Normal, QtGui.QIcon.State.Off)
+        self.actionRedo.setIcon(icon10)
+        self.actionRedo.setObjectName("actionRedo")
+        self.actionCut = QtGui.QAction(parent=MainWindow)
+        icon11 = QtGui.QIcon()
+        icon11.addFile(os.path.join(basedir, "icons/scissors.png"), QtCore.QSize(), QtGui.QIcon.Mode.Normal, QtGui.QIcon.State.Off)
+        self.actionCut.setIcon(icon11)
+        self.actionCut.setObjectName("actionCut")
+        self.actionOpen = QtGui.QAction(parent=MainWindow)
+        icon12 = QtGui.QIcon()
+        icon12.addFile(os.path.join(basedir, "icons/folder-open.png"), QtCore.QSize(), QtGui.QIcon.Mode.Normal, QtGui.QIcon.State.Off)
+        self.actionOpen.setIcon(icon12)
+        self.actionOpen.setObjectName("actionOpen")
+        self.actionSave = QtGui.QAction(parent=MainWindow)
+        icon13 = QtGui.QIcon()
+        icon13.addFile(os.path.join(basedir, "icons/floppy-disk.png"), QtCore.QSize(), QtGui.QIcon.Mode.Normal, QtGui.QIcon.State.Off)
+        self.actionSave.setIcon(icon13)
+        self.actionSave.setObjectName("actionSave")
+        self.actionClearMarkers = QtGui.QAction(parent=MainWindow)
+        icon14 = QtGui.QIcon()
+        icon14.addFile(os.path.join(basedir, "icons/broom.png"), QtCore.QSize(), QtGui.QIcon.Mode.Normal, QtGui.QIcon.State.Off)
+        self.actionClearMarkers.setIcon(icon14)
+        self.actionClearMarkers.setObjectName("actionClearMarkers")
+        self.actionExportMarkers = QtGui.QAction(parent=MainWindow)
+        icon15 = QtGui.QIcon()
+        icon15.addFile(os.path.join(basedir, "icons/file-export.png"), QtCore.QSize(), QtGui.QIcon.Mode.Normal, QtGui.QIcon.State.Off)
+        self.actionExportMarkers.setIcon(icon15)
+        self.actionExportMarkers.setObjectName("actionExportMarkers")
+        self.actionSingle = QtGui.QAction(parent=MainWindow)
+        self.actionSingle.setCheckable(True)
+        icon16 = QtGui.QIcon()
+        icon16.addFile(os.path.join(basedir, "icons/play.png"), QtCore.QSize(), QtGui.QIcon.Mode.Normal, QtGui.QIcon.State.Off)
+        self.actionSingle.setIcon(icon16)
+        self.actionSingle.setObjectName("actionSingle")
+        self.actionTriggerLoop = QtGui.QAction(parent=MainWindow)
+        self.actionTriggerLoop.setCheckable(True)
+        icon17 = QtGui.QIcon()
+        icon17.addFile(os.path.join(basedir, "icons/repeat.png"), QtCore.QSize(), QtGui.QIcon.Mode.Normal, QtGui.QIcon.State.Off)
+        self.actionTriggerLoop.setIcon(icon17)
+        self.actionTriggerLoop.setObjectName("actionTriggerLoop")
+        self.toolBar.addAction(self.actionOpen)
+        self.toolBar.addAction(self.actionSave)
+        self.toolBar.addAction(self.actionDownload)
+        self.toolBar.addSeparator()
+        self.toolBar.addAction(self.actionSingle)
+        self.toolBar.addAction(self.actionTriggerLoop)
+        self.toolBar.addAction(self.actionAverage)
+        self.toolBar.addSeparator()
+        self.toolBar.addAction(self.actionRange)
+        self.toolBar.addAction(self.actionCut)
+        self.toolBar.addAction(self.actionUndo)
+        self.toolBar.addAction(self.actionRedo)
+        self.toolBar.addSeparator()
+        self.toolBar.addAction(self.actionMarker)
+        self.toolBar.addAction(self.actionTemplate)
+        self.toolBar.addAction(self.actionExportMarkers)
+        self.toolBar.addAction(self.actionClearMarkers)
+
+        self.retranslateUi(MainWindow)
+        QtCore.QMetaObject.connectSlotsByName(MainWindow)
+
+    def retranslateUi(self, MainWindow):
+        _translate = QtCore.QCoreApplication.translate
+        MainWindow.setWindowTitle(_translate("MainWindow", "DS1000Z Simple Power Analisis"))
+        self.buttonChan1.setText(_translate("MainWindow", " CHAN1"))
+        self.buttonChan2.setText(_translate("MainWindow", " CHAN2"))
+        self.buttonChan3.setText(_translate("MainWindow", " CHAN3"))
+        self.buttonChan4.setText(_translate("MainWindow", " CHAN4"))
+        self.labelCoords.setText(_translate("MainWindow", "X: 0"))
+        self.label.setText(_translate("MainWindow", "Capture"))
+        self.buttonDelete.setText(_translate("MainWindow", "Delete"))
+        self.toolBar.setWindowTitle(_translate("MainWindow", "toolBar"))
+        self.actionDownload.setText(_translate("MainWindow", "Download"))
+        self.actionDownload.setToolTip(_translate("MainWindow", "Get data from scope"))
+        self.actionMarker.setText(_translate("MainWindow", "Auto markers"))
+        self.actionMarker.setToolTip(_translate("MainWindow", "Find markers automatically"))
+        self.actionTemplate.setText(_translate("MainWindow", "Template"))
+        self.actionTemplate.setToolTip(_translate("MainWindow", "Mark every occurrence of the selected range"))
+        self.actionAverage.setText(_translate("MainWindow", "Average"))
+        self.actionAverage.setToolTip(_translate("MainWindow", "Align and average the next captures instead of storing them"))
+        self.actionRange.setText(_translate("MainWindow", "Range"))
+        self.actionRange.setToolTip(_translate("MainWindow", "Select a range"))
+        self.actionUndo.setText(_translate("MainWindow", "Undo"))
+        self.actionUndo.setToolTip(_translate("MainWindow", "Undo cut"))
+        self.actionUndo.setShortcut(_translate("MainWindow", "Ctrl+Z"))
+        self.actionRedo.setText(_translate("MainWindow", "Redo"))
+        self.actionRedo.setToolTip(_translate("MainWindow", "Redo cut"))
+        self.actionRedo.setShortcut(_translate("MainWindow", "Ctrl+Shift+Z"))
+        self.actionCut.setText(_translate("MainWindow", "Cut"))
+        self.actionCut.setToolTip(_translate("MainWindow", "Cut selected range"))
+        self.actionOpen.setText(_translate("MainWindow", "Open"))
+        self.actionSave.setText(_translate("MainWindow", "Save"))
+        self.actionSave.setToolTip(_translate("MainWindow", "Save capture and markers"))
+        self.actionClearMarkers.setText(_translate("MainWindow", "Clear Markers"))
+        self.actionExportMarkers.setText(_translate("MainWindow", "Export Markers"))
+        self.actionSingle.setText(_translate("MainWindow", "Trigger Single"))
+        self.actionTriggerLoop.setText(_translate("MainWindow", "Trigger Loop"))
+from pyqtgraph import PlotWidget
@@ -0,0 +1,326 @@
+import math
+from array import array
+from bisect import bisect_left, bisect_right
+from PyQt6 import QtCore
+
+# Columns of the marker table, the interval statistics go before the notes
+COLUMNS = ["Width", "CH1 (V)", "Notes"]
+WIDTH, VALUE = range(2)
+
+
+class MarkerStore:
+    """
+    The markers, kept sorted by position.
+
+    The positions live in an array searched by bisection, next to the list of
+    marker dictionaries, so adding, moving and finding a marker never sorts
+    nor scans all of them. The width of a marker, the distance to the next
+    one, is computed from the positions when needed.
+
+    Attributes:
+    -----------
+    positions : array.array
+        The sorted positions of the markers.
+    items : list
+        The marker dictionaries, in the same order. Each one holds at least
+        "pos" and "note".
+    """
+
+    def __init__(self):
+        """
+        Constructs an empty store.
+        """
+        self.positions = array("q")
+        self.items = []
+
+    def __len__(self):
+        return len(self.items)
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __getitem__(self, row):
+        return self.items[row]
+
+    def bisect(self, pos):
+        """
+        Returns the row a marker at pos would be inserted at, after the
+        markers already there.
+        """
+        return bisect_right(self.positions, pos)
+
+    def span(self, start, end):
+        """
+        Returns the first row at or after start and the first row after end.
+        """
+        lo = bisect_left(self.positions, start)
+        return lo, bisect_right(self.positions, end, lo)
+
+    def row_of(self, item):
+        """
+        Returns the row of a marker dictionary.
+        """
+        lo = bisect_left(self.positions, item["pos"])
+        hi = bisect_right(self.positions, item["pos"], lo)
+        for row in range(lo, hi):
+            if self.items[row] is item:
+                return row
+
+        raise ValueError("Marker not in the store")
+
+    def width(self, row):
+        """
+        Returns the distance from a marker to the next one, 0 for the last.
+        """
+        if row + 1 >= len(self.positions):
+            return 0
+
+        return self.positions[row + 1] - self.positions[row]
+
+    def insert(self, item):
+        """
+        Adds a marker dictionary and returns its row.
+        """
+        row = self.bisect(item["pos"])
+        self.positions.insert(row, item["pos"])
+        self.items.insert(row, item)
+        return row
+
+    def extend(self, items):
+        """
+        Adds many marker dictionaries at once.
+        """
+        merged = sorted(self.items + list(items), key=lambda item: item["pos"])
+        self.items = merged
+        self.positions = array("q", [item["pos"] for item in merged])
+
+    def pop(self, row):
+        """
+        Removes the marker at a row and returns its dictionary.
+        """
+        del self.positions[row]
+        return self.items.pop(row)
+
+    def destination(self, row, pos):
+        """
+        Returns the row the marker at row would end at if moved to pos.
+        """
+        dest = self.bisect(pos)
+        return dest - 1 if dest > row else dest
+
+    def move(self, row, pos):
+        """
+        Moves the marker at a row to a new position and returns its new row.
+        """
+        item = self.pop(row)
+        item["pos"] = pos
+        return self.insert(item)
+
+    def shift(self, delta):
+        """
+        Moves all the markers by the same distance, keeping their order.
+        """
+        self.positions = array("q", [p + delta for p in self.positions])
+        for item in self.items:
+            item["pos"] += delta
+
+    def clear(self):
+        """
+        Removes all the markers.
+        """
+        self.positions = array("q")
+        self.items = []
+
+
+class MarkerModel(QtCore.QAbstractTableModel):
+    """
+    A table model over a MarkerStore.
+
+    Every change to the markers goes through the model, which tells the views
+    only about the rows that changed: an insert or a removal changes the width
+    and the interval of the previous marker, a move the ones of its old and
+    new neighbours.
+
+    Attributes:
+    -----------
+    store : MarkerStore
+        The markers.
+    value : callable
+        Returns the value shown for a position, or None.
+    stats : callable
+        Returns the values of the statistics columns for a row, from the
+        marker to the next one, or None.
+    statColumns : list
+        The headers of the statistics columns.
+    """
+
+    def __init__(self, store, value=None, stats=None):
+        """
+        Constructs the model.
+
+        Parameters:
+        -----------
+        store : MarkerStore
+            The markers.
+        value : callable
+            Returns the value shown for a position, or None.
+        stats : callable
+            Returns the values of the statistics columns for a row, or None.
+        """
+        super().__init__()
+        self.store = store
+        self.value = value
+        self.stats = stats
+        self.statColumns = []
+
+    def note_column(self):
+        """
+        Returns the column of the notes, the last one.
+        """
+        return len(COLUMNS) - 1 + len(self.statColumns)
+
+    def set_stat_columns(self, headers):
+        """
+        Sets the headers of the statistics columns.
+        """
+        if headers == self.statColumns:
+            return
+
+        self.beginResetModel()
+        self.statColumns = list(headers)
+        self.endResetModel()
+
+    def rowCount(self, parent=QtCore.QModelIndex()):
+        return 0 if parent.isValid() else len(self.store)
+
+    def columnCount(self, parent=QtCore.QModelIndex()):
+        return 0 if parent.isValid() else len(COLUMNS) + len(self.statColumns)
+
+    def headerData(self, section, orientation, role=QtCore.Qt.ItemDataRole.DisplayRole):
+        if role != QtCore.Qt.ItemDataRole.DisplayRole:
+            return None
+        if orientation == QtCore.Qt.Orientation.Horizontal:
+            if VALUE < section < self.note_column():
+                return self.statColumns[section - VALUE - 1]
+            return COLUMNS[min(section, len(COLUMNS) - 1)]
+        return str(section + 1)
+
+    def data(self, index, role=QtCore.Qt.ItemDataRole.DisplayRole):
+        if not index.isValid() or role not in (QtCore.Qt.ItemDataRole.DisplayRole,
+                                               QtCore.Qt.ItemDataRole.EditRole):
+            return None
+
+        row, column = index.row(), index.column()
+        if column == WIDTH:
+            return str(self.store.width(row))
+        if column == VALUE:
+            value = None
+            if self.value is not None:
+                value = self.value(self.store[row]["pos"])
+            return "" if value is None else "%g" % value
+        if column < self.note_column():
+            values = self.stats(row) if self.stats is not None else None
+            value = None if values is None else values[column - VALUE - 1]
+            return "" if value is None or math.isnan(value) else "%g" % value
+        return self.store[row]["note"]
+
+    def flags(self, index):
+        flags = super().flags(index)
+        if index.column() == self.note_column():
+            flags |= QtCore.Qt.ItemFlag.ItemIsEditable
+        return flags
+
+    def setData(self, index, value, role=QtCore.Qt.ItemDataRole.EditRole):
+        if role != QtCore.Qt.ItemDataRole.EditRole or index.column() != self.note_column():
+            return False
+
+        self.store[index.row()]["note"] = value
+        self.dataChanged.emit(index, index)
+        return True
+
+    def widths_changed(self, *rows):
+        """
+        Tells the views the widths, and so the statistics, of some rows
+        changed.
+        """
+        for row in set(rows):
+            if 0 <= row < len(self.store):
+                self.dataChanged.emit(self.index(row, WIDTH),
+                                      self.index(row, self.note_column() - 1))
+
+    def values_changed(self):
+        """
+        Tells the views all the values changed, e.g. on a new capture.
+        """
+        if len(self.store) > 0:
+            self.dataChanged.emit(self.index(0, VALUE),
+                                  self.index(len(self.store) - 1,
+                                             self.note_column() - 1))
+
+    def insert(self, item):
+        """
+        Adds a marker dictionary and returns its row.
+        """
+        row = self.store.bisect(item["pos"])
+        self.beginInsertRows(QtCore.QModelIndex(), row, row)
+        self.store.insert(item)
+        self.endInsertRows()
+        self.widths_changed(row - 1)
+        return row
+
+    def extend(self, items):
+        """
+        Adds many marker dictionaries at once.
+        """
+        self.beginResetModel()
+        self.store.extend(items)
+        self.endResetModel()
+
+    def remove(self, row):
+        """
+        Removes the marker at a row and returns its dictionary.
+        """
+        self.beginRemoveRows(QtCore.QModelIndex(), row, row)
+        item = self.store.pop(row)
+        self.endRemoveRows()
+        self.widths_changed(row - 1)
+        return item
+
+    def move(self, row, pos):
+        """
+        Moves the marker at a row to a new position and returns its new row.
+        """
+        dest = self.store.destination(row, pos)
+        if dest == row:
+            self.store.move(row, pos)
+            self.widths_changed(row - 1, row)
+            index = self.index(row, VALUE)
+            self.dataChanged.emit(index, index)
+            return row
+
+        # Qt wants the row the marker goes before, counted before the move
+        parent = QtCore.QModelIndex()
+        self.beginMoveRows(parent, row, row, parent, dest + 1 if dest > row else dest)
+        self.store.move(row, pos)
+        self.endMoveRows()
+
+        # The old previous marker, now before or after the gap, and the new one
+        self.widths_changed(row - 1 if dest > row else row, dest - 1, dest)
+        index = self.index(dest, VALUE)
+        self.dataChanged.emit(index, index)
+        return dest
+
+    def shift(self, delta):
+        """
+        Moves all the markers by the same distance.
+        """
+        self.store.shift(delta)
+        self.values_changed()
+
+    def clear(self):
+        """
+        Removes all the markers.
+        """
+        self.beginResetModel()
+        self.store.clear()
+        self.endResetModel()
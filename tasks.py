@@ -0,0 +1,59 @@
+import threading
+from PyQt6 import QtCore
+
+
+class BackgroundTask(QtCore.QObject):
+    """
+    Runs a function on a worker thread and reports back through Qt signals,
+    so the result is always handled on the GUI thread.
+
+    The function is called as func(*args, progress=callback), where callback
+    takes the percentage done.
+
+    Attributes:
+    -----------
+    func : callable
+        The function to run.
+    args : tuple
+        The positional arguments of the function.
+    """
+
+    progress = QtCore.pyqtSignal(int)
+    done = QtCore.pyqtSignal(object)
+    failed = QtCore.pyqtSignal(str)
+
+    def __init__(self, func, *args):
+        """
+        Constructs the task. Nothing runs until start() is called.
+
+        Parameters:
+        -----------
+        func : callable
+            The function to run.
+        args : tuple
+            The positional arguments of the function.
+        """
+        super().__init__()
+        self.func = func
+        self.args = args
+        self.thread = None
+
+    def start(self):
+        """
+        Starts the worker thread.
+        """
+        self.thread = threading.Thread(target=self.run)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def run(self):
+        """
+        Runs the function and emits done or failed.
+        """
+        try:
+            result = self.func(*self.args, progress=self.progress.emit)
+        except Exception as e:
+            self.failed.emit(str(e))
+            return
+
+        self.done.emit(result)
@@ -0,0 +1,244 @@
+import json
+import time
+import threading
+import trigger
+
+# Kinds of records:
+# - connect: opening the connection to the scope
+# - cmd: a command sent without waiting for a reply
+# - query: a command and its reply, the SCPI round trip
+# - chunk: a :WAV:DATA? block, from its request to its last byte
+# - retry: a chunk requested again after a short, invalid or stalled reply
+# - stage: a step of the acquisition pipeline or of the GUI
+KINDS = ["connect", "cmd", "query", "chunk", "retry", "stage"]
+
+# Pipeline stages, in the order a capture goes through them
+STAGES = ["trigger", "download", "decode", "deliver", "plot"]
+
+
+def command_name(cmd):
+    """
+    Returns the headers of a command without their arguments, so that every
+    :WAV:STAR is counted together whatever the start.
+    """
+    return ";".join(part.strip().split(" ", 1)[0] for part in cmd.split(";"))
+
+
+class Stat:
+    """
+    The latencies and bytes recorded for one command or stage.
+
+    Attributes:
+    -----------
+    latency : trigger.LatencyHistogram
+        The durations.
+    nbytes : int
+        The bytes transferred.
+    last : float
+        The last duration, in seconds.
+    """
+
+    def __init__(self):
+        """
+        Constructs an empty stat.
+        """
+        self.latency = trigger.LatencyHistogram()
+        self.nbytes = 0
+        self.last = 0.0
+
+    def record(self, seconds, nbytes=0):
+        """
+        Adds a duration and the bytes transferred during it.
+        """
+        self.latency.record(seconds)
+        self.nbytes += nbytes
+        self.last = seconds
+
+    def throughput(self):
+        """
+        Returns the bytes per second over all the durations, 0 without any.
+        """
+        if self.latency.total <= 0:
+            return 0.0
+
+        return self.nbytes / self.latency.total
+
+
+class Stage:
+    """
+    Times a block of code as a stage, see Telemetry.stage.
+
+    Attributes:
+    -----------
+    nbytes : int
+        The bytes processed, can be set inside the block.
+    fields : dict
+        Extra values written to the log, can be filled inside the block.
+    """
+
+    def __init__(self, telemetry, name, nbytes=0):
+        self.telemetry = telemetry
+        self.name = name
+        self.nbytes = nbytes
+        self.fields = {}
+
+    def __enter__(self):
+        self.begin = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        # Failed stages would skew the durations
+        if exc_type is None:
+            self.telemetry.record("stage", self.name,
+                                  time.perf_counter() - self.begin,
+                                  self.nbytes, **self.fields)
+
+
+class Telemetry:
+    """
+    Collects the durations and bytes of the SCPI commands, of the waveform
+    chunks and of the acquisition stages.
+
+    Every record updates a histogram per kind and name, and is optionally
+    appended to a JSON-lines log, one object per record, so a slow site can
+    be analysed offline. Records may come from any thread.
+
+    Attributes:
+    -----------
+    stats : dict
+        Maps (kind, name) tuples to their Stat.
+    log : file
+        The JSON-lines log, None if disabled.
+    """
+
+    def __init__(self, logFile=None):
+        """
+        Constructs the telemetry.
+
+        Parameters:
+        -----------
+        logFile : str
+            The JSON-lines log file, appended to. No log if None.
+        """
+        self.stats = {}
+        # Line buffered, so the log can be followed while acquiring
+        self.log = open(logFile, "a", buffering=1) if logFile else None
+        self.lock = threading.Lock()
+
+    def record(self, kind, name, seconds, nbytes=0, **fields):
+        """
+        Records a duration.
+
+        Parameters:
+        -----------
+        kind : str
+            One of KINDS.
+        name : str
+            The command, channel or stage.
+        seconds : float
+            The duration.
+        nbytes : int
+            The bytes transferred.
+        fields : dict
+            Extra values written to the log.
+        """
+        with self.lock:
+            stat = self.stats.get((kind, name))
+            if stat is None:
+                stat = self.stats[(kind, name)] = Stat()
+            stat.record(seconds, nbytes)
+
+            if self.log is not None:
+                entry = {"time": round(time.time(), 6), "kind": kind,
+                         "name": name, "ms": round(seconds * 1000, 3),
+                         "bytes": nbytes}
+                entry.update(fields)
+                self.log.write(json.dumps(entry) + "\n")
+
+    def stage(self, name, nbytes=0):
+        """
+        Returns a context manager recording the duration of a stage:
+
+            with telemetry.stage("download") as stage:
+                data = download()
+                stage.nbytes = len(data)
+
+        Parameters:
+        -----------
+        name : str
+            The stage, preferably one of STAGES.
+        nbytes : int
+            The bytes processed, if known beforehand.
+        """
+        return Stage(self, name, nbytes)
+
+    def get(self, kind, name):
+        """
+        Returns the Stat of a command or stage, None if never recorded.
+        """
+        with self.lock:
+            return self.stats.get((kind, name))
+
+    def total(self, kind):
+        """
+        Returns the number of records, the seconds and the bytes of a kind.
+        """
+        count, seconds, nbytes = 0, 0.0, 0
+        with self.lock:
+            for (k, name), stat in self.stats.items():
+                if k == kind:
+                    count += stat.latency.count
+                    seconds += stat.latency.total
+                    nbytes += stat.nbytes
+
+        return count, seconds, nbytes
+
+    def status(self):
+        """
+        Returns a one line summary: the mean SCPI round trip, the waveform
+        throughput and the last duration of every stage.
+        """
+        parts = []
+        count, seconds, _ = self.total("query")
+        if count:
+            parts.append("RTT %.1f ms" % (seconds / count * 1000))
+
+        count, seconds, nbytes = self.total("chunk")
+        if count and seconds > 0:
+            parts.append("%.1f MB/s" % (nbytes / seconds / 1e6))
+
+        for name in STAGES:
+            stat = self.get("stage", name)
+            if stat is not None:
+                parts.append("%s %.0f ms" % (name, stat.last * 1000))
+
+        return "  ".join(parts)
+
+    def summary(self):
+        """
+        Returns a line per command and stage, with its latency histogram
+        summary, and the throughput of the chunks.
+        """
+        with self.lock:
+            items = sorted(self.stats.items(),
+                           key=lambda item: (KINDS.index(item[0][0])
+                                             if item[0][0] in KINDS else
+                                             len(KINDS), item[0][1]))
+
+        lines = []
+        for (kind, name), stat in items:
+            line = "%-7s %-30s %s" % (kind, name, stat.latency.summary())
+            if kind == "chunk":
+                line += " %.1fMB/s" % (stat.throughput() / 1e6)
+            lines.append(line)
+
+        return lines
+
+    def close(self):
+        """
+        Closes the log.
+        """
+        with self.lock:
+            if self.log is not None:
+                self.log.close()
+                self.log = None
@@ -0,0 +1,20 @@
+import os
+import sys
+
+import pytest
+
+# The modules live at the top of the repository, not in a package
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import ds1000z_sim
+
+
+@pytest.fixture
+def sim():
+    """
+    A simulated scope serving on a free local port.
+    """
+    scope = ds1000z_sim.SimScope(mdep=12000, channels=["CHAN1", "CHAN2"])
+    scope.start()
+    yield scope
+    scope.stop()
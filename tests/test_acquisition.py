@@ -0,0 +1,100 @@
+import threading
+import time
+
+import pytest
+from PyQt6 import QtCore
+
+import acquisition
+import ds1000z
+
+
+def run_pipeline(sim, policy, count, maxsize=1, decode=None, consume=False):
+    """
+    Runs a pipeline to its end and returns it with the (data, plot) items
+    taken, all at the end unless consume is set.
+    """
+    session = ds1000z.Session(*sim.server.server_address)
+    pipeline = acquisition.AcquisitionPipeline(session, count, policy,
+                                               maxsize=maxsize, decode=decode)
+    finished = threading.Event()
+    # No event loop runs, the signal is handled on the worker thread
+    pipeline.finished.connect(finished.set,
+                              QtCore.Qt.ConnectionType.DirectConnection)
+
+    items = []
+    try:
+        pipeline.start()
+        while not finished.wait(0.05):
+            if consume:
+                items += pipeline.take()
+        items += pipeline.take()
+    finally:
+        pipeline.stop()
+        session.close()
+
+    return pipeline, items
+
+
+def test_block(sim):
+    pipeline, items = run_pipeline(sim, "block", 5, consume=True)
+
+    assert len(items) == 5
+    assert all(plot for _, plot in items)
+    assert pipeline.dropped == 0
+    assert pipeline.trigger.armToTrigger.count == 5
+    for stage in ["trigger", "download", "decode", "deliver"]:
+        assert pipeline.telemetry.stats["stage", stage].latency.count == 5
+
+
+def test_drop_oldest(sim):
+    pipeline, items = run_pipeline(sim, "drop-oldest", 5, maxsize=2)
+
+    # The GUI never took anything, only the newest captures are left
+    assert len(items) == 2
+    assert pipeline.dropped == 3
+
+
+def test_skip_plot(sim):
+    pipeline, items = run_pipeline(sim, "skip-plot", 4, maxsize=4)
+
+    # The whole backlog is stored but only its newest capture is plotted
+    assert [plot for _, plot in items] == [False, False, False, True]
+    assert pipeline.dropped == 0
+
+
+def test_decode(sim):
+    decoded = []
+
+    def decode(data):
+        decoded.append(data)
+        return data if len(decoded) % 2 else None
+
+    pipeline, items = run_pipeline(sim, "block", 4, maxsize=4, decode=decode)
+
+    # Captures consumed by the decoder are not handed over
+    assert len(decoded) == 4
+    assert [data for data, _ in items] == decoded[0::2]
+    assert list(items[0][0]) == ["CHAN1", "CHAN2"]
+
+
+def test_stop(sim):
+    session = ds1000z.Session(*sim.server.server_address)
+    pipeline = acquisition.AcquisitionPipeline(session, policy="drop-oldest")
+    finished = threading.Event()
+    # No event loop runs, the signal is handled on the worker thread
+    pipeline.finished.connect(finished.set,
+                              QtCore.Qt.ConnectionType.DirectConnection)
+    try:
+        pipeline.start()
+        time.sleep(0.2)
+        pipeline.stop()
+        assert finished.wait(5)
+    finally:
+        session.close()
+
+    assert pipeline.take()
+
+
+def test_unknown_policy(sim):
+    with pytest.raises(ValueError):
+        acquisition.AcquisitionPipeline(None, policy="newest")
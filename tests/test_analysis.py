@@ -0,0 +1,108 @@
+import numpy as np
+import pytest
+
+import analysis
+
+
+def slow_crossings(data, high, low, rising):
+    found, above = [], None
+    for i, value in enumerate(data):
+        if value >= high:
+            if above is False and rising:
+                found.append(i)
+            above = True
+        elif value <= low:
+            if above is True and not rising:
+                found.append(i)
+            above = False
+
+    return found
+
+
+def slow_peaks(data, height, distance):
+    found = []
+    for i in range(1, len(data) - 1):
+        window = data[max(0, i - distance + 1):i + distance]
+        if (data[i] >= height and data[i] > data[i - 1] and
+                data[i] >= data[i + 1] and data[i] == window.max() and
+                (not found or i - found[-1] >= distance)):
+            found.append(i)
+
+    return found
+
+
+def slow_correlate(data, template):
+    m = len(template)
+    kernel = template - template.mean()
+    scores = []
+    for i in range(len(data) - m + 1):
+        window = data[i:i + m] - data[i:i + m].mean()
+        energy = np.sqrt(np.dot(window, window) * np.dot(kernel, kernel))
+        scores.append(np.dot(window, kernel) / energy if energy else 0)
+
+    return np.array(scores)
+
+
+@pytest.mark.parametrize("rising", [True, False])
+def test_crossings(sim, rising):
+    data = sim.waveform("CHAN1")
+    positions = analysis.crossings(data, 195, 150, rising)
+
+    assert list(positions) == slow_crossings(data, 195, 150, rising)
+    # One edge per burst of the simulated trace
+    assert len(positions) in (2, 3)
+
+
+def test_find_markers_spacing(sim):
+    data = sim.waveform("CHAN2")
+    noisy = analysis.find_markers(data, "rising", 150)
+    spaced = analysis.find_markers(data, "rising", 150, distance=400)
+
+    assert len(spaced) < len(noisy)
+    assert np.all(np.diff(spaced) >= 400)
+    assert set(spaced) <= set(noisy)
+
+    with pytest.raises(ValueError):
+        analysis.find_markers(data, "level", 150)
+
+
+@pytest.mark.parametrize("distance", [1, 5, 300])
+def test_peaks(sim, distance):
+    data = sim.waveform("CHAN1")[:3000].astype(np.int16)
+
+    assert list(analysis.peaks(data, 170, distance)) == \
+        slow_peaks(data, 170, distance)
+
+
+def test_correlate(sim):
+    data = sim.waveform("CHAN1")[:3000].astype(np.float64)
+    template = data[1200:1300].copy()
+    score = analysis.correlate(data, template)
+
+    assert score.dtype == np.float32
+    np.testing.assert_allclose(score, slow_correlate(data, template),
+                               atol=1e-5)
+    assert score[1200] == pytest.approx(1)
+
+    with pytest.raises(ValueError):
+        analysis.correlate(data, np.ones(10))
+
+
+def test_match_template(sim):
+    data = sim.waveform("CHAN1")
+    # A burst of the simulated trace and its edges, repeated every 5000
+    # samples on a sine which alone scores a little lower
+    template = data[4700:5900]
+    matches = analysis.match_template(data, template, 0.98)
+
+    assert list(matches) == [4700, 9700]
+    assert len(analysis.match_template(data, template, 0.9)) == 4
+
+
+def test_find_shift(sim):
+    reference = sim.waveform("CHAN1").astype(np.float32)
+    data = np.roll(reference, 37)
+
+    assert analysis.find_shift(reference, data, 100, window=4096) == 37
+    assert analysis.find_shift(reference, np.roll(reference, -12), 100) == -12
+    assert analysis.find_shift(np.zeros(5000), reference, 100) == 0
@@ -0,0 +1,93 @@
+import numpy as np
+import pytest
+
+import averaging
+import capture
+import ds1000z
+
+
+def next_capture(sim, shift=0):
+    """
+    Triggers the simulator and returns its capture, delayed by shift samples
+    like a jittery trigger would.
+    """
+    sim.arm()
+    sim.trigger_status()
+    preamble = ds1000z.parse_preamble(sim.preamble())
+    waves = {name: sim.waveform(name) for name in sim.channels}
+    chans = {name: np.roll(data, shift) for name, data in waves.items()}
+    return waves, capture.Capture(chans, {name: preamble for name in chans})
+
+
+def test_running_stats():
+    rng = np.random.default_rng(0)
+    traces = rng.normal(5, 2, (7, 1000))
+    stats = averaging.RunningStats(1000)
+    for trace in traces:
+        stats.add(trace)
+
+    np.testing.assert_allclose(stats.mean, traces.mean(axis=0))
+    np.testing.assert_allclose(stats.variance(), traces.var(axis=0, ddof=1))
+
+
+def test_average_aligned(sim):
+    averager = averaging.Averager(maxShift=100)
+    shifts = [0, 25, -40, 7, 0, -3]
+    waves = []
+    for shift in shifts:
+        wave, scopeData = next_capture(sim, shift)
+        waves.append(wave)
+
+        # The capture is consumed
+        assert averager.add(scopeData) is None
+        assert averager.shift == shift
+
+    assert averager.count() == len(shifts)
+    assert averager.rejected == 0
+
+    mean, std = averager.captures()
+    assert mean.info["averaged"] == len(shifts)
+    middle = slice(100, -100)
+    for name in sim.channels:
+        traces = np.array([wave[name] for wave in waves], dtype=np.float64)
+        np.testing.assert_allclose(mean[name][middle],
+                                   traces.mean(axis=0)[middle], rtol=1e-6)
+        np.testing.assert_allclose(std[name][middle],
+                                   traces.std(axis=0, ddof=1)[middle],
+                                   rtol=1e-5, atol=1e-5)
+
+    # The mean is in the units of the scope, the deviation has no offset
+    assert mean.calibration("CHAN1") == pytest.approx((0.04, -127 * 0.04))
+    assert std.calibration("CHAN1") == (0.04, 0)
+
+
+def test_update_captures(sim):
+    averager = averaging.Averager()
+    averager.add(next_capture(sim)[1])
+    mean, std = averager.captures()
+    mean.cut(100, 200)
+    mean.lod["CHAN1"] = object()
+
+    averager.add(next_capture(sim)[1])
+    before = mean.base["CHAN1"]
+    averager.update_captures(mean, std)
+
+    # Refreshed in place, keeping the cut but not the pyramids
+    assert mean.base["CHAN1"] is before
+    assert mean.offset() == 100
+    assert mean.lod == {}
+    assert std.notes == "Standard deviation of 2 captures"
+    assert np.any(std.base["CHAN2"] > 0)
+
+
+def test_reject(sim):
+    averager = averaging.Averager(channel="CHAN2")
+    assert averager.captures() is None
+
+    averager.add(next_capture(sim)[1])
+    averager.add(capture.Capture({"CHAN1": sim.waveform("CHAN1")}))
+    averager.add(capture.Capture({name: sim.waveform(name)[:-1]
+                                  for name in sim.channels}))
+
+    assert averager.rejected == 2
+    assert averager.count() == 1
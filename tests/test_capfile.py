@@ -0,0 +1,63 @@
+import numpy as np
+import pytest
+
+import capfile
+import capture
+import ds1000z
+
+
+def make_capture(sim):
+    preamble = ds1000z.parse_preamble(sim.preamble())
+    chans = {name: sim.waveform(name) for name in sim.channels}
+    return capture.Capture(chans, {name: preamble for name in chans},
+                           timestamp=1234.5, notes="bench",
+                           info={"scope": "sim"})
+
+
+@pytest.mark.parametrize("load", [False, True])
+def test_round_trip(tmp_path, sim, load):
+    original = make_capture(sim)
+    original.cut(100, 5000)
+    markers = [{"pos": 10, "note": "start"}, {"pos": 2000, "note": ""}]
+    fileName = str(tmp_path / "capture.ds1z")
+
+    capfile.save_capture(fileName, original, markers)
+    loaded = capfile.open_capture(fileName, load=load)
+
+    assert list(loaded.base) == list(original.base)
+    for name in original.base:
+        assert loaded.base[name].dtype == np.uint8
+        assert np.array_equal(loaded.base[name], original.base[name])
+        assert np.array_equal(loaded[name], original[name])
+    assert loaded.preambles == original.preambles
+    assert loaded.markers == markers
+    assert loaded.views == original.views
+    assert loaded.timestamp == 1234.5
+    assert loaded.notes == "bench"
+    assert loaded.info == {"scope": "sim"}
+
+
+def test_round_trip_mixed_channels(tmp_path):
+    chans = {"CHAN1": np.linspace(-1, 1, 1001, dtype=np.float32),
+             "CHAN2": np.empty(0, dtype=np.uint8)}
+    fileName = str(tmp_path / "mixed.ds1z")
+
+    capfile.save_capture(fileName, capture.Capture(chans))
+    loaded = capfile.open_capture(fileName)
+
+    assert loaded.base["CHAN1"].dtype == np.float32
+    assert np.array_equal(loaded.base["CHAN1"], chans["CHAN1"])
+    assert len(loaded.base["CHAN2"]) == 0
+
+
+def test_save_over_mapped_file(tmp_path, sim):
+    fileName = str(tmp_path / "capture.ds1z")
+    capfile.save_capture(fileName, make_capture(sim))
+    mapped = capfile.open_capture(fileName)
+
+    # Saving over the file leaves the mapped capture intact
+    capfile.save_capture(fileName, mapped, [{"pos": 1, "note": "again"}])
+    again = capfile.open_capture(fileName)
+
+    assert np.array_equal(again["CHAN1"], mapped["CHAN1"])
+    assert again.markers == [{"pos": 1, "note": "again"}]
@@ -0,0 +1,82 @@
+import os
+
+import numpy as np
+
+import capstore
+import capture
+
+
+def make_capture(sim, cut=None):
+    scopeData = capture.Capture({name: sim.waveform(name)
+                                 for name in sim.channels})
+    if cut is not None:
+        scopeData.cut(*cut)
+    return scopeData
+
+
+def test_spill_and_reload(sim):
+    size = capstore.resident_bytes(make_capture(sim))
+    store = capstore.CaptureStore(budget=2 * size)
+    try:
+        for i in range(4):
+            store.append(make_capture(sim, (i, 1000 + i)))
+
+        # Only the two most recent captures are kept in RAM
+        assert store.resident_size() == 2 * size
+        spilled = [entry["path"] for entry in store.entries[:2]]
+        assert all(os.path.exists(path) for path in spilled)
+        assert store.entries[0]["capture"] is None
+
+        first = store[0]
+        assert first.offset() == 0 and len(first["CHAN1"]) == 1000
+        assert np.array_equal(first.base["CHAN2"], sim.waveform("CHAN2"))
+        assert not os.path.exists(spilled[0])
+
+        # Reloading spilled the least recently used one
+        assert store.entries[2]["capture"] is None
+        assert store.resident_size() == 2 * size
+
+        del store[1]
+        assert not os.path.exists(spilled[1])
+        assert [c.offset() for c in store] == [0, 2, 3]
+    finally:
+        store.close()
+
+    assert not os.path.exists(os.path.dirname(spilled[0]))
+
+
+def test_spill_in_background(sim):
+    pending = []
+
+    def spawn(func, *args, done):
+        pending.append((func, args, done))
+
+    size = capstore.resident_bytes(make_capture(sim))
+    store = capstore.CaptureStore(budget=size, spawn=spawn)
+    try:
+        captures = [make_capture(sim) for _ in range(3)]
+        for scopeData in captures:
+            store.append(scopeData)
+
+        # The captures stay usable until their spills are written
+        assert len(pending) == 2
+        assert store.entries[0]["capture"] is captures[0]
+        assert store[0] is captures[0]
+        # Using it spilled the most recent one instead
+        assert len(pending) == 3
+
+        paths = []
+        for func, args, done in pending:
+            paths.append(func(*args))
+            done(paths[-1])
+
+        # The capture used meanwhile keeps its samples, the other one is
+        # swapped for its file
+        assert store.entries[0]["capture"] is captures[0]
+        assert store.entries[0]["path"] is None
+        assert not os.path.exists(paths[0])
+        assert store.entries[1]["capture"] is None
+        assert store.entries[1]["path"] == paths[1]
+        assert np.array_equal(store[1].base["CHAN1"], sim.waveform("CHAN1"))
+    finally:
+        store.close()
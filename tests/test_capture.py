@@ -0,0 +1,46 @@
+import numpy as np
+
+import capture
+
+
+def test_cut_undo_redo(sim):
+    scopeData = capture.Capture({name: sim.waveform(name)
+                                 for name in sim.channels})
+    base = scopeData.base["CHAN1"]
+
+    assert scopeData.cut(1000, 9000)
+    assert scopeData.cut(500, 20000)
+    assert scopeData.offset() == 1500
+    assert scopeData.views[-1] == (1500, 9000)
+
+    # Cuts are views over the samples, never copies
+    window = scopeData["CHAN1"]
+    assert np.shares_memory(window, base)
+    assert np.array_equal(window, base[1500:9000])
+
+    assert scopeData.undo()
+    assert scopeData.offset() == 1000
+    assert scopeData.redo()
+    assert scopeData.offset() == 1500
+    assert not scopeData.redo()
+
+    # A new cut drops the windows undone
+    assert scopeData.undo()
+    assert scopeData.cut(0, 10)
+    assert not scopeData.redo()
+    assert scopeData.views == [(0, 12000), (1000, 9000), (1000, 1010)]
+
+    assert scopeData.undo() and scopeData.undo()
+    assert not scopeData.undo()
+    assert len(scopeData["CHAN2"]) == 12000
+
+
+def test_cut_clamped():
+    scopeData = capture.Capture({"CHAN1": np.arange(100, dtype=np.uint8)})
+
+    assert scopeData.cut(-10, 50)
+    assert scopeData.views[-1] == (0, 50)
+    assert not scopeData.cut(0, 500)
+    assert not scopeData.cut(60, 70)
+    assert scopeData.cut(40, 500)
+    assert list(scopeData["CHAN1"]) == list(range(40, 50))
@@ -0,0 +1,80 @@
+import json
+import os
+import subprocess
+import sys
+
+import numpy as np
+import pytest
+
+import capfile
+import ds1000z_capture
+import ds1000z_sim
+
+SCRIPT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                      "ds1000z_capture.py")
+
+
+def run_cli(*args):
+    return subprocess.run([sys.executable, SCRIPT] + [str(a) for a in args],
+                          capture_output=True, text=True, timeout=60)
+
+
+def address_of(sim):
+    return "%s:%d" % sim.server.server_address
+
+
+@pytest.mark.parametrize("mode", ds1000z_capture.MODES)
+def test_capture(tmp_path, sim, mode):
+    log = tmp_path / "telemetry.jsonl"
+    result = run_cli(address_of(sim), "--count", 3, "--mode", mode,
+                     "--out", tmp_path / "out", "--telemetry-log", log)
+
+    assert result.returncode == 0, result.stdout + result.stderr
+    assert "3/3 captures" in result.stdout
+    names = sorted(os.listdir(tmp_path / "out"))
+    assert names == ["capture_%06d%s" % (i, capfile.EXTENSION)
+                     for i in (1, 2, 3)]
+
+    scopeData = capfile.open_capture(str(tmp_path / "out" / names[-1]))
+    assert list(scopeData) == ["CHAN1", "CHAN2"]
+    assert np.array_equal(scopeData["CHAN2"], sim.waveform("CHAN2"))
+    assert scopeData.preambles["CHAN1"]["points"] == 12000
+
+    records = [json.loads(line) for line in log.read_text().splitlines()]
+    assert any(record.get("kind") == "chunk" for record in records)
+
+
+def test_capture_several_scopes(tmp_path, sim):
+    other = ds1000z_sim.SimScope(mdep=120000, channels=["CHAN3"])
+    other.start()
+    addresses = [sim.server.server_address, other.server.server_address]
+    try:
+        result = run_cli(address_of(sim), address_of(other), "--count", 2,
+                         "--out", tmp_path)
+    finally:
+        other.stop()
+
+    # A subdirectory per scope
+    assert result.returncode == 0, result.stdout + result.stderr
+    for address, chans in zip(addresses, [["CHAN1", "CHAN2"], ["CHAN3"]]):
+        directory = tmp_path / ("%s_%d" % address)
+        names = sorted(os.listdir(directory))
+        assert len(names) == 2
+        assert list(capfile.open_capture(str(directory / names[0]))) == chans
+
+
+def test_capture_failed(tmp_path):
+    # Nothing listens on the address of a stopped simulator
+    sim = ds1000z_sim.SimScope()
+    address = "%s:%d" % sim.start()
+    sim.stop()
+
+    result = run_cli(address, "--out", tmp_path)
+
+    assert result.returncode == 1
+    assert "Acquisition failed" in result.stdout
+
+
+def test_parse_address():
+    assert ds1000z_capture.parse_address("10.0.0.2", 5555) == ("10.0.0.2", 5555)
+    assert ds1000z_capture.parse_address("host:6000", 5555) == ("host", 6000)
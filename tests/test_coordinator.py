@@ -0,0 +1,77 @@
+import asyncio
+import time
+
+import numpy as np
+import pytest
+
+import ds1000z_async
+import ds1000z_sim
+import telemetry
+
+
+@pytest.fixture
+def sims():
+    """
+    Two simulated scopes, both triggering a while after being armed.
+    """
+    scopes = [ds1000z_sim.SimScope(mdep=120000, channels=["CHAN1", "CHAN2"],
+                                   trigger_delay=0.4),
+              ds1000z_sim.SimScope(mdep=12000, channels=["CHAN3"],
+                                   trigger_delay=0.4)]
+    for scope in scopes:
+        scope.start()
+    yield scopes
+    for scope in scopes:
+        scope.stop()
+
+
+def test_acquire(sims):
+    stats = telemetry.Telemetry()
+    coordinator = ds1000z_async.Coordinator(
+        [sim.server.server_address for sim in sims], telemetry=stats)
+
+    async def acquire():
+        async with coordinator:
+            begin = time.perf_counter()
+            first = await coordinator.acquire(rearm=True)
+            armed = list(coordinator.armed)
+            second = await coordinator.acquire()
+            return first, armed, second, time.perf_counter() - begin
+
+    first, armed, second, seconds = asyncio.run(acquire())
+
+    # Both scopes wait for their triggers at the same time
+    assert seconds < 4 * 0.4
+    assert armed == [True, True]
+    assert coordinator.armed == [False, False]
+    for captures in [first, second]:
+        assert [list(c) for c in captures] == [["CHAN1", "CHAN2"], ["CHAN3"]]
+    for sim, scopeData in zip(sims, second):
+        for name in scopeData:
+            assert np.array_equal(scopeData[name], sim.waveform(name))
+    assert all(t.armToTrigger.count == 2 for t in coordinator.triggers)
+    assert stats.total("connect")[0] == 2
+
+
+def test_acquire_stopped(sims):
+    coordinator = ds1000z_async.Coordinator(
+        [sim.server.server_address for sim in sims])
+
+    async def acquire():
+        async with coordinator:
+            stop = asyncio.Event()
+            asyncio.get_running_loop().call_later(0.1, stop.set)
+            return await coordinator.acquire(stop=stop)
+
+    assert asyncio.run(acquire()) == [None, None]
+
+
+def test_connect_failed(sims):
+    dead = ds1000z_sim.SimScope()
+    address = dead.start()
+    dead.stop()
+    coordinator = ds1000z_async.Coordinator(
+        [sims[0].server.server_address, address])
+
+    with pytest.raises(OSError):
+        asyncio.run(coordinator.connect())
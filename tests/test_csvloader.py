@@ -0,0 +1,126 @@
+import numpy as np
+import pytest
+
+import capture
+import csvloader
+import ds1000z
+import exporter
+
+
+def write_rigol(path, rows):
+    path.write_text("X,CH1,CH2,Start,Increment,\n"
+                    "Sequence,Volt,Volt,-1.000000e-03,1.000000e-06\n" +
+                    "".join(rows))
+    return str(path)
+
+
+def expected_of(rows):
+    expected = {"CHAN1": [], "CHAN2": []}
+    for row in rows:
+        fields = row.rstrip(",\r\n").split(",")
+        for name, field in zip(expected, fields[1:3]):
+            if field:
+                expected[name].append(float(field))
+
+    return {name: np.array(values, dtype=np.float32)
+            for name, values in expected.items()}
+
+
+def test_detect_layout():
+    layout = csvloader.detect_layout(["X,CH1,CH3,Start,Increment,",
+                                      "Sequence,Volt,Volt,-6.0e-03,2.0e-09",
+                                      "0,1.0e-01,2.0e-01,"])
+    assert layout["name"] == "rigol"
+    assert layout["columns"] == {1: "CHAN1", 2: "CHAN3"}
+    assert layout["header"] == 2
+    assert layout["start"] == -6e-3
+    assert layout["increment"] == 2e-9
+
+    layout = csvloader.detect_layout(["0,12,0,13", "1,14,1,15"])
+    assert layout["name"] == "pairs"
+    assert layout["header"] == 0
+
+
+@pytest.mark.parametrize("blockSize", [csvloader.BLOCK_SIZE, 1000])
+def test_load_rigol_rows(tmp_path, blockSize):
+    rows = ["%d,%.2e,%.4e,\n" % (i, 0.01 * i - 1, -0.001 * i)
+            for i in range(2000)]
+    # Ragged trailing rows, a row with an extra field and odd formats
+    rows[500] = "500,7,1.00e+00,2.00e+00,\n"
+    rows[900] = "900,0.25,-3\n"
+    rows[1500] = "1500,,1.0e-01,\n"
+    rows += ["2000,1.00e+00,\n", "2001,\n"]
+    fileName = write_rigol(tmp_path / "rigol.csv", rows)
+
+    scopeData, layout = csvloader.load_csv(fileName, blockSize=blockSize)
+
+    assert layout["increment"] == 1e-6
+    for name, values in expected_of(rows).items():
+        assert np.array_equal(scopeData[name], values)
+
+
+def test_load_shorter_channel(tmp_path):
+    # CHAN2 stops early, its fields are empty in the last rows, with CRLF
+    rows = ["%d,%.6e,%.6e,\r\n" % (i, 0.04 * (i % 200), -0.02 * (i % 50))
+            if i < 7000 else "%d,%.6e,,\r\n" % (i, 0.04 * (i % 200))
+            for i in range(10000)]
+    fileName = write_rigol(tmp_path / "short.csv", rows)
+
+    scopeData, _ = csvloader.load_csv(fileName, blockSize=4096)
+
+    expected = expected_of(rows)
+    assert len(scopeData["CHAN2"]) == 7000
+    for name, values in expected.items():
+        assert np.array_equal(scopeData[name], values)
+
+
+def test_load_codes_opt_in(tmp_path):
+    rows = ["%d,%.6e,%.6e,\n" % (i, 0.04 * (i % 200) - 4, 1.5)
+            for i in range(1000)]
+    fileName = write_rigol(tmp_path / "grid.csv", rows)
+
+    # The volts of the file are kept unless codes are asked for
+    scopeData, layout = csvloader.load_csv(fileName)
+    assert scopeData["CHAN1"].dtype == np.float32
+    assert "preambles" not in layout
+
+    scopeData, layout = csvloader.load_csv(fileName, codes=True)
+    loaded = capture.Capture(scopeData, layout["preambles"])
+    assert scopeData["CHAN1"].dtype == np.uint8
+    assert scopeData["CHAN2"].dtype == np.uint8
+    for name, values in expected_of(rows).items():
+        np.testing.assert_allclose(loaded.to_volts(name, loaded[name]),
+                                   values, rtol=1e-6, atol=1e-6)
+
+
+def test_codes_round_trip(tmp_path, sim):
+    preamble = ds1000z.parse_preamble(sim.preamble())
+    chans = {name: sim.waveform(name) for name in sim.channels}
+    # A shorter channel gets empty fields past its end
+    chans["CHAN2"] = chans["CHAN2"][:9000]
+    original = capture.Capture(chans, {name: preamble for name in chans})
+    fileName = str(tmp_path / "export.csv")
+
+    exporter.export_csv(fileName, original)
+    scopeData, layout = csvloader.load_csv(fileName, codes=True)
+
+    # The exported codes come back as codes, not float32 volts
+    assert list(scopeData) == ["CHAN1", "CHAN2"]
+    loaded = capture.Capture(scopeData, layout.get("preambles"),
+                             info={"start": layout["start"],
+                                   "increment": layout["increment"]})
+    for name in chans:
+        assert scopeData[name].dtype == np.uint8
+        assert len(scopeData[name]) == len(chans[name])
+        np.testing.assert_allclose(
+            loaded.to_volts(name, loaded[name]),
+            original.to_volts(name, original[name]), rtol=1e-5, atol=1e-6)
+    assert loaded.timebase() == pytest.approx(original.timebase())
+    assert layout["preambles"]["CHAN1"]["yincrement"] == 0.04
+
+    # Exporting the reloaded capture gives the same codes back
+    again = str(tmp_path / "again.csv")
+    exporter.export_csv(again, loaded)
+    reloaded, _ = csvloader.load_csv(again, codes=True)
+    for name in chans:
+        assert np.array_equal(reloaded[name], scopeData[name])
@@ -0,0 +1,68 @@
+import numpy as np
+import pytest
+
+import ds1000z
+
+
+def test_parse_preamble(sim):
+    preamble = ds1000z.parse_preamble(sim.preamble())
+
+    assert list(preamble) == ds1000z.PREAMBLE_FIELDS
+    assert preamble["points"] == 12000
+    assert preamble["count"] == 1
+    assert preamble["yreference"] == 127
+    assert preamble["xincrement"] == pytest.approx(1 / sim.srate)
+    assert preamble["yincrement"] == pytest.approx(0.04)
+
+
+def test_parse_preamble_float_counts():
+    preamble = ds1000z.parse_preamble(
+        "0,2,1.2e+06,1,1.0e-09,-6.0e-04,0,4.0e-02,-2.5,1.27e+02")
+
+    assert preamble["type"] == 2
+    assert preamble["points"] == 1200000
+    assert preamble["yreference"] == 127
+    assert preamble["yorigin"] == -2.5
+
+
+def test_read_block(sim):
+    scope = ds1000z.Scope(*sim.server.server_address)
+    try:
+        scope.cmd_batch([":WAV:SOUR CHAN2", ":WAV:STAR 101", ":WAV:STOP 5100",
+                         ":WAV:DATA?"])
+        buf = memoryview(bytearray(6000))
+        length = scope.read_block(buf)
+
+        assert length == 5000
+        assert bytes(buf[:length]) == sim.waveform("CHAN2")[100:5100].tobytes()
+
+        # The connection is still in step after the block
+        assert scope.cmd_with_reply("*IDN?").startswith("RIGOL")
+    finally:
+        scope.close()
+
+
+def test_read_block_too_large(sim):
+    scope = ds1000z.Scope(*sim.server.server_address)
+    try:
+        scope.cmd_batch([":WAV:STAR 1", ":WAV:STOP 1000", ":WAV:DATA?"])
+        with pytest.raises(ValueError):
+            scope.read_block(memoryview(bytearray(10)))
+    finally:
+        scope.close()
+
+
+def test_get_all_chans(sim):
+    scope = ds1000z.Scope(*sim.server.server_address)
+    try:
+        chans = scope.get_all_chans()
+        settings = scope.get_settings()
+    finally:
+        scope.close()
+
+    assert list(chans) == ["CHAN1", "CHAN2"]
+    for name, data in chans.items():
+        assert np.array_equal(data, sim.waveform(name))
+    assert settings.mdep == 12000
+    assert settings.preambles["CHAN1"]["points"] == 12000
+
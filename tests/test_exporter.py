@@ -0,0 +1,41 @@
+import numpy as np
+
+import capture
+import csvloader
+import exporter
+
+
+def text_of(chars):
+    return [row[row != 0].tobytes().decode() for row in chars]
+
+
+def test_format_floats():
+    rng = np.random.default_rng(0)
+    values = np.concatenate([
+        rng.normal(0, 1, 2000) * 10.0 ** rng.integers(-20, 20, 2000),
+        # Halfway between two mantissas, some carrying into the exponent
+        (rng.integers(1000000, 10000000, 2000) + 0.5) *
+        10.0 ** rng.integers(-12, 12, 2000),
+        [9.9999995e5, -9.9999995e-5, 0.0, -0.0, 1e-300, 5e-324, 1e300,
+         np.nan, np.inf, -np.inf]])
+
+    assert text_of(exporter._format_floats(values)) == [
+        "%.6e" % value for value in values]
+
+
+def test_format_ints():
+    values = [0, 7, 10, 99, 100, 123456]
+    assert text_of(exporter._format_ints(values)) == [str(v) for v in values]
+
+
+def test_export_volts(tmp_path):
+    rng = np.random.default_rng(1)
+    volts = rng.normal(0, 1, 3000).astype(np.float32)
+    fileName = str(tmp_path / "volts.csv")
+
+    exporter.export_csv(fileName, capture.Capture({"CHAN1": volts}))
+    scopeData, _ = csvloader.load_csv(fileName)
+
+    expected = np.array(["%.6e" % v for v in volts], dtype=np.float32)
+    assert scopeData["CHAN1"].dtype == np.float32
+    assert np.array_equal(scopeData["CHAN1"], expected)
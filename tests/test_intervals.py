@@ -0,0 +1,71 @@
+import numpy as np
+import pytest
+
+import capture
+import intervals
+
+
+def brute_force(data, starts, ends):
+    results = [[], [], [], []]
+    for start, end in zip(starts, ends):
+        end = min(max(end, 0), len(data))
+        values = data[min(max(start, 0), end):end].astype(np.float64)
+        results[0].append(values.sum())
+        results[1].append((values * values).sum())
+        results[2].append(values.min() if len(values) else np.inf)
+        results[3].append(values.max() if len(values) else -np.inf)
+
+    return [np.array(result) for result in results]
+
+
+def random_ranges(rng, length, count):
+    starts = rng.integers(-10, length + 10, count)
+    lengths = rng.choice([0, 1, intervals.BLOCK - 1, intervals.BLOCK,
+                          3 * intervals.BLOCK + 7, length], count)
+    lengths = np.where(rng.random(count) < 0.5,
+                       rng.integers(0, length + 1, count), lengths)
+    return starts, starts + lengths
+
+
+@pytest.mark.parametrize("dtype", [np.uint8, np.float32])
+@pytest.mark.parametrize("length", [0, 100, intervals.BLOCK * 37, 50001])
+def test_query_brute_force(dtype, length):
+    rng = np.random.default_rng(length)
+    if dtype == np.uint8:
+        data = rng.integers(0, 256, length).astype(np.uint8)
+    else:
+        data = rng.normal(0, 1, length).astype(np.float32)
+    starts, ends = random_ranges(rng, length, 500)
+
+    index = intervals.Index(data)
+    results = index.query(starts, ends)
+    expected = brute_force(data, starts, ends)
+
+    for result, value in zip(results, expected):
+        assert result.dtype == np.float64
+        np.testing.assert_allclose(result, value, rtol=1e-9, atol=1e-6)
+
+
+def test_interval_stats():
+    data = np.arange(1000, dtype=np.uint8) % 200
+    preamble = {"xincrement": 1e-6, "xorigin": 0.0, "xreference": 0,
+                "yincrement": 0.5, "yorigin": -100.0, "yreference": 0}
+    scopeData = capture.Capture({"CHAN1": data}, {"CHAN1": preamble})
+    scopeData.cut(100, 900)
+    intervals.build_indexes(scopeData)
+
+    stats = intervals.interval_stats(scopeData, [0, 10, 5], [400, 10, 1000])
+    volts = scopeData.to_volts("CHAN1", scopeData["CHAN1"]).astype(np.float64)
+
+    chan = stats["CHAN1"]
+    for i, (start, end) in enumerate([(0, 400), (5, 800)]):
+        part = volts[start:end]
+        row = [0, 2][i]
+        assert chan["mean"][row] == pytest.approx(part.mean())
+        assert chan["min"][row] == pytest.approx(part.min())
+        assert chan["max"][row] == pytest.approx(part.max())
+        assert chan["rms"][row] == pytest.approx(np.sqrt((part ** 2).mean()))
+        assert chan["energy"][row] == pytest.approx((part ** 2).sum() * 1e-6)
+
+    # Empty ranges have no statistics
+    assert all(np.isnan(chan[stat][1]) for stat in intervals.STATS)
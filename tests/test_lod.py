@@ -0,0 +1,63 @@
+import numpy as np
+import pytest
+
+import capture
+import lod
+
+
+def brute_force(data, start, end, block):
+    first, last = start // block, -(-end // block)
+    mins = [data[i * block:(i + 1) * block].min() for i in range(first, last)]
+    maxs = [data[i * block:(i + 1) * block].max() for i in range(first, last)]
+    return mins, maxs
+
+
+@pytest.mark.parametrize("length", [1200000, 1234567, 12000000])
+def test_select(length):
+    rng = np.random.default_rng(length)
+    data = rng.integers(0, 256, length).astype(np.uint8)
+    pyramid = lod.Pyramid(data)
+
+    for start, end, pixels in [(0, length, 800), (1000, length - 999, 1500),
+                               (12345, 12345 + 4000 * lod.BASE_BLOCK, 200)]:
+        x, y = pyramid.select(start, end, pixels)
+        block = x[2] - x[0]
+
+        # A few points per pixel at most, framing the whole range
+        assert len(y) <= 2 * lod.FACTOR * pixels + 4
+        assert x[0] <= start and x[-2] + block >= end
+        mins, maxs = brute_force(data, start, end, block)
+        assert np.array_equal(y[0::2], mins)
+        assert np.array_equal(y[1::2], maxs)
+
+
+def test_select_narrow():
+    data = np.arange(100000, dtype=np.float32)
+    pyramid = lod.Pyramid(data)
+
+    # Fewer samples than pixels are returned as they are
+    x, y = pyramid.select(500, 900, 1000)
+    assert np.array_equal(x, np.arange(500, 900))
+    assert np.array_equal(y, data[500:900])
+
+    x, y = pyramid.select(-50, 10, 100)
+    assert np.array_equal(x, np.arange(10))
+    assert len(pyramid.select(200, 100, 10)[1]) == 0
+
+
+def test_short_channel():
+    pyramid = lod.Pyramid(np.zeros(100, dtype=np.uint8))
+
+    assert pyramid.levels == []
+    assert len(pyramid.select(0, 100, 10)[1]) == 100
+
+
+def test_build_pyramids(sim):
+    scopeData = capture.Capture({name: sim.waveform(name)
+                                 for name in sim.channels})
+    done = []
+
+    assert lod.build_pyramids(scopeData, done.append) is scopeData
+    assert list(scopeData.lod) == ["CHAN1", "CHAN2"]
+    assert scopeData.lod["CHAN2"].data is scopeData.base["CHAN2"]
+    assert done == [50, 100]
@@ -0,0 +1,94 @@
+import random
+
+import pytest
+from PyQt6 import QtCore
+
+import capture
+import markerstore
+
+
+def check_sorted(store):
+    positions = [item["pos"] for item in store]
+    assert positions == sorted(positions)
+    assert list(store.positions) == positions
+
+
+def test_store_operations():
+    rng = random.Random(0)
+    store = markerstore.MarkerStore()
+    for _ in range(500):
+        store.insert({"pos": rng.randrange(10000), "note": ""})
+    store.extend({"pos": rng.randrange(10000), "note": "more"}
+                 for _ in range(500))
+    check_sorted(store)
+
+    for _ in range(300):
+        row = rng.randrange(len(store))
+        item = store[row]
+        pos = rng.randrange(10000)
+        dest = store.destination(row, pos)
+        assert store.move(row, pos) == dest
+        assert store[dest] is item
+        assert store.row_of(item) == dest
+    check_sorted(store)
+
+    for _ in range(100):
+        store.pop(rng.randrange(len(store)))
+    check_sorted(store)
+    assert len(store) == 900
+
+    lo, hi = store.span(2000, 3000)
+    assert all(2000 <= item["pos"] <= 3000 for item in store.items[lo:hi])
+    assert lo == 0 or store[lo - 1]["pos"] < 2000
+    assert hi == len(store) or store[hi]["pos"] > 3000
+
+    store.shift(-100)
+    check_sorted(store)
+    assert store.width(0) == store[1]["pos"] - store[0]["pos"]
+    assert store.width(len(store) - 1) == 0
+
+    with pytest.raises(ValueError):
+        store.row_of({"pos": 5, "note": ""})
+
+
+def test_model(sim):
+    scopeData = capture.Capture({"CHAN1": sim.waveform("CHAN1")},
+                                {"CHAN1": {"yincrement": 0.04, "yorigin": 0,
+                                           "yreference": 127}})
+    volts = scopeData.to_volts("CHAN1", scopeData["CHAN1"])
+
+    def value(pos):
+        return float(volts[pos])
+
+    store = markerstore.MarkerStore()
+    model = markerstore.MarkerModel(store, value)
+    changed = []
+    model.dataChanged.connect(
+        lambda first, last: changed.append((first.row(), last.row())))
+
+    for pos in [3000, 1000, 2000]:
+        model.insert({"pos": pos, "note": ""})
+    assert [model.data(model.index(row, markerstore.WIDTH))
+            for row in range(3)] == ["1000", "1000", "0"]
+    assert model.data(model.index(1, markerstore.VALUE)) == "%g" % volts[2000]
+
+    # Moving the first marker last changes its width and the new previous one
+    changed.clear()
+    assert model.move(0, 5000) == 2
+    assert [item["pos"] for item in store] == [2000, 3000, 5000]
+    assert (1, 1) in changed and (2, 2) in changed
+    assert model.data(model.index(1, markerstore.WIDTH)) == "2000"
+
+    assert model.setData(model.index(0, model.note_column()), "edge")
+    assert store[0]["note"] == "edge"
+    assert not model.setData(model.index(0, markerstore.WIDTH), "10")
+
+    model.set_stat_columns(["CH1 mean"])
+    assert model.columnCount() == 4
+    assert model.headerData(2, QtCore.Qt.Orientation.Horizontal) == "CH1 mean"
+    assert model.data(model.index(0, 3)) == "edge"
+
+    assert model.remove(1)["pos"] == 3000
+    assert model.rowCount() == 2
+    model.clear()
+    assert model.rowCount() == 0
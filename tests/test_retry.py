@@ -0,0 +1,43 @@
+import numpy as np
+import pytest
+
+import ds1000z
+import ds1000z_sim
+import telemetry
+
+
+@pytest.mark.parametrize("pipeline", [True, False])
+def test_chunk_retry(pipeline):
+    # Several chunks per channel, some of them cut short or stalled
+    sim = ds1000z_sim.SimScope(mdep=1200000, channels=["CHAN1"],
+                               fault_rate=0.3)
+    stats = telemetry.Telemetry()
+    address = sim.start()
+    try:
+        scope = ds1000z.Scope(*address, pipeline=pipeline, telemetry=stats,
+                              timeout=0.5, retries=10)
+        try:
+            data = scope.get_chan("CHAN1")
+            # The connection was resynchronized after the faults
+            assert scope.cmd_with_reply("*IDN?").startswith("RIGOL")
+        finally:
+            scope.close()
+    finally:
+        sim.stop()
+
+    assert np.array_equal(data, sim.waveform("CHAN1"))
+    assert any(line.startswith("retry") for line in stats.summary())
+
+
+def test_chunk_retry_gives_up():
+    sim = ds1000z_sim.SimScope(mdep=12000, channels=["CHAN1"], fault_rate=1.0)
+    address = sim.start()
+    try:
+        scope = ds1000z.Scope(*address, timeout=0.5, retries=1)
+        try:
+            with pytest.raises(ds1000z.TransferError):
+                scope.get_chan("CHAN1")
+        finally:
+            scope.close()
+    finally:
+        sim.stop()
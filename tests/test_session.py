@@ -0,0 +1,80 @@
+import socket
+import threading
+
+import pytest
+
+import ds1000z
+
+
+def test_keepalive(sim):
+    session = ds1000z.Session(*sim.server.server_address)
+    try:
+        with session as scope:
+            sock = scope.socket
+            assert sock.getsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE)
+            assert sock.getsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY)
+
+        # The connection is kept between uses
+        with session as scope:
+            assert scope.socket is sock
+    finally:
+        session.close()
+
+    assert session.scope is None
+
+
+def test_reconnect(sim):
+    session = ds1000z.Session(*sim.server.server_address)
+    try:
+        first = session.run(lambda scope: scope)
+        first.socket.shutdown(socket.SHUT_RDWR)
+
+        # The call failing on the dead connection is retried on a new one
+        reply = session.cmd_with_reply("*IDN?")
+        assert reply.startswith("RIGOL")
+        assert session.scope is not first
+        assert first.socket is None
+    finally:
+        session.close()
+
+
+def test_reconnect_gives_up(sim):
+    calls = []
+
+    def reset(scope):
+        calls.append(scope)
+        raise ConnectionResetError("reset by peer")
+
+    session = ds1000z.Session(*sim.server.server_address, retries=2)
+    try:
+        with pytest.raises(ConnectionResetError):
+            session.run(reset)
+
+        # Every attempt got a new connection, and the session is usable
+        assert len(calls) == 3
+        assert len(set(map(id, calls))) == 3
+        assert session.scope is None
+        assert session.cmd_with_reply("*IDN?").startswith("RIGOL")
+    finally:
+        session.close()
+
+
+def test_serialized(sim):
+    session = ds1000z.Session(*sim.server.server_address)
+    replies = []
+
+    def query():
+        for _ in range(20):
+            replies.append(session.cmd_with_reply(":ACQ:MDEP?"))
+
+    try:
+        threads = [threading.Thread(target=query) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        session.close()
+
+    # The queries of the threads never interleaved on the socket
+    assert replies == ["12000"] * 80
@@ -0,0 +1,68 @@
+import json
+
+import pytest
+
+import ds1000z
+import ds1000z_sim
+import telemetry
+
+
+def test_command_name():
+    assert telemetry.command_name(":WAV:STAR 1001") == ":WAV:STAR"
+    assert telemetry.command_name(":WAV:STAR 1;:WAV:STOP 9") == \
+        ":WAV:STAR;:WAV:STOP"
+    assert telemetry.command_name("*IDN?") == "*IDN?"
+
+
+def test_scope_records(tmp_path):
+    sim = ds1000z_sim.SimScope(mdep=1200000, channels=["CHAN1", "CHAN2"],
+                               latency=0.005)
+    logFile = tmp_path / "telemetry.jsonl"
+    stats = telemetry.Telemetry(str(logFile))
+    address = sim.start()
+    try:
+        scope = ds1000z.Scope(*address, telemetry=stats)
+        try:
+            chans = scope.get_all_chans()
+            scope.cmd_with_reply("*IDN?")
+            scope.cmd_with_reply("*IDN?")
+        finally:
+            scope.close()
+    finally:
+        sim.stop()
+        stats.close()
+
+    assert stats.get("connect", "%s:%d" % address).latency.count == 1
+    # Every chunk of both channels, and the round trips with the latency
+    count, seconds, nbytes = stats.total("chunk")
+    assert nbytes == sum(data.nbytes for data in chans.values())
+    assert count >= 2 * 1200000 // ds1000z_sim.MAX_BYTE_READ
+    idn = stats.get("query", "*IDN?")
+    assert idn.latency.count == 2
+    assert idn.latency.mean() >= 0.005
+    assert stats.total("retry")[0] == 0
+
+    status = stats.status()
+    assert "RTT" in status and "MB/s" in status
+
+    records = [json.loads(line) for line in logFile.read_text().splitlines()]
+    assert sum(r["kind"] == "chunk" for r in records) == count
+    assert sum(r["bytes"] for r in records if r["kind"] == "chunk") == nbytes
+    assert all(set(r) >= {"time", "kind", "name", "ms", "bytes"}
+               for r in records)
+
+
+def test_stages():
+    stats = telemetry.Telemetry()
+    with stats.stage("download", 100) as stage:
+        stage.nbytes += 50
+
+    # Failed stages are not recorded
+    with pytest.raises(RuntimeError):
+        with stats.stage("decode"):
+            raise RuntimeError("bad capture")
+
+    assert stats.get("stage", "download").nbytes == 150
+    assert stats.get("stage", "decode") is None
+    assert "download" in stats.status()
+    assert stats.summary()[0].startswith("stage   download")
@@ -0,0 +1,98 @@
+import asyncio
+import threading
+
+import pytest
+
+import ds1000z
+import ds1000z_async
+import ds1000z_sim
+import trigger
+
+
+def test_backoff():
+    backoff = trigger.Backoff(0.001, 0.005, 2.0)
+    assert [backoff.next() for _ in range(5)] == [0.001, 0.002, 0.004,
+                                                  0.005, 0.005]
+    backoff.reset()
+    assert backoff.next() == 0.001
+
+
+def test_latency_histogram():
+    histogram = trigger.LatencyHistogram(smallest=0.001, buckets=4)
+    for seconds in [0.0005, 0.0015, 0.0015, 0.003, 1.0]:
+        histogram.record(seconds)
+
+    assert histogram.counts == [1, 2, 1, 0, 1]
+    assert histogram.mean() == pytest.approx(1.0065 / 5)
+    assert histogram.percentile(50) == 0.002
+    assert histogram.percentile(100) == float("inf")
+    assert trigger.LatencyHistogram().percentile(50) == 0.0
+
+
+@pytest.fixture
+def slow_sim():
+    """
+    A simulated scope triggering later than the socket timeout of the tests.
+    """
+    scope = ds1000z_sim.SimScope(trigger_delay=0.6)
+    scope.start()
+    yield scope
+    scope.stop()
+
+
+@pytest.mark.parametrize("use_opc", [False, True])
+def test_wait(slow_sim, use_opc):
+    scope = ds1000z.Scope(*slow_sim.server.server_address, timeout=0.3)
+    triggerWait = trigger.TriggerWait(use_opc=use_opc)
+    try:
+        for _ in range(2):
+            triggerWait.arm(scope)
+            assert triggerWait.wait(scope)
+            scope.get_all_chans()
+            triggerWait.downloaded()
+
+        # The connection was never lost to a timeout
+        assert scope.cmd_with_reply("*IDN?").startswith("RIGOL")
+    finally:
+        scope.close()
+
+    assert triggerWait.armToTrigger.count == 2
+    assert triggerWait.armToTrigger.mean() >= 0.6
+    assert triggerWait.triggerToData.count == 2
+
+
+@pytest.mark.parametrize("use_opc", [False, True])
+def test_wait_stopped(slow_sim, use_opc):
+    stop = threading.Event()
+    session = ds1000z.Session(*slow_sim.server.server_address)
+    triggerWait = trigger.TriggerWait(use_opc=use_opc)
+    try:
+        session.run(triggerWait.arm)
+        threading.Timer(0.1, stop.set).start()
+
+        assert not triggerWait.wait(session, stop)
+        assert triggerWait.armToTrigger.count == 0
+    finally:
+        session.close()
+
+
+@pytest.mark.parametrize("use_opc", [False, True])
+def test_async_wait(slow_sim, use_opc):
+    async def wait():
+        scope = ds1000z_async.AsyncScope(*slow_sim.server.server_address,
+                                         timeout=0.3)
+        await scope.connect()
+        try:
+            triggerWait = ds1000z_async.AsyncTriggerWait(use_opc=use_opc)
+            await triggerWait.arm(scope)
+            triggered = await triggerWait.wait(scope)
+
+            stop = asyncio.Event()
+            await triggerWait.arm(scope)
+            asyncio.get_running_loop().call_later(0.1, stop.set)
+            stopped = not await triggerWait.wait(scope, stop)
+        finally:
+            scope.close()
+        return triggered, stopped
+
+    assert asyncio.run(wait()) == (True, True)
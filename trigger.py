@@ -0,0 +1,260 @@
+import time
+import bisect
+import threading
+
+
+class Backoff:
+    """
+    An exponential backoff delay generator.
+
+    Attributes:
+    - initial: a float representing the first delay in seconds.
+    - maximum: a float representing the largest delay in seconds.
+    - factor: a float representing the growth of the delay after each step.
+    - delay: a float representing the next delay to be returned.
+
+    Methods:
+    - next(self): returns the current delay and grows it.
+    - reset(self): goes back to the initial delay.
+    """
+
+    def __init__(self, initial=0.001, maximum=0.05, factor=2.0):
+        """
+        Initializes the backoff.
+
+        Args:
+        - initial: a float representing the first delay in seconds (default is 1 ms).
+        - maximum: a float representing the largest delay in seconds (default is 50 ms).
+        - factor: a float representing the growth of the delay (default is 2).
+        """
+        self.initial = initial
+        self.maximum = maximum
+        self.factor = factor
+        self.delay = initial
+
+    def next(self):
+        """
+        Returns the current delay and grows it up to the maximum.
+
+        Returns:
+        - delay: a float representing the seconds to wait.
+        """
+        delay = self.delay
+        self.delay = min(self.delay * self.factor, self.maximum)
+        return delay
+
+    def reset(self):
+        """
+        Goes back to the initial delay.
+        """
+        self.delay = self.initial
+
+
+class LatencyHistogram:
+    """
+    A histogram of latencies with logarithmic buckets.
+
+    Bucket i counts the samples below edges[i] and above the previous edge,
+    the last bucket counts everything above the last edge.
+
+    Attributes:
+    - edges: a list of floats representing the bucket upper bounds in seconds.
+    - counts: a list of integers with the number of samples per bucket.
+    - count: an integer representing the total number of samples.
+    - total: a float representing the sum of all samples in seconds.
+
+    Methods:
+    - record(self, seconds): adds a sample.
+    - mean(self): returns the mean latency.
+    - percentile(self, p): returns the upper bound of the bucket holding the p percentile.
+    - summary(self): returns a short human readable summary.
+    """
+
+    def __init__(self, smallest=0.0001, buckets=24):
+        """
+        Initializes an empty histogram. Edges double from the smallest one.
+
+        Args:
+        - smallest: a float representing the first bucket edge in seconds (default is 100 us).
+        - buckets: an integer representing the number of edges (default is 24).
+        """
+        self.edges = [smallest * 2 ** i for i in range(buckets)]
+        self.counts = [0] * (buckets + 1)
+        self.count = 0
+        self.total = 0.0
+        self.lock = threading.Lock()
+
+    def record(self, seconds):
+        """
+        Adds a sample to the histogram.
+
+        Args:
+        - seconds: a float representing the latency in seconds.
+        """
+        with self.lock:
+            self.counts[bisect.bisect_left(self.edges, seconds)] += 1
+            self.count += 1
+            self.total += seconds
+
+    def mean(self):
+        """
+        Returns the mean latency in seconds, 0 without samples.
+        """
+        return self.total / self.count if self.count else 0.0
+
+    def percentile(self, p):
+        """
+        Returns the upper bound of the bucket holding the p percentile.
+
+        Args:
+        - p: a float between 0 and 100.
+
+        Returns:
+        - seconds: a float, infinity if it falls in the overflow bucket.
+        """
+        if not self.count:
+            return 0.0
+
+        target = self.count * p / 100.0
+        seen = 0
+        for i, count in enumerate(self.counts):
+            seen += count
+            if seen >= target and count:
+                return self.edges[i] if i < len(self.edges) else float("inf")
+
+        return float("inf")
+
+    def summary(self):
+        """
+        Returns a short summary: samples, mean, median and 95 percentile.
+        """
+        return "n=%d mean=%.1fms p50<%.1fms p95<%.1fms" % (
+            self.count, self.mean() * 1000, self.percentile(50) * 1000,
+            self.percentile(95) * 1000)
+
+
+def trigger_done(reply):
+    """
+    Returns whether a :TRIG:STAT? reply tells the acquisition is complete.
+    """
+    return reply == "STOP"
+
+
+def opc_done(reply):
+    """
+    Returns whether an *ESR? reply has the operation complete bit set.
+    """
+    return reply.isdigit() and int(reply) & 1 == 1
+
+
+class TriggerWait:
+    """
+    Waits for a single trigger of the oscilloscope without flooding its SCPI
+    parser.
+
+    The trigger status is polled tightly right after arming, and the polling
+    interval backs off exponentially up to a cap. It is reset after every
+    trigger. With use_opc set, :SING is followed by *OPC, which on firmwares
+    handling :SING as an overlapped command sets the operation complete bit
+    of the event status register once the acquisition is complete. *ESR? is
+    polled the same way until then, and the status is confirmed afterwards.
+    No query blocks on the scope, so a stop request or a slow trigger never
+    runs into the socket timeout.
+
+    Attributes:
+    - backoff: the Backoff object used between polls.
+    - use_opc: a boolean enabling the *OPC wait.
+    - armToTrigger: a LatencyHistogram of the time between arming and the trigger.
+    - triggerToData: a LatencyHistogram of the time between the trigger and the downloaded data.
+
+    Methods:
+    - arm(self, scope): arms a single trigger.
+    - wait(self, scope, stop=None): waits for the trigger, returns False if stopped.
+    - downloaded(self): records the end of the capture download.
+    """
+
+    def __init__(self, initial=0.001, maximum=0.05, factor=2.0, use_opc=False):
+        """
+        Initializes the trigger wait.
+
+        Args:
+        - initial: a float representing the first polling interval in seconds (default is 1 ms).
+        - maximum: a float representing the largest polling interval in seconds (default is 50 ms).
+        - factor: a float representing the growth of the polling interval (default is 2).
+        - use_opc: a boolean enabling the *OPC wait (default is False).
+        """
+        self.backoff = Backoff(initial, maximum, factor)
+        self.use_opc = use_opc
+        self.armToTrigger = LatencyHistogram()
+        self.triggerToData = LatencyHistogram()
+        self.armedAt = None
+        self.triggeredAt = None
+
+    def arm(self, scope):
+        """
+        Arms a single trigger. The settings snapshot of the scope is dropped,
+        so that changes made on the front panel between captures are picked
+        up by the next download.
+
+        Args:
+        - scope: the ds1000z.Scope to arm.
+        """
+        scope.invalidate_settings()
+        if self.use_opc:
+            # *CLS clears the operation complete bit of the previous capture
+            scope.cmd_batch(["*CLS", ":SING", "*OPC"])
+        else:
+            scope.cmd(":SING")
+        self.armedAt = time.monotonic()
+        self.triggeredAt = None
+
+    def wait(self, scope, stop=None):
+        """
+        Waits until the trigger status is STOP.
+
+        Args:
+        - scope: the ds1000z.Scope to wait for, or a ds1000z.Session, locked
+          only for each poll.
+        - stop: a threading.Event which aborts the wait when set (default is None).
+
+        Returns:
+        - triggered: a boolean, False if the wait was aborted.
+        """
+        if self.armedAt is None:
+            self.armedAt = time.monotonic()
+
+        if self.use_opc and not self._poll(scope, "*ESR?", opc_done, stop):
+            return False
+        if not self._poll(scope, ":TRIG:STAT?", trigger_done, stop):
+            return False
+
+        self.backoff.reset()
+        self.triggeredAt = time.monotonic()
+        self.armToTrigger.record(self.triggeredAt - self.armedAt)
+        self.armedAt = None
+
+        return True
+
+    def _poll(self, scope, query, done, stop):
+        """
+        Repeats a query, sleeping the backoff delays, until its reply is done.
+
+        Returns:
+        - done: a boolean, False if the wait was aborted.
+        """
+        while not done(scope.cmd_with_reply(query)):
+            delay = self.backoff.next()
+            if stop is None:
+                time.sleep(delay)
+            elif stop.wait(delay):
+                return False
+
+        return True
+
+    def downloaded(self):
+        """
+        Records the end of the download of the triggered capture.
+        """
+        if self.triggeredAt is not None:
+            self.triggerToData.record(time.monotonic() - self.triggeredAt)
+            self.triggeredAt = None